@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from telethon.errors import FloodWaitError
+from telethon.tl.types import MessageService
+from apps.chats.cache import ChatCache
+from apps.messages.ingest import IngestRequest, MessageIngestWriter
+from apps.messages.models import BackfillCheckpoint
+from telethon_clients.event_handler import EventHandler
+
+logger = logging.getLogger('accounts')
+
+
+class HistoryBackfill:
+    """Streams the existing history of an account's dialogs into the database, resuming from per-chat checkpoints"""
+
+    @classmethod
+    async def run(cls, account_id: int, client, chat_ids: Optional[List[int]] = None) -> int:
+        """Import the selected dialogs one after another, all of them when no chat IDs are given"""
+        selected = set(chat_ids) if chat_ids else None
+        try:
+            # Dialogs are listed up front, importing reorders them while the listing pages through
+            dialogs = []
+            async for dialog in client.iter_dialogs():
+                chat_id, chat_type = EventHandler.peer_chat_id(dialog.dialog.peer)
+                if selected is None or chat_id in selected:
+                    dialogs.append((chat_id, chat_type, dialog.name, dialog.input_entity))
+        except Exception as e:
+            logger.error(f"❌ Could not list dialogs of account {account_id} for backfill: {e}")
+            return 0
+
+        started = time.monotonic()
+        stored = 0
+        for chat_id, chat_type, title, entity in dialogs:
+            try:
+                stored += await cls.backfill_chat(account_id, client, chat_id, chat_type, title, entity)
+            except Exception as e:
+                logger.error(f"❌ Backfill of chat {chat_id} for account {account_id} failed: {e}")
+
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"✅ Account {account_id} backfilled {stored} messages in {len(dialogs)} chats "
+            f"({stored / elapsed if elapsed else 0:.0f} msg/s)"
+        )
+        return stored
+
+    @classmethod
+    async def backfill_chat(cls, account_id: int, client, chat_id: int, chat_type: str,
+                            title: Optional[str], entity) -> int:
+        """Stream one chat oldest first from its checkpoint, storing a chunk at a time"""
+        chunk_size = getattr(settings, 'TELETHON_BACKFILL_CHUNK_SIZE', 500)
+        max_retries = getattr(settings, 'TELETHON_BACKFILL_MAX_RETRIES', 3)
+
+        chat = await ChatCache.aresolve('account_chat', account_id, chat_id, title, chat_type)
+        checkpoint, _ = await BackfillCheckpoint.objects.aget_or_create(chat_id=chat.pk)
+        if checkpoint.completed_at:
+            return 0
+
+        started = time.monotonic()
+        stored = 0
+        chunk: List[IngestRequest] = []
+        last_id = checkpoint.last_message_id
+
+        async def flush():
+            nonlocal stored
+            if last_id > checkpoint.last_message_id:
+                stored += await sync_to_async(cls._commit)(checkpoint, chunk, last_id)
+                chunk.clear()
+                elapsed = time.monotonic() - started
+                logger.info(
+                    f"📥 Chat {chat_id} of account {account_id}: {checkpoint.imported} messages up to "
+                    f"{last_id} ({stored / elapsed if elapsed else 0:.0f} msg/s)"
+                )
+
+        for attempt in range(max_retries + 1):
+            try:
+                # Oldest first, so the checkpoint always ends a contiguous imported range
+                async for message in client.iter_messages(entity, min_id=checkpoint.last_message_id, reverse=True):
+                    last_id = message.id
+                    if not isinstance(message, MessageService):
+                        chunk.append(cls._request(chat, message))
+                    if len(chunk) >= chunk_size:
+                        await flush()
+                break
+            except FloodWaitError as e:
+                if attempt == max_retries:
+                    raise
+                # Keep what was fetched, the retry continues from the checkpoint
+                await flush()
+                logger.warning(f"⏳ Flood wait of {e.seconds}s backfilling chat {chat_id}, retry {attempt + 1}")
+                await asyncio.sleep(e.seconds)
+
+        await flush()
+        checkpoint.completed_at = timezone.now()
+        await checkpoint.asave(update_fields=['completed_at', 'updated_at'])
+        return stored
+
+    @staticmethod
+    def _request(chat, message) -> IngestRequest:
+        """Build an ingest request dated like the original message so history sorts before live traffic"""
+        request = IngestRequest(
+            message=EventHandler.build_message(chat, message, 'outgoing' if message.out else 'incoming'),
+            user=EventHandler.sender_spec(message.from_id, message.sender),
+        )
+        request.message.created_at = message.date
+        return request
+
+    @staticmethod
+    def _commit(checkpoint: BackfillCheckpoint, requests: List[IngestRequest], last_message_id: int) -> int:
+        """Insert a chunk and advance the checkpoint in one transaction, returns the number of new messages"""
+        with transaction.atomic():
+            # Chunks are already batched, so they skip the ingest writer queue
+            results = MessageIngestWriter.write_requests(requests) if requests else []
+            stored = sum(result.created for result in results)
+            BackfillCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                last_message_id=last_message_id,
+                imported=F('imported') + stored,
+                updated_at=timezone.now(),
+            )
+
+        checkpoint.last_message_id = last_message_id
+        checkpoint.imported += stored
+        return stored
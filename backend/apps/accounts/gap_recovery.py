@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max
+from telethon.errors import FloodWaitError
+from telethon.tl.types import MessageService
+from apps.chats.models import Chat
+from apps.messages.ingest import IngestRequest, MessageIngestWriter
+from apps.messages.models import Message
+from telethon_clients.event_handler import EventHandler
+
+logger = logging.getLogger('accounts')
+
+
+class GapRecovery:
+    """Fetches the messages an account missed while its client was not connected"""
+
+    @classmethod
+    async def recover(cls, account_id: int, client) -> int:
+        """Catch up every stored chat of an account, returns the number of messages stored"""
+        positions = await sync_to_async(cls._stored_positions)(account_id)
+        if not positions:
+            return 0
+
+        # Dialogs are listed in pages of 100 and carry their newest message,
+        # so only chats that actually moved need a history request
+        behind = []
+        async for dialog in client.iter_dialogs():
+            chat_id, _ = EventHandler.peer_chat_id(dialog.dialog.peer)
+            position = positions.get(chat_id)
+            if position and dialog.message and dialog.message.id > position[1]:
+                behind.append((position[0], position[1], dialog.input_entity))
+
+        if not behind:
+            logger.info(f"✅ Account {account_id} has no gaps in {len(positions)} chats")
+            return 0
+
+        semaphore = asyncio.Semaphore(getattr(settings, 'TELETHON_GAP_RECOVERY_CONCURRENCY', 4))
+        results = await asyncio.gather(
+            *(cls._recover_chat(client, semaphore, chat, last_id, entity) for chat, last_id, entity in behind),
+            return_exceptions=True,
+        )
+
+        stored = 0
+        for (chat, _, _), result in zip(behind, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Gap recovery of chat {chat.chat_id} for account {account_id} failed: {result}")
+            else:
+                stored += result
+
+        logger.info(f"✅ Account {account_id} recovered {stored} messages in {len(behind)} of {len(positions)} chats")
+        return stored
+
+    @staticmethod
+    def _stored_positions(account_id: int) -> Dict[int, Tuple[Chat, int]]:
+        """Map each stored chat of an account to its highest stored message ID, in two queries"""
+        last_ids = dict(
+            Message.objects.filter(chat__account_id=account_id)
+            .values('chat_id')
+            .annotate(last_id=Max('message_id'))
+            .values_list('chat_id', 'last_id')
+        )
+        return {
+            chat.chat_id: (chat, last_ids[chat.id])
+            for chat in Chat.objects.filter(type='account_chat', account_id=account_id)
+            if chat.id in last_ids
+        }
+
+    @classmethod
+    async def _recover_chat(cls, client, semaphore: asyncio.Semaphore, chat: Chat, last_id: int, entity) -> int:
+        """Fetch and store the messages of one chat newer than the stored ones"""
+        limit = getattr(settings, 'TELETHON_GAP_RECOVERY_MAX_MESSAGES', 1000)
+        max_retries = getattr(settings, 'TELETHON_GAP_RECOVERY_MAX_RETRIES', 3)
+
+        for attempt in range(max_retries + 1):
+            try:
+                async with semaphore:
+                    # Oldest first so a capped recovery still leaves a contiguous history
+                    messages = await client.get_messages(entity, min_id=last_id, limit=limit, reverse=True)
+                break
+            except FloodWaitError as e:
+                if attempt == max_retries:
+                    raise
+                # Waiting outside the semaphore lets other chats proceed meanwhile
+                logger.warning(f"⏳ Flood wait of {e.seconds}s recovering chat {chat.chat_id}, retry {attempt + 1}")
+                await asyncio.sleep(e.seconds)
+
+        if len(messages) >= limit:
+            logger.warning(f"⚠️ Chat {chat.chat_id} is more than {limit} messages behind, older ones are recovered first")
+
+        return await cls._store(chat, messages)
+
+    @staticmethod
+    async def _store(chat: Chat, messages: List) -> int:
+        """Queue recovered messages on the ingest writer, which inserts them in bulk and skips known ones"""
+        requests = [
+            IngestRequest(
+                message=EventHandler.build_message(chat, message, 'outgoing' if message.out else 'incoming'),
+                user=EventHandler.sender_spec(message.from_id, message.sender),
+            )
+            for message in messages
+            if not isinstance(message, MessageService)
+        ]
+        results = await asyncio.gather(*(MessageIngestWriter.aingest(request) for request in requests))
+        return sum(result.created for result in results)
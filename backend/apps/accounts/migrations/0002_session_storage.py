@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionEntity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('entity_id', models.BigIntegerField()),
+                ('data_enc', models.TextField()),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='session_entities', to='telegram_accounts.account')),
+            ],
+            options={
+                'db_table': 'session_entities',
+                'constraints': [models.UniqueConstraint(fields=('account', 'entity_id'), name='unique_session_entity')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SessionUpdateState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('entity_id', models.BigIntegerField()),
+                ('pts', models.IntegerField()),
+                ('qts', models.IntegerField(default=0)),
+                ('seq', models.IntegerField(default=0)),
+                ('date', models.DateTimeField(blank=True, null=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='session_update_states', to='telegram_accounts.account')),
+            ],
+            options={
+                'db_table': 'session_update_states',
+                'constraints': [models.UniqueConstraint(fields=('account', 'entity_id'), name='unique_session_update_state')],
+            },
+        ),
+    ]
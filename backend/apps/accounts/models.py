@@ -23,4 +23,32 @@ class Account(BaseModel):
         db_table = 'accounts'
 
     def __str__(self):
-        return f"{self.phone_number} ({self.tg_user_id})"
\ No newline at end of file
+        return f"{self.phone_number} ({self.tg_user_id})"
+
+class SessionEntity(BaseModel):
+    """Peer cached by an account's Telethon session so it resolves without a request"""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='session_entities')
+    entity_id = models.BigIntegerField()  # Marked peer ID, 0 holds the account's own ID
+    data_enc = models.TextField()  # Encrypted access hash, username, phone and name
+
+    class Meta:
+        db_table = 'session_entities'
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'entity_id'], name='unique_session_entity'),
+        ]
+
+
+class SessionUpdateState(BaseModel):
+    """Update sequence of an account's Telethon session, entity 0 is the account-wide state"""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='session_update_states')
+    entity_id = models.BigIntegerField()  # 0 or a channel ID
+    pts = models.IntegerField()
+    qts = models.IntegerField(default=0)
+    seq = models.IntegerField(default=0)
+    date = models.DateTimeField(null=True, blank=True)  # Only tracked for the account-wide state
+
+    class Meta:
+        db_table = 'session_update_states'
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'entity_id'], name='unique_session_update_state'),
+        ]
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List
+from django.conf import settings
+from telethon.errors import FloodWaitError
+
+logger = logging.getLogger('accounts')
+
+
+@dataclass
+class OutboundRequest:
+    """A send, edit or delete waiting for its turn on an account"""
+    op: str  # 'send', 'edit' or 'delete'
+    chat_id: int
+    kwargs: Dict[str, Any]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class OutboundScheduler:
+    """Per-account queues on the account runtime that space outbound calls and wait out flood waits"""
+
+    # Telegram deletes at most this many messages per call
+    MAX_DELETE_IDS = 100
+
+    _queues: Dict[int, Deque[OutboundRequest]] = {}
+    _wakeups: Dict[int, asyncio.Event] = {}
+    _workers: Dict[int, asyncio.Task] = {}
+    _blocked_until: Dict[int, float] = {}
+    calls = 0
+    dispatched = 0
+    coalesced = 0
+    flood_waits = 0
+    waited = 0.0
+    max_wait = 0.0
+
+    @classmethod
+    def submit(cls, account_id: int, op: str, chat_id: int, **kwargs) -> asyncio.Future:
+        """Queue a call, await the returned future for its result or leave it to run"""
+        future = asyncio.get_running_loop().create_future()
+        # Failures are logged when they happen, so a request nobody awaits does not warn again
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        cls._queues.setdefault(account_id, deque()).append(OutboundRequest(op, chat_id, kwargs, future))
+
+        worker = cls._workers.get(account_id)
+        if worker is None or worker.done():
+            cls._wakeups[account_id] = asyncio.Event()
+            cls._workers[account_id] = asyncio.create_task(cls._run(account_id))
+        cls._wakeups[account_id].set()
+        return future
+
+    @classmethod
+    def expected_wait(cls, account_id: int) -> float:
+        """Seconds a request queued now would wait before it is sent"""
+        blocked = max(cls._blocked_until.get(account_id, 0) - time.monotonic(), 0)
+        return blocked + len(cls._queues.get(account_id, ())) * cls._interval()
+
+    @classmethod
+    def stop(cls, account_id: int):
+        """Stop the queue of an account, failing what is still waiting"""
+        worker = cls._workers.pop(account_id, None)
+        if worker:
+            worker.cancel()
+        cls._wakeups.pop(account_id, None)
+        cls._blocked_until.pop(account_id, None)
+        for request in cls._queues.pop(account_id, ()):
+            if not request.future.done():
+                request.future.set_exception(ValueError(f"Account {account_id} stopped"))
+
+    @classmethod
+    async def _run(cls, account_id: int):
+        queue = cls._queues[account_id]
+        wakeup = cls._wakeups[account_id]
+        last_call = 0.0
+        while True:
+            if not queue:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+
+            delay = max(cls._blocked_until.get(account_id, 0), last_call + cls._interval()) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            batch = cls._take(queue)
+            if not batch:
+                continue
+            now = time.monotonic()
+            cls.dispatched += len(batch)
+            for request in batch:
+                wait = now - request.enqueued_at
+                cls.waited += wait
+                cls.max_wait = max(cls.max_wait, wait)
+
+            try:
+                result = await cls._call(account_id, batch)
+            except FloodWaitError as e:
+                cls.flood_waits += 1
+                if e.seconds > getattr(settings, 'TELETHON_OUTBOUND_MAX_FLOOD_WAIT', 300):
+                    logger.error(f"❌ Account {account_id} flood wait of {e.seconds}s is too long, dropping {len(batch)} requests")
+                    cls._fail(batch, e)
+                else:
+                    logger.warning(f"⏳ Account {account_id} flood wait of {e.seconds}s, holding {len(queue) + len(batch)} requests")
+                    cls._blocked_until[account_id] = time.monotonic() + e.seconds
+                    # Retried first once the wait is over, in their original order
+                    queue.extendleft(reversed(batch))
+            except asyncio.CancelledError:
+                cls._fail(batch, ValueError(f"Account {account_id} stopped"))
+                raise
+            except Exception as e:
+                logger.error(f"❌ Account {account_id} {batch[0].op} in chat {batch[0].chat_id} failed: {e}")
+                cls._fail(batch, e)
+            else:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_result(result)
+            last_call = time.monotonic()
+
+    @classmethod
+    def _take(cls, queue: Deque[OutboundRequest]) -> List[OutboundRequest]:
+        """Pop the next request, together with the queued deletes of the same chat"""
+        while queue:
+            first = queue.popleft()
+            # A cancelled request timed out at its caller, which may retry it
+            if not first.future.cancelled():
+                break
+        else:
+            return []
+        if first.op != 'delete':
+            return [first]
+
+        batch, ids = [first], len(first.kwargs['message_ids'])
+        for request in list(queue):
+            if request.op != 'delete' or request.chat_id != first.chat_id:
+                continue
+            if ids + len(request.kwargs['message_ids']) > cls.MAX_DELETE_IDS:
+                break
+            queue.remove(request)
+            if not request.future.cancelled():
+                batch.append(request)
+                ids += len(request.kwargs['message_ids'])
+        cls.coalesced += len(batch) - 1
+        return batch
+
+    @classmethod
+    async def _call(cls, account_id: int, batch: List[OutboundRequest]) -> Any:
+        from .telethon_manager import TelethonManager
+
+        client = TelethonManager.get_client(account_id)
+        if not client:
+            raise ValueError(f"Account {account_id} not found or not running")
+
+        first = batch[0]
+        cls.calls += 1
+        if first.op == 'send':
+            return await client.send_message(entity=first.chat_id, **first.kwargs)
+        if first.op == 'edit':
+            return await client.edit_message(entity=first.chat_id, **first.kwargs)
+        message_ids = [message_id for request in batch for message_id in request.kwargs['message_ids']]
+        return await client.delete_messages(entity=first.chat_id, message_ids=message_ids)
+
+    @staticmethod
+    def _fail(batch: List[OutboundRequest], error: Exception):
+        # The traceback would hold on to the worker's frame, which callers clearing it must not close
+        error = error.with_traceback(None)
+        for request in batch:
+            if not request.future.done():
+                request.future.set_exception(error)
+
+    @staticmethod
+    def _interval() -> float:
+        return getattr(settings, 'TELETHON_OUTBOUND_INTERVAL_MS', 100) / 1000
+
+    @classmethod
+    def get_account_stats(cls, account_id: int) -> dict:
+        """Get the queue depth and remaining flood wait of one account"""
+        return {
+            'queued': len(cls._queues.get(account_id, ())),
+            'flood_wait': round(max(cls._blocked_until.get(account_id, 0) - time.monotonic(), 0), 1),
+            'expected_wait': round(cls.expected_wait(account_id), 1),
+        }
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """Get queue depths, flood waits and how long requests waited"""
+        now = time.monotonic()
+        return {
+            'queued': sum(len(queue) for queue in cls._queues.values()),
+            'depth': {account_id: len(queue) for account_id, queue in cls._queues.items() if queue},
+            'blocked': {
+                account_id: round(until - now, 1)
+                for account_id, until in cls._blocked_until.items() if until > now
+            },
+            'calls': cls.calls,
+            'coalesced': cls.coalesced,
+            'flood_waits': cls.flood_waits,
+            'avg_wait_ms': round(cls.waited / cls.dispatched * 1000, 1) if cls.dispatched else 0,
+            'max_wait_ms': round(cls.max_wait * 1000, 1),
+        }
@@ -1,11 +1,12 @@
-import asyncio
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from django.conf import settings
 from django.utils import timezone
-from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError, PasswordHashInvalidError
 from .models import Account
+from apps.messages.models import BackfillCheckpoint
 from apps.core.encryption import encryption_service
-from .telethon_manager import TelethonManager
+from apps.core.leases import leased_ids
+from .supervisor import AccountRPC
 
 logger = logging.getLogger('accounts')
 
@@ -42,12 +43,8 @@ class AccountService:
     def initiate_login(account: Account) -> Dict[str, Any]:
         """Initiate login process for account"""
         try:
-            api_id = encryption_service.decrypt(account.api_id_enc)
-            api_hash = encryption_service.decrypt(account.api_hash_enc)
-            
-            result = asyncio.run(
-                AccountService._initiate_login_async(account.id, account.phone_number, api_id, api_hash)
-            )
+            # The pending login client lives on the supervisor until the code is verified
+            result = AccountRPC.call('initiate_login', account_id=account.id)
             
             if result['success']:
                 account.status = 'login_required'
@@ -59,35 +56,15 @@ class AccountService:
             logger.error(f"Failed to initiate login for account {account.id}: {e}")
             return {'success': False, 'error': str(e)}
     
-    @staticmethod
-    async def _initiate_login_async(account_id: int, phone_number: str, api_id: str, api_hash: str) -> Dict[str, Any]:
-        """Initiate login asynchronously"""
-        try:
-            success = await TelethonManager.initiate_login(account_id, phone_number, api_id, api_hash)
-            return {'success': success}
-        except Exception as e:
-            logger.error(f"Error in async login initiation: {e}")
-            return {'success': False, 'error': str(e)}
-    
     @staticmethod
     def verify_login(account: Account, code: str, password: Optional[str] = None) -> Dict[str, Any]:
         """Verify login code and complete authentication"""
         try:
-            result = asyncio.run(
-                AccountService._verify_login_async(account.id, code, password)
-            )
+            # The supervisor stores the encrypted session itself
+            result = AccountRPC.call('verify_login', account_id=account.id, code=code, password=password)
             
             if result['success']:
-                # Update account with user ID and session
-                account.tg_user_id = result.get('user_id')
-                account.status = 'active'
-                account.last_seen = timezone.now()
-                
-                # Store encrypted session
-                if result.get('session'):
-                    account.session_enc = encryption_service.encrypt(result['session'])
-                
-                account.save()
+                account.refresh_from_db()
                 logger.info(f"Successfully logged in account {account.phone_number}")
             
             return result
@@ -96,15 +73,6 @@ class AccountService:
             logger.error(f"Failed to verify login for account {account.id}: {e}")
             return {'success': False, 'error': str(e)}
     
-    @staticmethod
-    async def _verify_login_async(account_id: int, code: str, password: Optional[str] = None) -> Dict[str, Any]:
-        """Verify login asynchronously"""
-        try:
-            return await TelethonManager.verify_login(account_id, code, password)
-        except Exception as e:
-            logger.error(f"Error in async login verification: {e}")
-            return {'success': False, 'error': str(e)}
-    
     @staticmethod
     def start_account(account: Account) -> bool:
         """Start an account client"""
@@ -113,13 +81,7 @@ class AccountService:
                 logger.error(f"Account {account.id} has no session - login required")
                 return False
             
-            api_id = encryption_service.decrypt(account.api_id_enc)
-            api_hash = encryption_service.decrypt(account.api_hash_enc)
-            session = encryption_service.decrypt(account.session_enc)
-            
-            success = asyncio.run(
-                TelethonManager.start_account(account.id, api_id, api_hash, session)
-            )
+            success = AccountRPC.call('start_account', account_id=account.id)
             
             if success:
                 account.status = 'active'
@@ -142,7 +104,7 @@ class AccountService:
     def stop_account(account: Account) -> bool:
         """Stop an account client"""
         try:
-            success = asyncio.run(TelethonManager.stop_account(account.id))
+            success = AccountRPC.call('stop_account', account_id=account.id)
             
             if success:
                 account.status = 'inactive'
@@ -163,8 +125,67 @@ class AccountService:
             if not account.session_enc:
                 return False
             
-            result = asyncio.run(TelethonManager.test_account(account.id))
-            return result
+            return AccountRPC.call('test_account', account_id=account.id)
         except Exception as e:
             logger.error(f"Failed to test account {account.id}: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    @staticmethod
+    def get_active_accounts() -> list:
+        """Get IDs of accounts with a running client"""
+        if getattr(settings, 'WORKER_SHARDING', False):
+            # Spread over the workers, the lease table is the only complete view
+            return leased_ids('account')
+        return AccountRPC.call('active_accounts')
+    
+    @staticmethod
+    def send_message(account_id: int, chat_id: int, text: str, wait: bool = True) -> Optional[int]:
+        """Send a message via a running account, returns the Telegram message ID or None when it was left queued"""
+        return AccountRPC.call(
+            'send_message', account_id=account_id, chat_id=chat_id, text=text, wait=wait
+        )['message_id']
+    
+    @staticmethod
+    def edit_message(account_id: int, chat_id: int, message_id: int, text: str, wait: bool = True):
+        """Edit a message via a running account"""
+        AccountRPC.call(
+            'edit_message', account_id=account_id, chat_id=chat_id, message_id=message_id, text=text, wait=wait
+        )
+    
+    @staticmethod
+    def delete_message(account_id: int, chat_id: int, message_id: int, wait: bool = True):
+        """Delete a message via a running account"""
+        AccountRPC.call('delete_message', account_id=account_id, chat_id=chat_id, message_id=message_id, wait=wait)
+    
+    @staticmethod
+    def get_outbound_stats(account: Account) -> Dict[str, Any]:
+        """Get the outbound queue depth and flood wait of an account"""
+        return AccountRPC.call('outbound_stats', account_id=account.id)
+    
+    @staticmethod
+    def start_backfill(account: Account, chat_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Start importing the history of an account, all dialogs unless Telegram chat IDs are given"""
+        return AccountRPC.call('backfill', account_id=account.id, chat_ids=chat_ids)
+    
+    @staticmethod
+    def is_backfill_running(account: Account) -> bool:
+        """Check whether a history import of the account is in progress"""
+        return AccountRPC.call('backfill_running', account_id=account.id)
+    
+    @staticmethod
+    def get_backfill_progress(account: Account, chat_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """Get the import checkpoint of every chat of the account"""
+        checkpoints = BackfillCheckpoint.objects.filter(chat__account_id=account.id).select_related('chat')
+        if chat_ids:
+            checkpoints = checkpoints.filter(chat__chat_id__in=chat_ids)
+        return [
+            {
+                'chat_id': checkpoint.chat.chat_id,
+                'title': checkpoint.chat.title,
+                'last_message_id': checkpoint.last_message_id,
+                'imported': checkpoint.imported,
+                'completed': checkpoint.completed_at is not None,
+                'updated_at': checkpoint.updated_at.isoformat(),
+            }
+            for checkpoint in checkpoints.order_by('chat__chat_id')
+        ]
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set, Tuple
+from django.db import connection, transaction
+from django.utils import timezone
+from telethon.sessions import MemorySession, StringSession
+from telethon.tl.types.updates import State
+from apps.core.encryption import encryption_service
+from .models import Account, SessionEntity, SessionUpdateState
+
+logger = logging.getLogger('accounts')
+
+# One writer keeps the writes of a session in the order they were made
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='telethon-session')
+
+
+class DatabaseSession(StringSession):
+    """Telethon session keeping auth, entity cache and update state in the database, writing only what changed"""
+
+    def __init__(self, account_id: int, string: Optional[str] = None):
+        super().__init__(string)
+        self.account_id = account_id
+        self._stored_auth = string or ''
+        self._rows: Dict[int, tuple] = {}
+        self._dirty_entities: Set[int] = set()
+        self._dirty_states: Set[int] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, account: Account) -> 'DatabaseSession':
+        """Build the session of an account from its stored auth, entities and update states"""
+        session = cls(account.id, encryption_service.decrypt(account.session_enc) if account.session_enc else None)
+
+        for entity_id, data_enc in SessionEntity.objects.filter(account=account).values_list('entity_id', 'data_enc'):
+            row = (entity_id, *json.loads(encryption_service.decrypt(data_enc)))
+            session._rows[entity_id] = row
+            session._entities.add(row)
+
+        for state in SessionUpdateState.objects.filter(account=account):
+            # Channels only need their pts, Telethon dates them itself
+            session._update_states[state.entity_id] = State(
+                state.pts, state.qts, state.date or timezone.now(), state.seq, unread_count=0
+            )
+
+        logger.info(
+            f"🔑 Loaded session of account {account.id} with {len(session._rows)} entities "
+            f"and {len(session._update_states)} update states"
+        )
+        return session
+
+    @staticmethod
+    def forget(account_id: int):
+        """Drop the cached entities and update states, e.g. after logging in again"""
+        SessionEntity.objects.filter(account_id=account_id).delete()
+        SessionUpdateState.objects.filter(account_id=account_id).delete()
+
+    def clone(self, to_instance=None):
+        # Senders for other data centers get their own auth key, which must not replace the stored one
+        return to_instance or MemorySession()
+
+    def process_entities(self, tlo):
+        """Remember new and changed peers, called for every response and update"""
+        for row in self._entities_to_rows(tlo):
+            known = self._rows.get(row[0])
+            if known == row:
+                continue
+            if known is not None:
+                self._entities.discard(known)
+            self._entities.add(row)
+            self._rows[row[0]] = row
+            with self._lock:
+                self._dirty_entities.add(row[0])
+
+    def set_update_state(self, entity_id, state):
+        super().set_update_state(entity_id, state)
+        with self._lock:
+            self._dirty_states.add(entity_id)
+
+    def save(self):
+        """Persist what changed since the last save, off the event loop when called from one"""
+        changes = self._take_changes()
+        if changes is None:
+            return None
+        # Telethon saves about once a minute and on disconnect
+        return self._off_loop(self._write_changes, changes)
+
+    def close(self):
+        self.save()
+
+    def delete(self):
+        """Forget everything stored for the account, Telethon calls this when logging out"""
+        return self._off_loop(self._delete)
+
+    def _delete(self):
+        Account.objects.filter(id=self.account_id).update(session_enc=None, updated_at=timezone.now())
+        self.forget(self.account_id)
+
+    @staticmethod
+    def _off_loop(fn, *args):
+        """Run database work inline, or on the session writer when called from an event loop it must not block"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return fn(*args)
+        return _writer.submit(fn, *args)
+
+    def _take_changes(self) -> Optional[Tuple[Optional[str], Dict[int, tuple], Dict[int, State]]]:
+        auth = StringSession.save(self)
+        auth = auth if auth and auth != self._stored_auth else None
+        with self._lock:
+            entities = {entity_id: self._rows[entity_id] for entity_id in self._dirty_entities}
+            states = {entity_id: self._update_states[entity_id] for entity_id in self._dirty_states}
+            self._dirty_entities.clear()
+            self._dirty_states.clear()
+
+        if auth is None and not entities and not states:
+            return None
+        if auth is not None:
+            self._stored_auth = auth
+        return auth, entities, states
+
+    def _write_changes(self, changes: Tuple[Optional[str], Dict[int, tuple], Dict[int, State]]):
+        auth, entities, states = changes
+        try:
+            self._write(auth, entities, states)
+        except Exception as e:
+            logger.error(f"❌ Failed to save session of account {self.account_id}: {e}")
+            # The writer thread outlives database restarts, a broken connection is replaced for the next save
+            connection.close_if_unusable_or_obsolete()
+            # Written again with the next save
+            with self._lock:
+                self._dirty_entities.update(entities)
+                self._dirty_states.update(states)
+            if auth is not None:
+                self._stored_auth = ''
+
+    def _write(self, auth: Optional[str], entities: Dict[int, tuple], states: Dict[int, State]):
+        """Upsert the changed rows in one transaction"""
+        now = timezone.now()
+        with transaction.atomic():
+            if auth is not None:
+                # A queryset update keeps the write out of the Account save signals
+                Account.objects.filter(id=self.account_id).update(
+                    session_enc=encryption_service.encrypt(auth), updated_at=now
+                )
+
+            if entities:
+                SessionEntity.objects.bulk_create(
+                    [
+                        SessionEntity(
+                            account_id=self.account_id,
+                            entity_id=entity_id,
+                            data_enc=encryption_service.encrypt(json.dumps(row[1:])),
+                            updated_at=now,
+                        )
+                        for entity_id, row in entities.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['account', 'entity_id'],
+                    update_fields=['data_enc', 'updated_at'],
+                )
+
+            if states:
+                SessionUpdateState.objects.bulk_create(
+                    [
+                        SessionUpdateState(
+                            account_id=self.account_id,
+                            entity_id=entity_id,
+                            pts=state.pts,
+                            qts=state.qts,
+                            seq=state.seq,
+                            date=state.date if entity_id == 0 else None,
+                            updated_at=now,
+                        )
+                        for entity_id, state in states.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['account', 'entity_id'],
+                    update_fields=['pts', 'qts', 'seq', 'date', 'updated_at'],
+                )
@@ -0,0 +1,48 @@
+import asyncio
+from asgiref.sync import async_to_sync
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Account
+from .supervisor import AccountRPC
+from .telethon_manager import TelethonManager
+
+# Saves touching only other fields, e.g. last_seen, leave running clients alone
+REFRESH_FIELDS = {'status', 'session_enc', 'tg_user_id', 'phone_number'}
+
+# Notifications sent from async code, kept until they went out
+_pending = set()
+
+
+def _notify_refresh(account_id: int):
+    """Send the refresh from the saving thread, or as a task when that thread runs an event loop"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        async_to_sync(AccountRPC.anotify)('refresh_account', account_id=account_id)
+        return
+    task = loop.create_task(AccountRPC.anotify('refresh_account', account_id=account_id))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+def _refresh_elsewhere(account_id: int, update_fields=None):
+    """Hand the change to the supervisor or worker hosting the client when it runs in another process"""
+    if update_fields is not None and not REFRESH_FIELDS.intersection(update_fields):
+        return
+    if AccountRPC.is_remote() and TelethonManager.get_client(account_id) is None:
+        transaction.on_commit(lambda: _notify_refresh(account_id))
+
+
+@receiver(post_save, sender=Account)
+def refresh_account_handlers(sender, instance, update_fields=None, **kwargs):
+    """Keep the Account row held by a running client in sync with saved changes"""
+    TelethonManager.refresh_account(instance.id, instance)
+    _refresh_elsewhere(instance.id, update_fields)
+
+
+@receiver(post_delete, sender=Account)
+def evict_account_handlers(sender, instance, **kwargs):
+    """Let a running client ignore events of a deleted account, a remote one is stopped"""
+    TelethonManager.refresh_account(instance.id)
+    _refresh_elsewhere(instance.id)
@@ -0,0 +1,406 @@
+import asyncio
+import logging
+import random
+from typing import Any, Dict, List, Optional, Set
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
+from apps.core.encryption import encryption_service
+from apps.core.leases import LeasedKind, lease_owner
+from apps.core.runtime import account_runtime
+from .models import Account
+from .outbound import OutboundScheduler
+from .session import DatabaseSession
+from .telethon_manager import TelethonManager
+
+logger = logging.getLogger('accounts')
+
+# Channel layer channel the supervisor process listens on
+RPC_CHANNEL = 'telethon.supervisor'
+
+
+def worker_channel(worker_id: str) -> str:
+    """Channel a sharded worker answers account RPC calls on"""
+    return f'{RPC_CHANNEL}.{worker_id}'
+
+
+class AccountRPCError(Exception):
+    """Raised when the account supervisor cannot complete a call"""
+
+
+class AccountRPCTimeout(AccountRPCError):
+    """Raised when the account supervisor does not answer in time"""
+
+
+class TelethonSupervisor:
+    """Owns every Telethon client on the account runtime and reconnects dropped ones with backoff"""
+
+    # Entry points other processes may call, they take and return plain data only
+    METHODS = (
+        'start_account', 'stop_account', 'test_account', 'active_accounts',
+        'initiate_login', 'verify_login', 'send_message', 'edit_message', 'delete_message',
+        'backfill', 'backfill_running', 'outbound_stats', 'refresh_account',
+    )
+
+    _watchers: Dict[int, asyncio.Task] = {}
+    _backfills: Dict[int, asyncio.Task] = {}
+    _tasks: Set[asyncio.Task] = set()
+    _server: Optional[asyncio.Task] = None
+    reconnects = 0
+
+    @classmethod
+    async def dispatch(cls, method: str, kwargs: Dict[str, Any]) -> Any:
+        """Run an RPC method on the account runtime"""
+        if method not in cls.METHODS:
+            raise AccountRPCError(f"Unknown account RPC method {method}")
+        return await getattr(cls, method)(**kwargs)
+
+    @classmethod
+    async def start_account(cls, account_id: int) -> bool:
+        """Start a client from the stored credentials and watch its connection"""
+        account = await Account.objects.filter(id=account_id).afirst()
+        if account is None or not account.session_enc:
+            logger.error(f"Account {account_id} has no session - login required")
+            return False
+
+        # Entities and update state come back with the auth key, so the client starts warm
+        session = await sync_to_async(DatabaseSession.load)(account)
+        started = await TelethonManager.start_account(
+            account_id,
+            encryption_service.decrypt(account.api_id_enc),
+            encryption_service.decrypt(account.api_hash_enc),
+            session,
+            account,
+        )
+        if started and account_id not in cls._watchers:
+            cls._watchers[account_id] = asyncio.create_task(cls._watch(account_id))
+            cls._recover_later(account_id)
+        return started
+
+    @classmethod
+    async def stop_account(cls, account_id: int) -> bool:
+        """Stop watching and disconnect a client"""
+        for tasks in (cls._watchers, cls._backfills):
+            task = tasks.pop(account_id, None)
+            if task:
+                task.cancel()
+        return await TelethonManager.stop_account(account_id)
+
+    @classmethod
+    async def test_account(cls, account_id: int) -> bool:
+        return await TelethonManager.test_account(account_id)
+
+    @classmethod
+    async def active_accounts(cls) -> list:
+        return TelethonManager.get_active_accounts()
+
+    @classmethod
+    async def initiate_login(cls, account_id: int) -> Dict[str, Any]:
+        """Send the login code, the pending login stays on the account runtime"""
+        account = await Account.objects.aget(id=account_id)
+        success = await TelethonManager.initiate_login(
+            account_id,
+            account.phone_number,
+            encryption_service.decrypt(account.api_id_enc),
+            encryption_service.decrypt(account.api_hash_enc),
+        )
+        return {'success': success}
+
+    @classmethod
+    async def verify_login(cls, account_id: int, code: str, password: Optional[str] = None) -> Dict[str, Any]:
+        """Complete a pending login and store the encrypted session, which never leaves this process"""
+        result = await TelethonManager.verify_login(account_id, code, password)
+        session = result.pop('session', None)
+        if result['success']:
+            account = await Account.objects.aget(id=account_id)
+            account.tg_user_id = result.get('user_id')
+            account.status = 'active'
+            account.last_seen = timezone.now()
+            if session:
+                account.session_enc = encryption_service.encrypt(session)
+                # Peers and update state of a previous login may belong to another user
+                await sync_to_async(DatabaseSession.forget)(account_id)
+            await account.asave()
+        return result
+
+    @classmethod
+    async def send_message(cls, account_id: int, chat_id: int, text: str, wait: bool = True) -> Dict[str, Any]:
+        message = await cls._outbound(account_id, TelethonManager.send_message(account_id, chat_id, text), wait)
+        return {'message_id': message.id if message else None, 'queued': message is None}
+
+    @classmethod
+    async def edit_message(cls, account_id: int, chat_id: int, message_id: int, text: str, wait: bool = True) -> bool:
+        await cls._outbound(account_id, TelethonManager.edit_message(account_id, chat_id, message_id, text), wait)
+        return True
+
+    @classmethod
+    async def delete_message(cls, account_id: int, chat_id: int, message_id: int, wait: bool = True) -> bool:
+        await cls._outbound(account_id, TelethonManager.delete_message(account_id, chat_id, message_id), wait)
+        return True
+
+    @classmethod
+    async def refresh_account(cls, account_id: int) -> bool:
+        """Pick up an Account row another process saved, stopping the client once the row is deleted"""
+        if TelethonManager.get_client(account_id) is None:
+            return False
+        account = await Account.objects.filter(id=account_id).afirst()
+        if account is None:
+            return await cls.stop_account(account_id)
+        TelethonManager.refresh_account(account_id, account)
+        return True
+
+    @classmethod
+    async def outbound_stats(cls, account_id: int) -> Dict[str, Any]:
+        return OutboundScheduler.get_account_stats(account_id)
+
+    @classmethod
+    async def _outbound(cls, account_id: int, call, wait: bool) -> Any:
+        """Await an outbound call for up to half the RPC timeout, then or when asked to leave it queued"""
+        deadline = settings.TELETHON_RPC_TIMEOUT / 2
+        if wait and OutboundScheduler.expected_wait(account_id) < deadline:
+            task = cls._background(call)
+            try:
+                # Answering before the caller times out keeps a queued call from looking failed and being retried
+                return await asyncio.wait_for(asyncio.shield(task), deadline)
+            except asyncio.TimeoutError:
+                logger.warning(f"⏳ Account {account_id} outbound call is still queued after {deadline:.0f}s")
+                return None
+
+        if TelethonManager.get_client(account_id) is None:
+            call.close()
+            raise ValueError(f"Account {account_id} not found or not running")
+        cls._background(call)
+        return None
+
+    @classmethod
+    def _background(cls, call) -> asyncio.Task:
+        task = asyncio.create_task(call)
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+        # TelethonManager logs failures, nobody else is waiting for them once the call is left queued
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    @classmethod
+    async def backfill(cls, account_id: int, chat_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Start importing the history of an account's dialogs in the background, starting its client if needed"""
+        from .backfill import HistoryBackfill
+
+        if await cls.backfill_running(account_id):
+            return {'started': False, 'running': True}
+
+        client = TelethonManager.get_client(account_id)
+        if client is None and await cls.start_account(account_id):
+            client = TelethonManager.get_client(account_id)
+        if client is None:
+            return {'started': False, 'running': False}
+
+        cls._backfills[account_id] = asyncio.create_task(HistoryBackfill.run(account_id, client, chat_ids))
+        return {'started': True, 'running': True}
+
+    @classmethod
+    async def backfill_running(cls, account_id: int) -> bool:
+        task = cls._backfills.get(account_id)
+        return task is not None and not task.done()
+
+    @classmethod
+    async def start_all(cls) -> int:
+        """Start every active account concurrently, returns how many are running"""
+        account_ids = [account_id async for account_id in Account.objects.filter(status='active').values_list('id', flat=True)]
+        return len(await cls.start_many(account_ids))
+
+    @classmethod
+    async def start_many(cls, account_ids: List[int], concurrency: Optional[int] = None) -> List[int]:
+        """Start accounts with bounded parallelism, returns the IDs that are running"""
+        semaphore = asyncio.Semaphore(concurrency or getattr(settings, 'TELETHON_START_CONCURRENCY', 10))
+
+        async def start_one(account_id: int) -> bool:
+            async with semaphore:
+                return await cls.start_account(account_id)
+
+        results = await asyncio.gather(*(start_one(account_id) for account_id in account_ids))
+        return [account_id for account_id, started in zip(account_ids, results) if started]
+
+    @classmethod
+    async def stop_many(cls, account_ids: List[int]):
+        await asyncio.gather(*(cls.stop_account(account_id) for account_id in account_ids))
+
+    @classmethod
+    def leased(cls) -> LeasedKind:
+        """Let the worker leases decide which accounts this process hosts"""
+        return LeasedKind(
+            kind='account',
+            load_ids=lambda: Account.objects.filter(status='active').exclude(session_enc=None).values_list('id', flat=True),
+            start=lambda account_ids: account_runtime.run(cls.start_many(account_ids)),
+            stop=lambda account_ids: account_runtime.run(cls.stop_many(account_ids)),
+        )
+
+    @classmethod
+    async def shutdown(cls):
+        """Stop the RPC server and disconnect every client"""
+        if cls._server:
+            cls._server.cancel()
+            cls._server = None
+        for account_id in TelethonManager.get_active_accounts():
+            await cls.stop_account(account_id)
+
+    @classmethod
+    async def _watch(cls, account_id: int):
+        """Reconnect a client once Telethon's own retries gave up, backing off exponentially with jitter"""
+        min_delay = getattr(settings, 'TELETHON_RECONNECT_MIN_DELAY', 1)
+        max_delay = getattr(settings, 'TELETHON_RECONNECT_MAX_DELAY', 300)
+
+        while True:
+            client = TelethonManager.get_client(account_id)
+            if client is None:
+                return
+            try:
+                await client.disconnected
+            except Exception as e:
+                logger.warning(f"🔌 Account {account_id} connection lost: {e}")
+
+            delay = min_delay
+            attempt = 0
+            while not client.is_connected():
+                # A deliberate stop removes the client, nothing to reconnect then
+                if TelethonManager.get_client(account_id) is not client:
+                    return
+                attempt += 1
+                wait = delay * random.uniform(0.5, 1.5)
+                logger.warning(f"🔄 Reconnecting account {account_id} in {wait:.1f}s (attempt {attempt})")
+                await asyncio.sleep(wait)
+                try:
+                    await client.connect()
+                except Exception as e:
+                    logger.error(f"❌ Reconnect of account {account_id} failed: {e}")
+                    delay = min(delay * 2, max_delay)
+
+            cls.reconnects += 1
+            logger.info(f"✅ Account {account_id} reconnected after {attempt} attempts")
+            try:
+                await TelethonManager.refresh(account_id)
+            except Exception as e:
+                logger.error(f"❌ Could not refresh account {account_id} after reconnect: {e}")
+            cls._recover_later(account_id)
+
+    @classmethod
+    def _recover_later(cls, account_id: int):
+        """Catch up on messages missed while the client was down without delaying the caller"""
+        from .gap_recovery import GapRecovery
+
+        client = TelethonManager.get_client(account_id)
+        if client is None or not getattr(settings, 'TELETHON_GAP_RECOVERY', True):
+            return
+        task = asyncio.create_task(GapRecovery.recover(account_id, client))
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+
+    @classmethod
+    async def serve(cls, channel: str = RPC_CHANNEL):
+        """Start answering RPC calls from other processes over the channel layer"""
+        cls._server = asyncio.create_task(cls._serve(channel))
+
+    @classmethod
+    async def _serve(cls, channel: str):
+        layer = get_channel_layer()
+        while True:
+            request = await layer.receive(channel)
+            task = asyncio.create_task(cls._answer(layer, request))
+            cls._tasks.add(task)
+            task.add_done_callback(cls._tasks.discard)
+
+    @classmethod
+    async def _answer(cls, layer, request: Dict[str, Any]):
+        try:
+            reply = {'ok': True, 'result': await cls.dispatch(request['method'], request.get('kwargs', {}))}
+        except Exception as e:
+            logger.error(f"❌ Account RPC {request.get('method')} failed: {e}")
+            reply = {'ok': False, 'error': str(e)}
+        # Notifications expect no answer
+        if request.get('reply_to'):
+            await layer.send(request['reply_to'], {'type': 'account.rpc.reply', **reply})
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """Get running client and reconnect counters"""
+        return {
+            'clients': len(TelethonManager.get_active_accounts()),
+            'watched': len(cls._watchers),
+            'reconnects': cls.reconnects,
+            'backfills': sum(not task.done() for task in cls._backfills.values()),
+            'outbound': OutboundScheduler.get_stats(),
+        }
+
+
+class AccountRPC:
+    """Calls into the Telethon supervisor, in-process unless TELETHON_SUPERVISOR or WORKER_SHARDING host the clients elsewhere"""
+
+    @staticmethod
+    def is_remote() -> bool:
+        return getattr(settings, 'TELETHON_SUPERVISOR', False) or getattr(settings, 'WORKER_SHARDING', False)
+
+    @staticmethod
+    def call(method: str, **kwargs) -> Any:
+        """Blocking call for sync views, services and commands"""
+        timeout = getattr(settings, 'TELETHON_RPC_TIMEOUT', 30)
+        if not AccountRPC.is_remote():
+            try:
+                return account_runtime.run(TelethonSupervisor.dispatch(method, kwargs), timeout)
+            except TimeoutError:
+                raise AccountRPCTimeout(f"Account call {method} timed out")
+        return async_to_sync(AccountRPC.acall)(method, **kwargs)
+
+    @staticmethod
+    async def acall(method: str, **kwargs) -> Any:
+        """Await a call from any event loop"""
+        timeout = getattr(settings, 'TELETHON_RPC_TIMEOUT', 30)
+        if not AccountRPC.is_remote():
+            try:
+                return await asyncio.wait_for(account_runtime.arun(TelethonSupervisor.dispatch(method, kwargs)), timeout)
+            except asyncio.TimeoutError:
+                raise AccountRPCTimeout(f"Account call {method} timed out")
+
+        channel = await AccountRPC._channel(method, kwargs)
+        layer = get_channel_layer()
+        reply_to = await layer.new_channel()
+        await layer.send(channel, {
+            'type': 'account.rpc',
+            'method': method,
+            'kwargs': kwargs,
+            'reply_to': reply_to,
+        })
+        try:
+            reply = await asyncio.wait_for(layer.receive(reply_to), timeout)
+        except asyncio.TimeoutError:
+            raise AccountRPCTimeout(f"Account supervisor did not answer {method} within {timeout}s")
+
+        if not reply['ok']:
+            raise AccountRPCError(reply['error'])
+        return reply['result']
+
+    @staticmethod
+    async def anotify(method: str, **kwargs):
+        """Send a call to the process hosting the account without waiting for an answer, failures are only logged"""
+        try:
+            channel = await AccountRPC._channel(method, kwargs)
+            await get_channel_layer().send(channel, {
+                'type': 'account.rpc',
+                'method': method,
+                'kwargs': kwargs,
+                'reply_to': None,
+            })
+        except Exception as e:
+            logger.warning(f"⚠️ Could not notify the account supervisor of {method}: {e}")
+
+    @staticmethod
+    async def _channel(method: str, kwargs: Dict[str, Any]) -> str:
+        """Channel of the supervisor hosting the account, sharded workers each have their own"""
+        if not getattr(settings, 'WORKER_SHARDING', False):
+            return RPC_CHANNEL
+
+        account_id = kwargs.get('account_id')
+        worker_id = account_id and await sync_to_async(lease_owner)('account', account_id)
+        if not worker_id:
+            raise AccountRPCError(f"No worker hosts account {account_id} for {method}")
+        return worker_channel(worker_id)
@@ -1,11 +1,15 @@
 import asyncio
 import logging
 from typing import Dict, Optional, Any
+from django.conf import settings
 from telethon import TelegramClient
 from telethon.sessions import StringSession
 from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError, PasswordHashInvalidError
 from telethon import events
 from telethon_clients.event_handler import EventHandler
+from apps.chats.cache import ChatCache
+from apps.core.log import log_event
+from .outbound import OutboundScheduler
 
 logger = logging.getLogger('accounts')
 
@@ -16,6 +20,8 @@ class TelethonManager:
     _clients: Dict[int, TelegramClient] = {}
     _login_sessions: Dict[int, TelegramClient] = {}
     _handlers: Dict[int, EventHandler] = {}
+    # Telegram identity of each running account, captured when its client starts
+    _identities: Dict[int, Any] = {}
     
     @classmethod
     async def initiate_login(cls, account_id: int, phone_number: str, api_id: str, api_hash: str) -> bool:
@@ -89,15 +95,19 @@ class TelethonManager:
             return {'success': False, 'error': str(e)}
     
     @classmethod
-    async def start_account(cls, account_id: int, api_id: str, api_hash: str, session_string: str) -> bool:
-        """Start account client"""
+    async def start_account(cls, account_id: int, api_id: str, api_hash: str, session,
+                            account=None) -> bool:
+        """Start account client from a session string or object, handlers keep the given Account row"""
         try:
             if account_id in cls._clients:
                 logger.warning(f"Account {account_id} is already running")
                 return True
             
-            # Create client with existing session
-            client = TelegramClient(StringSession(session_string), api_id, api_hash)
+            # Create client with existing session, a stored update state lets Telethon replay what was missed
+            if isinstance(session, str):
+                session = StringSession(session)
+            catch_up = getattr(settings, 'TELETHON_CATCH_UP', True) and bool(session.get_update_states())
+            client = TelegramClient(session, api_id, api_hash, catch_up=catch_up)
             await client.connect()
             
             # Verify session is valid
@@ -109,8 +119,12 @@ class TelethonManager:
                 await client.disconnect()
                 return False
             
+            if account is None:
+                from .models import Account
+                account = await Account.objects.filter(id=account_id).afirst()
+            
             # Set up event handlers
-            handler = EventHandler(account_id)
+            handler = EventHandler(account_id, account)
             
             client.add_event_handler(handler.handle_new_message, events.NewMessage(incoming=True))
             client.add_event_handler(handler.handle_outgoing_message, events.NewMessage(outgoing=True))
@@ -120,6 +134,7 @@ class TelethonManager:
             # Store client and handler
             cls._clients[account_id] = client
             cls._handlers[account_id] = handler
+            cls._identities[account_id] = me
             
             logger.info(f"Started account client {account_id}")
             return True
@@ -147,8 +162,9 @@ class TelethonManager:
             
             # Remove from storage
             del cls._clients[account_id]
-            if account_id in cls._handlers:
-                del cls._handlers[account_id]
+            OutboundScheduler.stop(account_id)
+            cls._handlers.pop(account_id, None)
+            cls._identities.pop(account_id, None)
             
             logger.info(f"Stopped account client {account_id}")
             return True
@@ -178,48 +194,76 @@ class TelethonManager:
         """Get client instance"""
         return cls._clients.get(account_id)
     
+    @classmethod
+    def get_identity(cls, account_id: int):
+        """Get the Telegram user a running account is logged in as"""
+        return cls._identities.get(account_id)
+    
+    @classmethod
+    def refresh_account(cls, account_id: int, account=None):
+        """Hand a saved Account row to the handlers of its running client, None once it was deleted"""
+        handler = cls._handlers.get(account_id)
+        if handler is not None:
+            handler.account = account
+    
+    @classmethod
+    async def refresh(cls, account_id: int):
+        """Re-read the identity and Account row of a running client, e.g. after it reconnected"""
+        from .models import Account
+        
+        client = cls._clients.get(account_id)
+        if client is None:
+            return
+        cls._identities[account_id] = await client.get_me()
+        cls.refresh_account(account_id, await Account.objects.filter(id=account_id).afirst())
+    
     @classmethod
     async def send_message(cls, account_id: int, chat_id: int, text: str, **kwargs):
         """Send message via account"""
         try:
-            client = cls.get_client(account_id)
-            if not client:
+            if not cls.get_client(account_id):
                 raise ValueError(f"Account {account_id} not found or not running")
             
-            message = await client.send_message(entity=chat_id, message=text, **kwargs)
+            # Queued behind the account's other outbound calls and any flood wait
+            message = await OutboundScheduler.submit(account_id, 'send', chat_id, message=text, **kwargs)
             
             # Save outgoing message to database
             from apps.chats.models import Chat
             from apps.messages.models import Message
-            from apps.notifications.services import NotificationService
+            from apps.messages.ingest import IngestRequest, MessageIngestWriter
             
             try:
-                chat_obj = await Chat.objects.aget(account_id=account_id, chat_id=chat_id)
-                me = await client.get_me()
-                saved_message = await Message.objects.acreate(
+                chat_obj = ChatCache.get('account_chat', account_id, chat_id)
+                if chat_obj is None:
+                    chat_obj = await Chat.objects.aget(account_id=account_id, chat_id=chat_id)
+                    ChatCache.remember([chat_obj])
+                # The outgoing event handler may store the same message first, writes are conflict-free
+                # and only the copy that is actually stored gets a notification
+                result = await MessageIngestWriter.aingest(IngestRequest(notify='new_message', message=Message(
                     chat=chat_obj,
                     message_id=message.id,
-                    from_id=me.id,
+                    from_id=cls._identities[account_id].id,
                     text=text,
                     direction='outgoing',
                     payload={
                         'sent_via': 'web_api',
                         'date': message.date.isoformat() if message.date else None
                     }
+                )))
+                log_event(
+                    logger, logging.DEBUG, 'account_outgoing',
+                    "✅ Account %s sent message %s to chat %s (%s)",
+                    account_id, message.id, chat_id, 'stored' if result.created else 'duplicate',
+                    account_id=account_id,
+                    chat_id=chat_id,
+                    message_id=message.id,
+                    stored=result.created,
                 )
-                logger.info(f"✅ Saved outgoing message for account {account_id} via web API")
-                
-                # Send notification for the outgoing message
-                try:
-                    await NotificationService.send_message_notification('new_message', chat_obj, saved_message)
-                    logger.info(f"📡 Sent notification for outgoing account message {saved_message.id}")
-                except Exception as notification_error:
-                    logger.error(f"❌ Failed to send notification for outgoing account message: {notification_error}")
                     
             except Chat.DoesNotExist:
                 logger.warning(f"Chat {chat_id} not found for account {account_id}")
-            except Exception as e:
-                logger.error(f"Error saving outgoing message: {e}")
+            except Exception:
+                logger.exception("Error saving outgoing message of account %s to chat %s", account_id, chat_id)
             
             return message
             
@@ -231,18 +275,20 @@ class TelethonManager:
     async def edit_message(cls, account_id: int, chat_id: int, message_id: int, new_text: str):
         """Edit message"""
         try:
-            client = cls.get_client(account_id)
-            if not client:
+            if not cls.get_client(account_id):
                 raise ValueError(f"Account {account_id} not found or not running")
             
-            await client.edit_message(entity=chat_id, message=message_id, text=new_text)
+            await OutboundScheduler.submit(account_id, 'edit', chat_id, message=message_id, text=new_text)
             
             # Update message in database
             from apps.chats.models import Chat
             from apps.messages.models import Message
             
             try:
-                chat_obj = await Chat.objects.aget(account_id=account_id, chat_id=chat_id)
+                chat_obj = ChatCache.get('account_chat', account_id, chat_id)
+                if chat_obj is None:
+                    chat_obj = await Chat.objects.aget(account_id=account_id, chat_id=chat_id)
+                    ChatCache.remember([chat_obj])
                 message_obj = await Message.objects.aget(chat=chat_obj, message_id=message_id)
                 message_obj.text = new_text
                 message_obj.payload.update({'edited': True})
@@ -258,18 +304,21 @@ class TelethonManager:
     async def delete_message(cls, account_id: int, chat_id: int, message_id: int):
         """Delete message"""
         try:
-            client = cls.get_client(account_id)
-            if not client:
+            if not cls.get_client(account_id):
                 raise ValueError(f"Account {account_id} not found or not running")
             
-            await client.delete_messages(entity=chat_id, message_ids=[message_id])
+            # Deletes queued for the same chat go out as one call
+            await OutboundScheduler.submit(account_id, 'delete', chat_id, message_ids=[message_id])
             
             # Mark message as deleted in database
             from apps.chats.models import Chat
             from apps.messages.models import Message
             
             try:
-                chat_obj = await Chat.objects.aget(account_id=account_id, chat_id=chat_id)
+                chat_obj = ChatCache.get('account_chat', account_id, chat_id)
+                if chat_obj is None:
+                    chat_obj = await Chat.objects.aget(account_id=account_id, chat_id=chat_id)
+                    ChatCache.remember([chat_obj])
                 message_obj = await Message.objects.aget(chat=chat_obj, message_id=message_id)
                 message_obj.payload.update({'deleted': True})
                 await message_obj.asave()
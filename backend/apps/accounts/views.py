@@ -48,6 +48,56 @@ class AccountViewSet(viewsets.ModelViewSet):
         except Exception as e:
             logger.error(f"Error stopping account {account.id}: {e}")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=True, methods=['get', 'post'])
+    def backfill(self, request, pk=None):
+        """Start a history import, or get its progress per chat"""
+        account = self.get_object()
+        try:
+            if request.method == 'POST':
+                chat_ids = _parse_chat_ids(request.data.get('chat_ids'))
+                if chat_ids is False:
+                    return Response({'error': 'chat_ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+                result = AccountService.start_backfill(account, chat_ids)
+                if not result['started'] and not result['running']:
+                    return Response({'error': 'Failed to start account'}, status=status.HTTP_400_BAD_REQUEST)
+                return Response(result, status=status.HTTP_202_ACCEPTED)
+            
+            return Response({
+                'running': AccountService.is_backfill_running(account),
+                'chats': AccountService.get_backfill_progress(account),
+            })
+        except Exception as e:
+            logger.error(f"Error backfilling account {account.id}: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=True, methods=['get'])
+    def outbound(self, request, pk=None):
+        """Get the outbound queue depth and flood wait of an account"""
+        account = self.get_object()
+        try:
+            return Response(AccountService.get_outbound_stats(account))
+        except Exception as e:
+            logger.error(f"Error getting outbound queue of account {account.id}: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _parse_chat_ids(value):
+    """Parse a list of Telegram chat IDs, None when absent and False when malformed"""
+    if value in (None, [], ''):
+        return None
+    if not isinstance(value, list):
+        return False
+    chat_ids = []
+    for chat_id in value:
+        if isinstance(chat_id, bool):
+            return False
+        if isinstance(chat_id, int):
+            chat_ids.append(chat_id)
+        elif isinstance(chat_id, str) and chat_id.lstrip('-').isdigit():
+            chat_ids.append(int(chat_id))
+        else:
+            return False
+    return chat_ids
 
 @csrf_exempt
 def add_account(request):
@@ -1,15 +1,30 @@
 import asyncio
 import logging
 import hashlib
-from typing import Dict, Optional
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
 from django.conf import settings
 from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramRetryAfter
 from aiogram.types import Update
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler
 from aiogram_handlers.message_handler import MessageHandler
+from apps.core.log import log_event
+from apps.core.runtime import bot_runtime
+from .http_session import BotSessionPool
 
 logger = logging.getLogger('bots')
 
+@dataclass
+class BotStartResult:
+    """Outcome of starting a single bot"""
+    bot_id: int
+    success: bool
+    seconds: float
+    attempts: int
+    error: Optional[str] = None
+
+
 class AiogramManager:
     """Manager for aiogram bots"""
     
@@ -19,33 +34,62 @@ class AiogramManager:
     _handlers: Dict[int, MessageHandler] = {}
     _polling_tasks: Dict[int, asyncio.Task] = {}
     
+    WEBHOOK_ALLOWED_UPDATES = ["message", "edited_message", "callback_query"]
+    
     @classmethod
     def start_bot(cls, bot_id: int, token: str) -> bool:
         """Start a bot with webhook"""
+        return cls.start_bots([(bot_id, token)])[0].success
+    
+    @classmethod
+    def start_bots(cls, bots: Iterable[Tuple[int, str]], concurrency: Optional[int] = None) -> List[BotStartResult]:
+        """Start many bots with concurrent webhook handshakes"""
+        return bot_runtime.run(cls.astart_bots(bots, concurrency))
+    
+    @classmethod
+    async def astart_bots(cls, bots: Iterable[Tuple[int, str]], concurrency: Optional[int] = None) -> List[BotStartResult]:
+        """Start bots on the bot runtime with bounded parallelism"""
+        semaphore = asyncio.Semaphore(concurrency or getattr(settings, 'BOT_START_CONCURRENCY', 20))
+        max_retries = getattr(settings, 'BOT_START_MAX_RETRIES', 3)
+        
+        async def start_one(bot_id: int, token: str) -> BotStartResult:
+            started = time.perf_counter()
+            attempts = 0
+            while True:
+                attempts += 1
+                try:
+                    async with semaphore:
+                        success = await cls.astart_bot(bot_id, token)
+                    error = None if success else 'webhook setup failed'
+                    break
+                except TelegramRetryAfter as e:
+                    if attempts > max_retries:
+                        success, error = False, f"rate limited after {attempts} attempts"
+                        break
+                    # Wait outside the semaphore so other bots keep starting
+                    logger.warning(f"⏳ Bot {bot_id} rate limited, retrying in {e.retry_after}s")
+                    await asyncio.sleep(e.retry_after)
+            
+            return BotStartResult(bot_id, success, time.perf_counter() - started, attempts, error)
+        
+        return await asyncio.gather(*(start_one(bot_id, token) for bot_id, token in bots))
+    
+    @classmethod
+    async def astart_bot(cls, bot_id: int, token: str) -> bool:
+        """Start a bot with webhook on the bot runtime, rate limits are raised to the caller"""
         try:
             if bot_id in cls._bots:
                 logger.warning(f"Bot {bot_id} is already running")
                 return True
             
             # Create bot instance
-            bot = Bot(token=token)
-            dp = Dispatcher()
-            handler = MessageHandler(bot_id)
-            
-            # Register handlers
-            dp.message.register(handler.handle_message)
-            dp.edited_message.register(handler.handle_edited_message)
+            bot = cls._create_instances(bot_id, token)
             
             # Note: aiogram bots cannot listen to their own outgoing messages
             # Outgoing messages are tracked when sent via the web API in send_message method
             
-            # Store instances
-            cls._bots[bot_id] = bot
-            cls._dispatchers[bot_id] = dp
-            cls._handlers[bot_id] = handler
-            
             # Set up webhook
-            success = asyncio.run(cls._setup_webhook(bot_id, bot))
+            success = await cls._setup_webhook(bot_id, bot)
             
             if success:
                 logger.info(f"Started bot {bot_id} with webhook")
@@ -53,17 +97,25 @@ class AiogramManager:
                 return True
             else:
                 # Clean up if webhook setup failed
-                cls._cleanup_bot(bot_id)
+                await cls._acleanup_bot(bot_id)
                 return False
             
+        except TelegramRetryAfter:
+            await cls._acleanup_bot(bot_id)
+            raise
         except Exception as e:
             logger.error(f"Failed to start bot {bot_id}: {e}")
-            cls._cleanup_bot(bot_id)
+            await cls._acleanup_bot(bot_id)
             return False
     
     @classmethod
     def stop_bot(cls, bot_id: int) -> bool:
         """Stop a bot"""
+        return bot_runtime.run(cls.astop_bot(bot_id))
+    
+    @classmethod
+    async def astop_bot(cls, bot_id: int) -> bool:
+        """Stop a bot on the bot runtime"""
         try:
             if bot_id not in cls._bots:
                 logger.warning(f"Bot {bot_id} is not running")
@@ -72,12 +124,12 @@ class AiogramManager:
             # Remove webhook
             bot = cls._bots[bot_id]
             try:
-                asyncio.run(cls._remove_webhook(bot_id, bot))
+                await cls._remove_webhook(bot_id, bot)
             except Exception as e:
                 logger.warning(f"Error removing webhook for bot {bot_id}: {e}")
             
             # Clean up bot
-            cls._cleanup_bot(bot_id)
+            await cls._acleanup_bot(bot_id)
             
             logger.info(f"✅ Stopped bot {bot_id}")
             return True
@@ -86,6 +138,29 @@ class AiogramManager:
             logger.error(f"❌ Failed to stop bot {bot_id}: {e}")
             return False
     
+    @classmethod
+    def release_bot(cls, bot_id: int):
+        """Drop a bot handed over to another worker, its webhook stays in place for the new owner"""
+        bot_runtime.run(cls._acleanup_bot(bot_id))
+    
+    @classmethod
+    def _create_instances(cls, bot_id: int, token: str) -> Bot:
+        """Create and store bot, dispatcher and handler, must run on the bot runtime"""
+        bot = BotSessionPool.create_bot(token)
+        dp = Dispatcher()
+        handler = MessageHandler(bot_id)
+        
+        # Register handlers
+        dp.message.register(handler.handle_message)
+        dp.edited_message.register(handler.handle_edited_message)
+        
+        # Store instances
+        cls._bots[bot_id] = bot
+        cls._dispatchers[bot_id] = dp
+        cls._handlers[bot_id] = handler
+        
+        return bot
+    
     @classmethod
     def get_bot(cls, bot_id: int) -> Optional[Bot]:
         """Get bot instance"""
@@ -100,56 +175,47 @@ class AiogramManager:
     async def process_webhook(cls, bot_id: int, update_data: dict):
         """Process webhook update"""
         try:
+            # Telegram redelivers updates when we are slow, skip the ones already handled
+            from .dedupe import UpdateDeduplicator
+            
+            if UpdateDeduplicator.seen(bot_id, update_data.get('update_id')):
+                logger.debug("Skipping redelivered update %s for bot %s", update_data.get('update_id'), bot_id)
+                return
+            
             # Get bot and dispatcher from memory, or create them on-demand
             bot = cls.get_bot(bot_id)
             dp = cls.get_dispatcher(bot_id)
             
             if not bot or not dp:
-                logger.info(f"Bot {bot_id} not in memory, creating instances on-demand")
+                logger.debug("Bot %s not in memory, creating instances on-demand", bot_id)
                 
-                # Get bot from database and create instances
-                from .models import Bot as BotModel
-                from apps.core.encryption import encryption_service
+                # Get bot metadata from the registry, falling back to the database
+                from .registry import BotRegistry
                 from asgiref.sync import sync_to_async
                 
                 try:
-                    # Use sync_to_async for database operations
-                    bot_obj = await sync_to_async(BotModel.objects.get)(id=bot_id, status='active')
-                    token = await sync_to_async(encryption_service.decrypt)(bot_obj.token_enc)
+                    entry = BotRegistry.get(bot_id) or await sync_to_async(BotRegistry.get_or_load)(bot_id)
+                    if entry is None:
+                        return
                     
-                    # Create bot and dispatcher instances
-                    bot = Bot(token=token)
-                    dp = Dispatcher()
-                    handler = MessageHandler(bot_id)
+                    # Create bot and dispatcher instances, stored in memory for subsequent requests
+                    bot = cls._create_instances(bot_id, entry.token)
+                    dp = cls.get_dispatcher(bot_id)
                     
-                    # Register handlers
-                    dp.message.register(handler.handle_message)
-                    dp.edited_message.register(handler.handle_edited_message)
+                    logger.debug("✅ Created bot instances for bot %s", bot_id)
                     
-                    # Store in memory for subsequent requests
-                    cls._bots[bot_id] = bot
-                    cls._dispatchers[bot_id] = dp
-                    cls._handlers[bot_id] = handler
-                    
-                    logger.info(f"✅ Created bot instances for bot {bot_id}")
-                    
-                except BotModel.DoesNotExist:
-                    logger.error(f"❌ Bot {bot_id} not found in database or not active")
-                    return
-                except Exception as e:
-                    logger.error(f"❌ Failed to create bot instances for bot {bot_id}: {e}")
+                except Exception:
+                    logger.exception("❌ Failed to create bot instances for bot %s", bot_id)
                     return
             
-            # Create update object
-            update = Update(**update_data)
+            # Bind the update to the bot while parsing, otherwise aiogram re-validates it to bind
+            update = Update.model_validate(update_data, context={"bot": bot})
             
             # Process update
             await dp.feed_update(bot, update)
             
-        except Exception as e:
-            logger.error(f"❌ Error processing webhook for bot {bot_id}: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("❌ Error processing webhook for bot %s", bot_id)
     
     @classmethod
     async def send_message(cls, bot_id: int, chat_id: int, text: str, **kwargs):
@@ -159,29 +225,25 @@ class AiogramManager:
             bot = cls.get_bot(bot_id)
             
             if not bot:
-                logger.info(f"Bot {bot_id} not in memory for sending, creating instance on-demand")
+                logger.debug("Bot %s not in memory for sending, creating instance on-demand", bot_id)
                 
-                # Get bot from database and create instances
-                from .models import Bot as BotModel
-                from apps.core.encryption import encryption_service
+                # Get bot metadata from the registry, falling back to the database
+                from .registry import BotRegistry
                 from asgiref.sync import sync_to_async
                 
                 try:
-                    # Use sync_to_async for database operations
-                    bot_obj = await sync_to_async(BotModel.objects.get)(id=bot_id, status='active')
-                    token = await sync_to_async(encryption_service.decrypt)(bot_obj.token_enc)
+                    entry = BotRegistry.get(bot_id) or await sync_to_async(BotRegistry.get_or_load)(bot_id)
+                    if entry is None:
+                        raise ValueError(f"Bot {bot_id} not found or not active")
                     
                     # Create bot instance
-                    bot = Bot(token=token)
+                    bot = BotSessionPool.create_bot(entry.token)
                     
                     # Store in memory for subsequent requests
                     cls._bots[bot_id] = bot
                     
-                    logger.info(f"✅ Created bot instance for sending message via bot {bot_id}")
+                    logger.debug("✅ Created bot instance for sending message via bot %s", bot_id)
                     
-                except BotModel.DoesNotExist:
-                    logger.error(f"❌ Bot {bot_id} not found in database or not active")
-                    raise ValueError(f"Bot {bot_id} not found or not active")
                 except Exception as e:
                     logger.error(f"❌ Failed to create bot instance for bot {bot_id}: {e}")
                     raise
@@ -189,61 +251,34 @@ class AiogramManager:
             message = await bot.send_message(chat_id=chat_id, text=text, **kwargs)
             
             # Save outgoing message to database
-            from apps.chats.models import Chat
+            from apps.chats.cache import ChatCache
             from apps.messages.models import Message
-            from apps.bots.models import Bot as BotModel
-            from apps.notifications.services import NotificationService
-            from asgiref.sync import sync_to_async
+            from apps.messages.ingest import IngestRequest, MessageIngestWriter
             
             try:
-                logger.info(f"🔄 Attempting to save outgoing message for bot {bot_id} to chat {chat_id}")
-                
-                # Get bot object first
-                bot_obj = await sync_to_async(BotModel.objects.get)(id=bot_id)
-                
-                # Try to get existing chat or create it
-                def get_or_create_chat():
-                    chat_obj, created = Chat.objects.get_or_create(
-                        bot=bot_obj,
-                        chat_id=chat_id,
-                        defaults={
-                            'type': 'bot_chat',
-                            'title': f'Chat {chat_id}',
-                            'chat_type': 'private'
-                        }
-                    )
-                    if created:
-                        logger.info(f"📝 Created new chat {chat_id} for bot {bot_id}")
-                    return chat_obj
+                # Chats seen before resolve from memory without a query
+                chat_obj = await ChatCache.aresolve('bot_chat', bot_id, chat_id, f'Chat {chat_id}', 'private')
                 
-                chat_obj = await sync_to_async(get_or_create_chat)()
-                
-                def create_message():
-                    return Message.objects.create(
-                        chat=chat_obj,
-                        message_id=message.message_id,
-                        from_id=bot_obj.bot_id,  # Use bot's Telegram ID
-                        text=text,
-                        direction='outgoing',
-                        payload={'sent_via': 'web_api', 'date': message.date.isoformat()}
-                    )
-                
-                saved_message = await sync_to_async(create_message)()
-                logger.info(f"✅ Sent message via bot {bot_id} to chat {chat_id}, saved outgoing message with ID {saved_message.id}")
-                
-                # Send notification for the outgoing message
-                try:
-                    await NotificationService.send_message_notification('new_message', chat_obj, saved_message)
-                    logger.info(f"📡 Sent notification for outgoing message {saved_message.id}")
-                except Exception as notification_error:
-                    logger.error(f"❌ Failed to send notification for outgoing message: {notification_error}")
+                result = await MessageIngestWriter.aingest(IngestRequest(notify='new_message', message=Message(
+                    chat=chat_obj,
+                    message_id=message.message_id,
+                    from_id=bot.id,  # Bot's Telegram ID, parsed from the token
+                    text=text,
+                    direction='outgoing',
+                    payload={'sent_via': 'web_api', 'date': message.date.isoformat()}
+                )))
+                log_event(
+                    logger, logging.DEBUG, 'bot_outgoing',
+                    "✅ Bot %s sent message %s to chat %s (%s)",
+                    bot_id, message.message_id, chat_id, 'stored' if result.created else 'duplicate',
+                    bot_id=bot_id,
+                    chat_id=chat_id,
+                    message_id=message.message_id,
+                    stored=result.created,
+                )
                 
-            except BotModel.DoesNotExist:
-                logger.error(f"❌ Bot {bot_id} not found in database when saving outgoing message")
-            except Exception as e:
-                logger.error(f"❌ Error saving outgoing message for bot {bot_id} to chat {chat_id}: {e}")
-                import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
+            except Exception:
+                logger.exception("❌ Error saving outgoing message for bot %s to chat %s", bot_id, chat_id)
             
             return message
             
@@ -258,39 +293,46 @@ class AiogramManager:
     
     @classmethod
     async def _setup_webhook(cls, bot_id: int, bot: Bot) -> bool:
-        """Set up webhook for bot"""
+        """Reconcile the bot webhook, registering it only when it differs from the desired one"""
         try:
+            from django.utils import timezone
+            from .models import Bot as BotModel
+            
             # Generate webhook URL and secret
             webhook_secret = cls._generate_webhook_secret(bot_id)
             webhook_url = cls._get_webhook_url(bot_id, webhook_secret)
+            secret_hash = hashlib.sha256(webhook_secret.encode()).hexdigest()
             
-            # Verify bot connection first
-            me = await bot.get_me()
-            logger.info(f"🤖 Bot authenticated: @{me.username} ({me.first_name})")
+            # One read authenticates the token and shows what Telegram currently has
+            webhook_info = await bot.get_webhook_info()
+            stored = await BotModel.objects.filter(id=bot_id).values(
+                'webhook_url', 'webhook_secret_hash'
+            ).afirst()
             
-            # Remove any existing webhook first
-            await bot.delete_webhook()
-            logger.info(f"🗑️ Removed existing webhook for bot {bot_id}")
+            if cls._webhook_matches(webhook_info, stored, webhook_url, secret_hash):
+                logger.info(f"✅ Webhook already up to date for bot {bot_id}")
+                return True
             
-            # Set new webhook
+            # setWebhook replaces any existing registration, no delete needed
             await bot.set_webhook(
                 url=webhook_url,
-                allowed_updates=["message", "edited_message", "callback_query"],
+                allowed_updates=cls.WEBHOOK_ALLOWED_UPDATES,
                 drop_pending_updates=False,  # Don't drop pending updates
                 secret_token=webhook_secret
             )
             
-            logger.info(f"🔗 Set webhook for bot {bot_id}: {webhook_url}")
+            await BotModel.objects.filter(id=bot_id).aupdate(
+                webhook_url=webhook_url,
+                webhook_allowed_updates=cls.WEBHOOK_ALLOWED_UPDATES,
+                webhook_secret_hash=secret_hash,
+                webhook_synced_at=timezone.now(),
+            )
             
-            # Verify webhook was set successfully
-            webhook_info = await bot.get_webhook_info()
-            if webhook_info.url == webhook_url:
-                logger.info(f"✅ Webhook verified for bot {bot_id}")
-                return True
-            else:
-                logger.error(f"❌ Webhook verification failed for bot {bot_id}. Expected: {webhook_url}, Got: {webhook_info.url}")
-                return False
+            logger.info(f"🔗 Set webhook for bot {bot_id}: {webhook_url}")
+            return True
             
+        except TelegramRetryAfter:
+            raise
         except Exception as e:
             logger.error(f"❌ Error setting up webhook for bot {bot_id}: {e}")
             import traceback
@@ -299,54 +341,50 @@ class AiogramManager:
             # Update bot status to error
             try:
                 from .models import Bot as BotModel
-                from django.db import transaction
                 
-                with transaction.atomic():
-                    bot_obj = BotModel.objects.get(id=bot_id)
-                    bot_obj.status = 'error'
-                    bot_obj.save()
-                    logger.error(f"📝 Updated bot {bot_id} status to error")
+                await BotModel.objects.filter(id=bot_id).aupdate(status='error')
+                logger.error(f"📝 Updated bot {bot_id} status to error")
             except Exception as db_error:
                 logger.error(f"❌ Failed to update bot status: {db_error}")
             
             return False
     
+    @classmethod
+    def _webhook_matches(cls, webhook_info, stored: Optional[dict], webhook_url: str, secret_hash: str) -> bool:
+        """Check that Telegram and the last registration agree with the desired webhook"""
+        # Telegram never returns the secret token, so it is compared against the stored hash
+        return (
+            stored is not None
+            and webhook_info.url == webhook_url
+            and sorted(webhook_info.allowed_updates or []) == sorted(cls.WEBHOOK_ALLOWED_UPDATES)
+            and stored['webhook_url'] == webhook_url
+            and stored['webhook_secret_hash'] == secret_hash
+        )
+    
     @classmethod
     async def _remove_webhook(cls, bot_id: int, bot: Bot):
         """Remove webhook for bot"""
         try:
+            from .models import Bot as BotModel
+            
             await bot.delete_webhook()
+            await BotModel.objects.filter(id=bot_id).aupdate(
+                webhook_url='', webhook_allowed_updates=[], webhook_secret_hash='', webhook_synced_at=None
+            )
             logger.info(f"🗑️ Removed webhook for bot {bot_id}")
         except Exception as e:
             logger.error(f"❌ Error removing webhook for bot {bot_id}: {e}")
     
     @classmethod
-    def _cleanup_bot(cls, bot_id: int):
-        """Clean up bot instances"""
+    async def _acleanup_bot(cls, bot_id: int):
+        """Clean up bot instances on the bot runtime"""
         try:
-            # Close bot session
-            if bot_id in cls._bots:
-                bot = cls._bots[bot_id]
-                try:
-                    # Try to close session properly
-                    loop = asyncio.get_event_loop()
-                    if loop.is_running():
-                        loop.create_task(bot.session.close())
-                    else:
-                        asyncio.run(bot.session.close())
-                except Exception as e:
-                    logger.warning(f"Error closing bot session: {e}")
+            # Remove from storage, the HTTP session is shared and stays open
+            cls._bots.pop(bot_id, None)
+            cls._dispatchers.pop(bot_id, None)
+            cls._handlers.pop(bot_id, None)
+            cls._polling_tasks.pop(bot_id, None)  # Clean up any remaining polling tasks
             
-            # Remove from storage
-            if bot_id in cls._bots:
-                del cls._bots[bot_id]
-            if bot_id in cls._dispatchers:
-                del cls._dispatchers[bot_id]
-            if bot_id in cls._handlers:
-                del cls._handlers[bot_id]
-            if bot_id in cls._polling_tasks:  # Clean up any remaining polling tasks
-                del cls._polling_tasks[bot_id]
-                
         except Exception as e:
             logger.error(f"❌ Error cleaning up bot {bot_id}: {e}")
     
@@ -360,4 +398,8 @@ class AiogramManager:
         """Get webhook URL for bot"""
         # Get base URL from settings or use default
         base_url = getattr(settings, 'WEBHOOK_BASE_URL', 'https://your-domain.com')
+        
+        # Shared ingress resolves the bot from the secret token header instead of the path
+        if getattr(settings, 'WEBHOOK_SHARED_URL', False):
+            return f"{base_url}/webhook/bot/"
         return f"{base_url}/webhook/bot/{bot_id}/{secret}/"
\ No newline at end of file
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+from django.conf import settings
+from django.core.cache import caches
+
+
+class AutoReplyCooldown:
+    """Per-(bot, chat) auto-reply cooldown backed by an in-process TTL cache"""
+
+    _expires: "OrderedDict[Tuple[int, int], float]" = OrderedDict()
+    _lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    @classmethod
+    async def acquire(cls, bot_id: int, chat_id: int) -> bool:
+        """Claim the reply slot for a chat, returns False while the chat is cooling down"""
+        window = getattr(settings, 'AUTO_REPLY_COOLDOWN_SECONDS', 60)
+        if window <= 0:
+            return True
+
+        key = (bot_id, chat_id)
+        now = time.monotonic()
+
+        with cls._lock:
+            if cls._expires.get(key, 0) > now:
+                cls.hits += 1
+                return False
+            cls._expires[key] = now + window
+            cls._expires.move_to_end(key)
+            cls._evict(now)
+
+        # A shared cache extends the cooldown across processes, add() only succeeds for the first one
+        alias = getattr(settings, 'AUTO_REPLY_COOLDOWN_CACHE', '')
+        if alias and not await caches[alias].aadd(cls._cache_key(key), 1, timeout=window):
+            cls.hits += 1
+            return False
+
+        cls.misses += 1
+        return True
+
+    @classmethod
+    async def release(cls, bot_id: int, chat_id: int):
+        """Give the slot back, e.g. when the reply could not be sent"""
+        key = (bot_id, chat_id)
+        with cls._lock:
+            cls._expires.pop(key, None)
+
+        alias = getattr(settings, 'AUTO_REPLY_COOLDOWN_CACHE', '')
+        if alias:
+            await caches[alias].adelete(cls._cache_key(key))
+
+    @classmethod
+    def _evict(cls, now: float):
+        """Drop expired entries from the oldest end and cap the cache size"""
+        max_entries = getattr(settings, 'AUTO_REPLY_COOLDOWN_MAX_ENTRIES', 100000)
+        while cls._expires:
+            expires_at = next(iter(cls._expires.values()))
+            if expires_at > now and len(cls._expires) <= max_entries:
+                break
+            cls._expires.popitem(last=False)
+
+    @staticmethod
+    def _cache_key(key: Tuple[int, int]) -> str:
+        return f"auto_reply_cooldown:{key[0]}:{key[1]}"
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """Get hit and miss counters"""
+        return {'hits': cls.hits, 'misses': cls.misses, 'size': len(cls._expires)}
+
+    @classmethod
+    def clear(cls):
+        """Drop all cooldowns and reset counters"""
+        with cls._lock:
+            cls._expires.clear()
+            cls.hits = 0
+            cls.misses = 0
@@ -0,0 +1,37 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from django.conf import settings
+
+
+class UpdateDeduplicator:
+    """Bounded per-bot window of recently processed Telegram update ids"""
+
+    _windows: Dict[int, "OrderedDict[int, None]"] = {}
+    _lock = threading.Lock()
+    duplicates = 0
+
+    @classmethod
+    def seen(cls, bot_id: int, update_id: Optional[int]) -> bool:
+        """Mark an update as processed, returns True if it was already seen"""
+        if update_id is None:
+            return False
+
+        window_size = getattr(settings, 'WEBHOOK_DEDUPE_WINDOW', 1000)
+
+        with cls._lock:
+            window = cls._windows.setdefault(bot_id, OrderedDict())
+            if update_id in window:
+                cls.duplicates += 1
+                return True
+
+            window[update_id] = None
+            if len(window) > window_size:
+                window.popitem(last=False)
+            return False
+
+    @classmethod
+    def forget(cls, bot_id: int):
+        """Drop the window of a bot"""
+        with cls._lock:
+            cls._windows.pop(bot_id, None)
@@ -0,0 +1,111 @@
+import logging
+import threading
+from typing import Optional
+from aiohttp import ClientSession, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.__meta__ import __version__ as aiogram_version
+from django.conf import settings
+
+logger = logging.getLogger('bots')
+
+class SharedAiohttpSession(AiohttpSession):
+    """Keep-alive aiogram session shared by every Bot instance"""
+
+    def __init__(self, limit: int, limit_per_host: int, keepalive_timeout: float, dns_ttl: int):
+        super().__init__(limit=limit)
+        self._connector_init.update(
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=dns_ttl,
+        )
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    async def create_session(self) -> ClientSession:
+        """Create the underlying client session with pool tracing on first use"""
+        if self._should_reset_connector:
+            await self.shutdown()
+
+        if self._session is None or self._session.closed:
+            trace = TraceConfig()
+            trace.on_request_start.append(self._on_request_start)
+            trace.on_connection_create_end.append(self._on_connection_create)
+            trace.on_connection_reuseconn.append(self._on_connection_reuse)
+
+            self._session = ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"},
+                trace_configs=[trace],
+            )
+            self._should_reset_connector = False
+
+        return self._session
+
+    async def close(self):
+        """Bots share this session, so closing a single bot keeps the pool open"""
+
+    async def shutdown(self):
+        """Close the pooled connections"""
+        await super().close()
+
+    async def _on_request_start(self, session, context, params):
+        self.requests += 1
+
+    async def _on_connection_create(self, session, context, params):
+        self.connections_created += 1
+
+    async def _on_connection_reuse(self, session, context, params):
+        self.connections_reused += 1
+
+
+class BotSessionPool:
+    """Process-wide HTTP connection pool for the Telegram Bot API"""
+
+    _session: Optional[SharedAiohttpSession] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_session(cls) -> SharedAiohttpSession:
+        """Get the shared session, it binds to the bot runtime loop on the first request"""
+        if cls._session is None:
+            with cls._lock:
+                if cls._session is None:
+                    cls._session = SharedAiohttpSession(
+                        limit=getattr(settings, 'TELEGRAM_HTTP_POOL_LIMIT', 100),
+                        limit_per_host=getattr(settings, 'TELEGRAM_HTTP_POOL_LIMIT_PER_HOST', 50),
+                        keepalive_timeout=getattr(settings, 'TELEGRAM_HTTP_KEEPALIVE_TIMEOUT', 60),
+                        dns_ttl=getattr(settings, 'TELEGRAM_HTTP_DNS_TTL', 300),
+                    )
+                    logger.info("Created shared Telegram HTTP session")
+        return cls._session
+
+    @classmethod
+    def create_bot(cls, token: str) -> Bot:
+        """Create an aiogram Bot on the shared session"""
+        return Bot(token=token, session=cls.get_session())
+
+    @classmethod
+    async def shutdown(cls):
+        """Close the shared session, must run on the bot runtime"""
+        session, cls._session = cls._session, None
+        if session is not None:
+            await session.shutdown()
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """Get request and connection reuse counters"""
+        session = cls._session
+        if session is None:
+            return {'requests': 0, 'connections_created': 0, 'connections_reused': 0, 'hit_rate': 0.0}
+
+        acquired = session.connections_created + session.connections_reused
+        return {
+            'requests': session.requests,
+            'connections_created': session.connections_created,
+            'connections_reused': session.connections_reused,
+            'hit_rate': round(session.connections_reused / acquired, 3) if acquired else 0.0,
+        }
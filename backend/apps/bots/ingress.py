@@ -0,0 +1,73 @@
+import logging
+import time
+from typing import Optional
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import ip_filter_middleware
+from aiogram.webhook.security import IPFilter
+from .registry import BotRegistry
+from .update_queue import UpdateQueue
+
+logger = logging.getLogger('bots')
+
+class WebhookIngress:
+    """Lightweight aiohttp webhook server feeding the update queue without the Django request stack"""
+
+    _runner: Optional[web.AppRunner] = None
+
+    @classmethod
+    def create_app(cls, telegram_ips_only: bool = False) -> web.Application:
+        """Build the ingress application with the same routes as the Django webhook views"""
+        middlewares = [ip_filter_middleware(IPFilter.default())] if telegram_ips_only else []
+        app = web.Application(middlewares=middlewares)
+        app.router.add_post('/webhook/bot/', cls.shared_webhook)
+        app.router.add_post(r'/webhook/bot/{bot_id:\d+}/{secret}/', cls.bot_webhook)
+        app.router.add_get('/health/', cls.health)
+        return app
+
+    @classmethod
+    async def start(cls, host: str, port: int, reuse_port: bool = False, telegram_ips_only: bool = False):
+        """Start serving on the bot runtime loop"""
+        runner = web.AppRunner(cls.create_app(telegram_ips_only), access_log=None)
+        await runner.setup()
+        # reuse_port lets several ingress processes bind the same port behind the kernel balancer
+        await web.TCPSite(runner, host, port, reuse_port=reuse_port).start()
+        cls._runner = runner
+        logger.info(f"🚀 Webhook ingress listening on {host}:{port}")
+
+    @classmethod
+    async def stop(cls):
+        """Stop serving"""
+        runner, cls._runner = cls._runner, None
+        if runner is not None:
+            await runner.cleanup()
+
+    @classmethod
+    async def bot_webhook(cls, request: web.Request) -> web.Response:
+        """Per-bot webhook route authenticated by the secret in the path"""
+        received_at = time.perf_counter()
+        bot_id = int(request.match_info['bot_id'])
+
+        if not await BotRegistry.averify_secret(bot_id, request.match_info['secret']):
+            return web.Response(status=403)
+
+        return cls._respond(UpdateQueue.accept(bot_id, await request.read(), received_at))
+
+    @classmethod
+    async def shared_webhook(cls, request: web.Request) -> web.Response:
+        """Shared webhook route resolved by the secret token header"""
+        received_at = time.perf_counter()
+
+        entry = await BotRegistry.aresolve_secret(request.headers.get('X-Telegram-Bot-Api-Secret-Token', ''))
+        if entry is None:
+            return web.Response(status=403)
+
+        return cls._respond(UpdateQueue.accept(entry.id, await request.read(), received_at))
+
+    @staticmethod
+    async def health(request: web.Request) -> web.Response:
+        """Report queue statistics for load balancer checks"""
+        return web.json_response(UpdateQueue.get_stats())
+
+    @staticmethod
+    def _respond(status: int) -> web.Response:
+        return web.json_response({'status': 'ok'}) if status == 200 else web.Response(status=status)
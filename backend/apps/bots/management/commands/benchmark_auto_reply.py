@@ -0,0 +1,90 @@
+import asyncio
+import time
+import tracemalloc
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from django.core.management.base import BaseCommand
+from apps.bots.http_session import SharedAiohttpSession
+from apps.core.metrics import LatencyTracker
+
+TOKEN = '123456:benchmark'
+
+
+class Command(BaseCommand):
+    help = 'Compare auto-reply send cost of a bot per message against the managed pooled bot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200, help='Auto-replies per mode')
+
+    def handle(self, *args, **options):
+        for mode, result in asyncio.run(self._run(options['count'])).items():
+            self.stdout.write(
+                f"{mode}: p50 {result['p50_ms']:.2f}ms, p99 {result['p99_ms']:.2f}ms, "
+                f"{result['peak_kib']:.1f} KiB peak allocation per reply"
+            )
+
+    async def _run(self, count: int) -> dict:
+        runner = web.AppRunner(self._fake_api())
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        api = TelegramAPIServer.from_base(f"http://127.0.0.1:{runner.addresses[0][1]}")
+
+        shared = SharedAiohttpSession(limit=10, limit_per_host=10, keepalive_timeout=60, dns_ttl=300)
+        shared.api = api
+        managed = Bot(token=TOKEN, session=shared)
+
+        async def per_message():
+            # Previous behaviour: new bot and session per reply, closed afterwards
+            bot = Bot(token=TOKEN, session=AiohttpSession(api=api))
+            await bot.send_message(chat_id=1, text='Auto-reply')
+            await bot.session.close()
+
+        async def pooled():
+            await managed.send_message(chat_id=1, text='Auto-reply')
+
+        try:
+            return {
+                'bot per message': await self._measure(per_message, count),
+                'managed bot': await self._measure(pooled, count),
+            }
+        finally:
+            await shared.shutdown()
+            await runner.cleanup()
+
+    @staticmethod
+    async def _measure(send, count: int) -> dict:
+        latency = LatencyTracker(window=count)
+        peak = 0
+        tracemalloc.start()
+        try:
+            for _ in range(count):
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                started = time.perf_counter()
+                await send()
+                latency.record(time.perf_counter() - started)
+                peak += tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+        return {**latency.snapshot(), 'peak_kib': peak / count / 1024}
+
+    @staticmethod
+    def _fake_api() -> web.Application:
+        """Minimal Bot API answering sendMessage"""
+        async def send_message(request):
+            return web.json_response({
+                'ok': True,
+                'result': {
+                    'message_id': 1,
+                    'date': int(time.time()),
+                    'chat': {'id': 1, 'type': 'private'},
+                    'text': 'Auto-reply',
+                },
+            })
+
+        app = web.Application()
+        app.router.add_post('/bot{token}/sendMessage', send_message)
+        return app
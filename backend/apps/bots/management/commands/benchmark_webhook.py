@@ -0,0 +1,73 @@
+import asyncio
+import json
+import time
+from aiohttp import ClientSession, TCPConnector
+from django.core.management.base import BaseCommand
+from apps.bots.aiogram_manager import AiogramManager
+from apps.core.metrics import LatencyTracker
+
+
+class Command(BaseCommand):
+    help = 'Measure webhook ingress throughput and tail latency for one or more servers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'urls',
+            nargs='+',
+            help='Base URLs to compare, e.g. http://127.0.0.1:8000 http://127.0.0.1:8081',
+        )
+        parser.add_argument('--bot-id', type=int, required=True, help='Bot ID the updates are posted for')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per server')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight')
+        parser.add_argument('--shared', action='store_true', help='Post to the shared webhook URL')
+
+    def handle(self, *args, **options):
+        for base_url in options['urls']:
+            result = asyncio.run(self._run(base_url.rstrip('/'), options))
+            self.stdout.write(
+                f"{base_url}: {result['rps']:.0f} req/s, "
+                f"p50 {result['p50_ms']:.2f}ms, p99 {result['p99_ms']:.2f}ms, "
+                f"max {result['max_ms']:.2f}ms, errors {result['errors']}"
+            )
+
+    async def _run(self, base_url: str, options: dict) -> dict:
+        bot_id = options['bot_id']
+        secret = AiogramManager._generate_webhook_secret(bot_id)
+        url = f"{base_url}/webhook/bot/" if options['shared'] else f"{base_url}/webhook/bot/{bot_id}/{secret}/"
+        headers = {'Content-Type': 'application/json', 'X-Telegram-Bot-Api-Secret-Token': secret}
+
+        latency = LatencyTracker(window=options['requests'])
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        errors = 0
+        # Unique update ids keep deduplication out of the measurement
+        first_update_id = time.time_ns() // 1000
+
+        async def post(session: ClientSession, index: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.post(url, data=self._update(first_update_id + index), headers=headers) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                latency.record(time.perf_counter() - started)
+
+        async with ClientSession(connector=TCPConnector(limit=options['concurrency'])) as session:
+            started = time.perf_counter()
+            await asyncio.gather(*(post(session, index) for index in range(options['requests'])))
+            elapsed = time.perf_counter() - started
+
+        return {'rps': options['requests'] / elapsed, 'errors': errors, **latency.snapshot()}
+
+    @staticmethod
+    def _update(update_id: int) -> str:
+        """Callback query update, no handler is registered for it so dispatch has no side effects"""
+        return json.dumps({
+            'update_id': update_id,
+            'callback_query': {
+                'id': str(update_id),
+                'from': {'id': 1, 'is_bot': False, 'first_name': 'Benchmark'},
+                'chat_instance': 'benchmark',
+                'data': 'benchmark',
+            },
+        })
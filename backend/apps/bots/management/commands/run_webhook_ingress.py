@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.bots.ingress import WebhookIngress
+from apps.bots.registry import BotRegistry
+from apps.bots.update_queue import UpdateQueue
+from apps.core.runtime import bot_runtime
+
+
+class Command(BaseCommand):
+    help = 'Run the lightweight aiohttp webhook ingress server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='0.0.0.0', help='Interface to bind')
+        parser.add_argument('--port', type=int, default=8081, help='Port to bind')
+        parser.add_argument(
+            '--reuse-port',
+            action='store_true',
+            help='Allow several ingress processes to share the port',
+        )
+        parser.add_argument(
+            '--telegram-ips-only',
+            action='store_true',
+            help='Reject requests that do not come from Telegram webhook IP ranges',
+        )
+
+    def handle(self, *args, **options):
+        bots = BotRegistry.load()
+        UpdateQueue.start()
+        bot_runtime.run(WebhookIngress.start(
+            options['host'],
+            options['port'],
+            reuse_port=options['reuse_port'],
+            telegram_ips_only=options['telegram_ips_only'],
+        ))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🚀 Webhook ingress on {options["host"]}:{options["port"]} serving {bots} bots')
+        )
+
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            self.stdout.write('\n🛑 Stopping webhook ingress...')
+            bot_runtime.run(WebhookIngress.stop())
@@ -12,6 +12,11 @@ class Command(BaseCommand):
             type=int,
             help='Start monitoring for specific bot by ID',
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Maximum number of bots started in parallel',
+        )
 
     def handle(self, *args, **options):
         if options['bot_id']:
@@ -32,23 +37,24 @@ class Command(BaseCommand):
                 )
         else:
             # Start all inactive bots
-            bots = Bot.objects.filter(status='inactive')
-            if not bots.exists():
+            bots = {bot.id: bot for bot in Bot.objects.filter(status='inactive')}
+            if not bots:
                 self.stdout.write('No inactive bots found.')
                 return
                 
             started = 0
-            for bot in bots:
-                if BotService.start_bot(bot):
+            for result in BotService.start_bots(bots.values(), options['concurrency']):
+                bot = bots[result.bot_id]
+                if result.success:
                     started += 1
-                    self.stdout.write(f'✅ Started bot @{bot.username}')
+                    self.stdout.write(f'✅ Started bot @{bot.username} in {result.seconds:.2f}s')
                 else:
                     self.stdout.write(
-                        self.style.ERROR(f'❌ Failed to start bot @{bot.username}')
+                        self.style.ERROR(f'❌ Failed to start bot @{bot.username} in {result.seconds:.2f}s: {result.error}')
                     )
             
             self.stdout.write(
-                self.style.SUCCESS(f'Started {started} out of {bots.count()} bots')
+                self.style.SUCCESS(f'Started {started} out of {len(bots)} bots')
             )
             
             if started > 0:
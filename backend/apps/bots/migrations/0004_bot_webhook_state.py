@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_bots', '0003_add_auto_reply'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bot',
+            name='webhook_allowed_updates',
+            field=models.JSONField(blank=True, default=list, help_text='Last registered allowed updates'),
+        ),
+        migrations.AddField(
+            model_name='bot',
+            name='webhook_secret_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the last registered secret token', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='bot',
+            name='webhook_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bot',
+            name='webhook_url',
+            field=models.CharField(blank=True, help_text='Last registered webhook URL', max_length=512),
+        ),
+    ]
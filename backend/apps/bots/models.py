@@ -38,6 +38,12 @@ class Bot(BaseModel):
     # Profile update tracking
     profile_last_updated = models.DateTimeField(null=True, blank=True)
     profile_update_pending = models.BooleanField(default=False, help_text="Whether profile updates are pending")
+    
+    # Last webhook registered with Telegram, used to skip redundant setWebhook calls
+    webhook_url = models.CharField(max_length=512, blank=True, help_text="Last registered webhook URL")
+    webhook_allowed_updates = models.JSONField(default=list, blank=True, help_text="Last registered allowed updates")
+    webhook_secret_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the last registered secret token")
+    webhook_synced_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         db_table = 'bots'
@@ -1,11 +1,11 @@
 import logging
-import asyncio
 from typing import Optional
 from django.utils import timezone
-from aiogram import Bot as AiogramBot
 from aiogram.types import BotCommand, BotCommandScope, MenuButton, MenuButtonWebApp, WebAppInfo
 from aiogram.exceptions import TelegramAPIError
 from apps.core.encryption import encryption_service
+from apps.core.runtime import bot_runtime
+from .http_session import BotSessionPool
 
 logger = logging.getLogger('bots')
 
@@ -16,7 +16,7 @@ class BotProfileService:
     def update_bot_profile(bot) -> bool:
         """Update bot profile on Telegram"""
         try:
-            return asyncio.run(BotProfileService._update_bot_profile_async(bot))
+            return bot_runtime.run(BotProfileService._update_bot_profile_async(bot))
         except Exception as e:
             logger.error(f"Error updating bot profile for {bot.username}: {e}")
             return False
@@ -27,7 +27,7 @@ class BotProfileService:
         try:
             # Get decrypted token
             token = encryption_service.decrypt(bot.token_enc)
-            aiogram_bot = AiogramBot(token=token)
+            aiogram_bot = BotSessionPool.create_bot(token)
             
             # Update bot name if provided
             if bot.first_name:
@@ -79,9 +79,6 @@ class BotProfileService:
                 except Exception as e:
                     logger.warning(f"Failed to update menu button for {bot.username}: {e}")
             
-            # Close bot session
-            await aiogram_bot.session.close()
-            
             return True
             
         except TelegramAPIError as e:
@@ -95,7 +92,7 @@ class BotProfileService:
     def sync_bot_info(bot) -> bool:
         """Sync bot information from Telegram"""
         try:
-            return asyncio.run(BotProfileService._sync_bot_info_async(bot))
+            return bot_runtime.run(BotProfileService._sync_bot_info_async(bot))
         except Exception as e:
             logger.error(f"Error syncing bot info for {bot.username}: {e}")
             return False
@@ -106,7 +103,7 @@ class BotProfileService:
         try:
             # Get decrypted token
             token = encryption_service.decrypt(bot.token_enc)
-            aiogram_bot = AiogramBot(token=token)
+            aiogram_bot = BotSessionPool.create_bot(token)
             
             # Get bot info
             bot_info = await aiogram_bot.get_me()
@@ -168,9 +165,6 @@ class BotProfileService:
                 bot.save()
                 logger.info(f"Synced bot info for {bot.username}")
             
-            # Close bot session
-            await aiogram_bot.session.close()
-            
             return True
             
         except TelegramAPIError as e:
@@ -184,7 +178,7 @@ class BotProfileService:
     def get_bot_profile_info(bot) -> dict:
         """Get current bot profile information from Telegram"""
         try:
-            return asyncio.run(BotProfileService._get_bot_profile_info_async(bot))
+            return bot_runtime.run(BotProfileService._get_bot_profile_info_async(bot))
         except Exception as e:
             logger.error(f"Error getting bot profile info for {bot.username}: {e}")
             return {}
@@ -195,7 +189,7 @@ class BotProfileService:
         try:
             # Get decrypted token
             token = encryption_service.decrypt(bot.token_enc)
-            aiogram_bot = AiogramBot(token=token)
+            aiogram_bot = BotSessionPool.create_bot(token)
             
             info = {}
             
@@ -234,9 +228,6 @@ class BotProfileService:
             except Exception:
                 info['commands'] = []
             
-            # Close bot session
-            await aiogram_bot.session.close()
-            
             return info
             
         except Exception as e:
@@ -247,7 +238,7 @@ class BotProfileService:
     def update_bot_menu_button(bot) -> bool:
         """Update bot menu button on Telegram"""
         try:
-            return asyncio.run(BotProfileService._update_bot_menu_button_async(bot))
+            return bot_runtime.run(BotProfileService._update_bot_menu_button_async(bot))
         except Exception as e:
             logger.error(f"Error updating menu button for {bot.username}: {e}")
             return False
@@ -258,7 +249,7 @@ class BotProfileService:
         try:
             # Get decrypted token
             token = encryption_service.decrypt(bot.token_enc)
-            aiogram_bot = AiogramBot(token=token)
+            aiogram_bot = BotSessionPool.create_bot(token)
             
             # Update menu button if provided
             if bot.menu_button_text and bot.menu_button_url:
@@ -273,8 +264,6 @@ class BotProfileService:
                     logger.warning(f"Failed to update menu button for {bot.username}: {e}")
                     return False
             
-            # Close bot session
-            await aiogram_bot.session.close()
             return True
             
         except Exception as e:
@@ -285,7 +274,7 @@ class BotProfileService:
     def update_bot_commands(bot) -> bool:
         """Update bot commands on Telegram"""
         try:
-            return asyncio.run(BotProfileService._update_bot_commands_async(bot))
+            return bot_runtime.run(BotProfileService._update_bot_commands_async(bot))
         except Exception as e:
             logger.error(f"Error updating commands for {bot.username}: {e}")
             return False
@@ -296,7 +285,7 @@ class BotProfileService:
         try:
             # Get decrypted token
             token = encryption_service.decrypt(bot.token_enc)
-            aiogram_bot = AiogramBot(token=token)
+            aiogram_bot = BotSessionPool.create_bot(token)
             
             # Update bot commands if provided
             if bot.commands:
@@ -316,8 +305,6 @@ class BotProfileService:
                     logger.warning(f"Failed to update commands for {bot.username}: {e}")
                     return False
             
-            # Close bot session
-            await aiogram_bot.session.close()
             return True
             
         except Exception as e:
@@ -0,0 +1,219 @@
+import asyncio
+import hmac
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from django.conf import settings
+from apps.core.encryption import encryption_service
+from .models import Bot
+
+logger = logging.getLogger('bots')
+
+@dataclass(frozen=True)
+class BotEntry:
+    """Snapshot of the bot metadata needed on the ingest hot path"""
+    id: int
+    bot_id: int
+    username: str
+    status: str
+    token: str
+    token_enc: str
+    auto_reply_enabled: bool
+    auto_reply_message: str
+    webhook_secret: str
+
+
+class BotRegistry:
+    """Process-wide registry of active bots with decrypted tokens"""
+
+    _entries: Dict[int, BotEntry] = {}
+    _by_secret: Dict[str, int] = {}
+    _lock = threading.Lock()
+    _loaded_at = 0.0
+    _reloading = False
+    _reload_task: Optional[asyncio.Task] = None
+    
+    # Minimum seconds between reloads triggered by unknown webhook secrets
+    RELOAD_INTERVAL = 30
+
+    @classmethod
+    def load(cls) -> int:
+        """Rebuild the registry from all active bots, dropping bots deactivated or deleted elsewhere"""
+        cls._loaded_at = time.monotonic()
+        try:
+            bots = list(Bot.objects.filter(status='active'))
+        except Exception as e:
+            logger.error(f"Failed to load bot registry: {e}")
+            return 0
+
+        entries: Dict[int, BotEntry] = {}
+        for bot in bots:
+            entry = cls._build(bot)
+            if entry is not None:
+                entries[bot.id] = entry
+
+        # Lookups see either the old or the new registry, never a mix
+        with cls._lock:
+            cls._entries = entries
+            cls._by_secret = {entry.webhook_secret: bot_id for bot_id, entry in entries.items()}
+
+        logger.info(f"Loaded {len(entries)} bots into registry")
+        return len(entries)
+
+    @classmethod
+    def stale(cls) -> bool:
+        """Check whether the registry is older than BOT_REGISTRY_TTL"""
+        return time.monotonic() - cls._loaded_at >= getattr(settings, 'BOT_REGISTRY_TTL', 60)
+
+    @classmethod
+    async def aload_if_stale(cls):
+        """Reload once the TTL passed, picking up edits made by other processes or by queryset updates"""
+        if cls._reloading or not cls.stale():
+            return
+
+        cls._reloading = True
+        if not cls._loaded_at:
+            # Nothing to answer from yet, the first load is awaited
+            await cls._reload()
+        else:
+            # Lookups keep answering from the current snapshot while it is rebuilt
+            cls._reload_task = asyncio.create_task(cls._reload())
+
+    @classmethod
+    async def _reload(cls):
+        from asgiref.sync import sync_to_async
+
+        try:
+            await sync_to_async(cls.load)()
+        finally:
+            cls._reloading = False
+
+    @classmethod
+    def get(cls, bot_id: int) -> Optional[BotEntry]:
+        """Get registry entry without touching the database"""
+        return cls._entries.get(bot_id)
+
+    @classmethod
+    def get_by_secret(cls, secret: str) -> Optional[BotEntry]:
+        """Resolve a bot from its webhook secret token without touching the database"""
+        bot_id = cls._by_secret.get(secret)
+        return cls._entries.get(bot_id) if bot_id is not None else None
+
+    @classmethod
+    async def averify_secret(cls, bot_id: int, secret: str) -> bool:
+        """Check the secret of a per-bot webhook URL, known bots are resolved from the registry"""
+        await cls.aload_if_stale()
+        entry = cls._entries.get(bot_id)
+        if entry is not None:
+            expected_secret = entry.webhook_secret
+        else:
+            from .aiogram_manager import AiogramManager
+
+            expected_secret = AiogramManager._generate_webhook_secret(bot_id)
+        if not hmac.compare_digest(secret, expected_secret):
+            logger.warning(f"Invalid webhook secret for bot {bot_id}")
+            return False
+        return True
+
+    @classmethod
+    async def aresolve_secret(cls, secret: str) -> Optional[BotEntry]:
+        """Resolve the bot an update posted to the shared webhook URL belongs to"""
+        await cls.aload_if_stale()
+        entry = cls.get_by_secret(secret) if secret else None
+
+        # Bots started by another process only appear here after a reload
+        if entry is None and secret and cls.reload_due():
+            from asgiref.sync import sync_to_async
+
+            await sync_to_async(cls.load)()
+            entry = cls.get_by_secret(secret)
+
+        if entry is None:
+            logger.warning("Unknown secret token on shared webhook")
+        return entry
+
+    @classmethod
+    def reload_due(cls) -> bool:
+        """Check whether a full reload is allowed yet"""
+        return time.monotonic() - cls._loaded_at >= cls.RELOAD_INTERVAL
+
+    @classmethod
+    def get_or_load(cls, bot_id: int) -> Optional[BotEntry]:
+        """Get registry entry, loading it from the database on a miss"""
+        entry = cls._entries.get(bot_id)
+        if entry is not None:
+            return entry
+
+        try:
+            bot = Bot.objects.get(id=bot_id, status='active')
+        except Bot.DoesNotExist:
+            logger.error(f"❌ Bot {bot_id} not found in database or not active")
+            return None
+
+        return cls.refresh(bot)
+
+    @classmethod
+    def refresh(cls, bot: Bot) -> Optional[BotEntry]:
+        """Rebuild the entry for a bot, dropping it if the bot is no longer active"""
+        if bot.status != 'active':
+            cls.remove(bot.id)
+            return None
+
+        entry = cls._build(bot)
+        if entry is None:
+            cls.remove(bot.id)
+            return None
+
+        with cls._lock:
+            previous = cls._entries.get(bot.id)
+            if previous is not None:
+                cls._by_secret.pop(previous.webhook_secret, None)
+            cls._entries[bot.id] = entry
+            cls._by_secret[entry.webhook_secret] = bot.id
+
+        return entry
+
+    @classmethod
+    def _build(cls, bot: Bot) -> Optional[BotEntry]:
+        """Build the entry of an active bot, None when its token cannot be decrypted"""
+        # Only pay for decryption when the stored token actually changed
+        current = cls._entries.get(bot.id)
+        if current is not None and current.token_enc == bot.token_enc:
+            token = current.token
+        else:
+            try:
+                token = encryption_service.decrypt(bot.token_enc)
+            except Exception as e:
+                logger.error(f"Failed to decrypt token for bot {bot.id}: {e}")
+                return None
+
+        from .aiogram_manager import AiogramManager
+
+        return BotEntry(
+            id=bot.id,
+            bot_id=bot.bot_id,
+            username=bot.username,
+            status=bot.status,
+            token=token,
+            token_enc=bot.token_enc,
+            auto_reply_enabled=bot.auto_reply_enabled,
+            auto_reply_message=bot.auto_reply_message,
+            webhook_secret=AiogramManager._generate_webhook_secret(bot.id),
+        )
+
+    @classmethod
+    def remove(cls, bot_id: int):
+        """Drop a bot from the registry"""
+        with cls._lock:
+            entry = cls._entries.pop(bot_id, None)
+            if entry is not None:
+                cls._by_secret.pop(entry.webhook_secret, None)
+
+    @classmethod
+    def clear(cls):
+        """Drop all entries"""
+        with cls._lock:
+            cls._entries.clear()
+            cls._by_secret.clear()
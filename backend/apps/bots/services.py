@@ -1,12 +1,14 @@
-import asyncio
 import logging
-from typing import Optional
+from typing import Iterable, List, Optional
 from django.utils import timezone
-from aiogram import Bot as AiogramBot
 from aiogram.exceptions import TelegramUnauthorizedError, TelegramBadRequest
+from .http_session import BotSessionPool
 from .models import Bot
 from apps.core.encryption import encryption_service
-from .aiogram_manager import AiogramManager
+from apps.core.leases import LeasedKind
+from apps.core.runtime import bot_runtime
+from .aiogram_manager import AiogramManager, BotStartResult
+from .registry import BotRegistry
 
 logger = logging.getLogger('bots')
 
@@ -34,7 +36,7 @@ class BotService:
             
             # Try to get bot info (with better error handling)
             try:
-                bot_info = asyncio.run(BotService._get_bot_info(token))
+                bot_info = bot_runtime.run(BotService._get_bot_info(token))
             except Exception as api_error:
                 logger.error(f"Failed to validate bot token with Telegram API: {api_error}")
                 # For development, create bot with basic info if API fails
@@ -74,9 +76,8 @@ class BotService:
     async def _get_bot_info(token: str) -> dict:
         """Get bot information from Telegram"""
         try:
-            bot = AiogramBot(token=token)
+            bot = BotSessionPool.create_bot(token)
             me = await bot.get_me()
-            await bot.session.close()
             
             return {
                 'id': me.id,
@@ -103,21 +104,14 @@ class BotService:
                 bot.save()
                 return False
             
-            # Test token first
-            test_result = asyncio.run(BotService._test_bot_async(token))
-            if not test_result:
-                logger.error(f"Bot token test failed for bot {bot.id}")
-                bot.status = 'error'
-                bot.save()
-                return False
-            
-            # Start bot
+            # Start bot, webhook reconciliation authenticates the token with its first call
             success = AiogramManager.start_bot(bot.id, token)
             
             if success:
                 bot.status = 'active'
                 bot.last_seen = timezone.now()
-                bot.save()
+                # Webhook state was persisted during start, don't overwrite it with stale values
+                bot.save(update_fields=['status', 'last_seen', 'updated_at'])
                 logger.info(f"Successfully started bot @{bot.username}")
                 return True
             else:
@@ -134,6 +128,61 @@ class BotService:
             bot.save()
             return False
     
+    @staticmethod
+    def leased() -> LeasedKind:
+        """Let the worker leases decide which bots this process starts and keeps warm"""
+        def start(bot_ids: List[int]) -> List[int]:
+            results = BotService.start_bots(Bot.objects.filter(id__in=bot_ids))
+            return [result.bot_id for result in results if result.success]
+        
+        def stop(bot_ids: List[int]):
+            for bot_id in bot_ids:
+                AiogramManager.release_bot(bot_id)
+        
+        return LeasedKind(
+            kind='bot',
+            load_ids=lambda: Bot.objects.filter(status='active').values_list('id', flat=True),
+            start=start,
+            stop=stop,
+        )
+    
+    @staticmethod
+    def start_bots(bots: Iterable[Bot], concurrency: Optional[int] = None) -> List[BotStartResult]:
+        """Start many bots concurrently and record their status in bulk"""
+        bots = list(bots)
+        by_id = {bot.id: bot for bot in bots}
+        tokens = []
+        results = []
+        
+        for bot in bots:
+            try:
+                tokens.append((bot.id, encryption_service.decrypt(bot.token_enc)))
+            except Exception as e:
+                logger.error(f"Failed to decrypt token for bot {bot.id}: {e}")
+                results.append(BotStartResult(bot.id, False, 0.0, 0, 'token decryption failed'))
+        
+        # Webhook setup authenticates with get_me, so no separate token test round trip
+        results.extend(AiogramManager.start_bots(tokens, concurrency))
+        
+        now = timezone.now()
+        started = [result.bot_id for result in results if result.success]
+        failed = [result.bot_id for result in results if not result.success]
+        if started:
+            Bot.objects.filter(id__in=started).update(status='active', last_seen=now)
+        if failed:
+            Bot.objects.filter(id__in=failed).update(status='error')
+        
+        # Queryset updates skip post_save, so keep the registry in step here
+        for result in results:
+            bot = by_id[result.bot_id]
+            bot.status = 'active' if result.success else 'error'
+            if result.success:
+                bot.last_seen = now
+            BotRegistry.refresh(bot)
+        
+        logger.info(f"Started {len(started)} out of {len(bots)} bots")
+        return results
+    
     @staticmethod
     def stop_bot(bot: Bot) -> bool:
         """Stop a bot"""
@@ -142,7 +191,7 @@ class BotService:
             
             if success:
                 bot.status = 'inactive'
-                bot.save()
+                bot.save(update_fields=['status', 'updated_at'])
                 logger.info(f"Stopped bot @{bot.username}")
                 return True
             else:
@@ -157,7 +206,7 @@ class BotService:
         """Test bot connection"""
         try:
             token = encryption_service.decrypt(bot.token_enc)
-            result = asyncio.run(BotService._test_bot_async(token))
+            result = bot_runtime.run(BotService._test_bot_async(token))
             return result
         except Exception as e:
             logger.error(f"Failed to test bot {bot.id}: {e}")
@@ -167,9 +216,8 @@ class BotService:
     async def _test_bot_async(token: str) -> bool:
         """Test bot connection asynchronously"""
         try:
-            bot = AiogramBot(token=token)
+            bot = BotSessionPool.create_bot(token)
             await bot.get_me()
-            await bot.session.close()
             return True
         except Exception:
             return False
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Bot
+from .registry import BotRegistry
+
+
+@receiver(post_save, sender=Bot)
+def refresh_bot_registry(sender, instance, **kwargs):
+    """Keep the in-memory bot registry in sync with saved bots"""
+    BotRegistry.refresh(instance)
+
+
+@receiver(post_delete, sender=Bot)
+def evict_bot_registry(sender, instance, **kwargs):
+    """Drop deleted bots from the in-memory bot registry"""
+    BotRegistry.remove(instance.id)
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Optional
+from django.conf import settings
+from aiogram_handlers.message_handler import MessageHandler
+from apps.core.metrics import LatencyTracker
+from apps.core.runtime import bot_runtime
+from apps.chats.cache import ChatCache
+from apps.core.user_cache import TelegramUserCache
+from apps.notifications.fanout import NotificationFanout
+from .aiogram_manager import AiogramManager
+from .cooldown import AutoReplyCooldown
+from .dedupe import UpdateDeduplicator
+from .http_session import BotSessionPool
+
+logger = logging.getLogger('bots')
+
+class UpdateQueue:
+    """Queue decoupling webhook ingress from update dispatch"""
+
+    _queue: Optional[asyncio.Queue] = None
+    _lock = threading.Lock()
+
+    # Latency of the webhook acknowledgement, time spent queued and dispatch time
+    ack_latency = LatencyTracker()
+    queue_latency = LatencyTracker()
+    dispatch_latency = LatencyTracker()
+    rejected = 0
+
+    @classmethod
+    def enqueue(cls, bot_id: int, body: bytes, received_at: float) -> bool:
+        """Enqueue a raw webhook update, returns False when the queue is full"""
+        if cls._queue is None:
+            cls.start()
+
+        max_size = getattr(settings, 'WEBHOOK_QUEUE_MAX_SIZE', 10000)
+        if cls._queue.qsize() >= max_size:
+            cls.rejected += 1
+            return False
+
+        bot_runtime.call_soon(cls._queue.put_nowait, (bot_id, body, received_at))
+        return True
+
+    @classmethod
+    def accept(cls, bot_id: int, body: bytes, received_at: float) -> int:
+        """Hand an authenticated update to the queue, returns the status code to acknowledge it with"""
+        # Parsing and dispatch happen in the consumer stage
+        if not cls.enqueue(bot_id, body, received_at):
+            logger.warning(f"Update queue full, asking Telegram to retry update for bot {bot_id}")
+            return 503
+
+        cls.ack_latency.record(time.perf_counter() - received_at)
+        return 200
+
+    @classmethod
+    def start(cls):
+        """Start the consumer workers on the bot runtime if they are not running yet"""
+        with cls._lock:
+            if cls._queue is not None:
+                return
+            cls._queue = bot_runtime.run(cls._start_workers())
+            logger.info("Started webhook update queue consumer")
+
+    @classmethod
+    async def _start_workers(cls) -> asyncio.Queue:
+        """Create the queue and its workers on the runtime loop"""
+        update_queue = asyncio.Queue()
+        for _ in range(getattr(settings, 'WEBHOOK_QUEUE_WORKERS', 8)):
+            asyncio.create_task(cls._worker(update_queue))
+        return update_queue
+
+    @classmethod
+    async def _worker(cls, update_queue: asyncio.Queue):
+        """Consume queued updates and feed them to the bot dispatchers"""
+        while True:
+            bot_id, body, received_at = await update_queue.get()
+            try:
+                started = time.perf_counter()
+                cls.queue_latency.record(started - received_at)
+
+                try:
+                    update_data = json.loads(body)
+                except (ValueError, UnicodeDecodeError) as e:
+                    logger.error(f"Invalid JSON in webhook for bot {bot_id}: {e}")
+                    continue
+
+                await AiogramManager.process_webhook(bot_id, update_data)
+                cls.dispatch_latency.record(time.perf_counter() - started)
+            except Exception as e:
+                logger.error(f"❌ Error dispatching update for bot {bot_id}: {e}")
+            finally:
+                update_queue.task_done()
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """Get queue depth and latency statistics"""
+        return {
+            'depth': cls._queue.qsize() if cls._queue else 0,
+            'rejected': cls.rejected,
+            'duplicates': UpdateDeduplicator.duplicates,
+            'ack': cls.ack_latency.snapshot(),
+            'queued': cls.queue_latency.snapshot(),
+            'dispatch': cls.dispatch_latency.snapshot(),
+            'auto_reply': MessageHandler.auto_reply_latency.snapshot(),
+            'auto_reply_cooldown': AutoReplyCooldown.get_stats(),
+            'user_cache': TelegramUserCache.get_stats(),
+            'chat_cache': ChatCache.get_stats(),
+            'notifications': NotificationFanout.get_stats(),
+            'http_pool': BotSessionPool.get_stats(),
+        }
@@ -421,3 +421,9 @@ def update_auto_reply(request, bot_id):
     
     return redirect('bots:bot_settings', bot_id=bot_id)
 
+
+@login_required
+def webhook_stats(request):
+    """Get webhook ingress queue and latency statistics"""
+    from .update_queue import UpdateQueue
+    return JsonResponse(UpdateQueue.get_stats())
@@ -4,5 +4,6 @@ from . import webhook_views
 app_name = 'bot_webhooks'
 
 urlpatterns = [
+    path('bot/', webhook_views.shared_webhook, name='shared_webhook'),
     path('bot/<int:bot_id>/<str:secret>/', webhook_views.bot_webhook, name='bot_webhook'),
 ]
\ No newline at end of file
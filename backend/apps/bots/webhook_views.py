@@ -1,51 +1,34 @@
-import json
-import logging
-import hashlib
-import hmac
+import time
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from asgiref.sync import async_to_sync
-from .models import Bot
-from .aiogram_manager import AiogramManager
-from apps.core.encryption import encryption_service
+from .registry import BotRegistry
+from .update_queue import UpdateQueue
+
+@csrf_exempt
+@require_POST
+async def bot_webhook(request, bot_id: int, secret: str):
+    """Acknowledge bot webhook and hand the update over to the update queue"""
+    received_at = time.perf_counter()
+
+    if not await BotRegistry.averify_secret(bot_id, secret):
+        return HttpResponse(status=403)
+
+    return _respond(UpdateQueue.accept(bot_id, request.body, received_at))
 
-logger = logging.getLogger('bots')
 
 @csrf_exempt
 @require_POST
-def bot_webhook(request, bot_id: int, secret: str):
-    """Handle bot webhook"""
-    try:
-        # Verify bot exists and secret
-        try:
-            bot = Bot.objects.get(id=bot_id)
-        except Bot.DoesNotExist:
-            logger.warning(f"Webhook called for non-existent bot {bot_id}")
-            return HttpResponse(status=404)
-        
-        # Verify webhook secret matches what AiogramManager generates
-        expected_secret = hashlib.sha256(f"bot_{bot_id}_webhook".encode()).hexdigest()[:32]
-        if secret != expected_secret:
-            logger.warning(f"Invalid webhook secret for bot {bot_id}")
-            return HttpResponse(status=403)
-        
-        # Parse update data
-        try:
-            update_data = json.loads(request.body.decode('utf-8'))
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in webhook for bot {bot_id}: {e}")
-            return JsonResponse({'error': 'Invalid JSON'}, status=400)
-        
-        # Log webhook processing
-        logger.info(f"🔔 Processing webhook for bot {bot_id}, update type: {update_data.get('update_id', 'unknown')}")
-        
-        # Process update asynchronously
-        async_to_sync(AiogramManager.process_webhook)(bot_id, update_data)
-        
-        logger.info(f"✅ Webhook processed successfully for bot {bot_id}")
-        return JsonResponse({'status': 'ok'})
-        
-    except Exception as e:
-        logger.error(f"Error processing webhook for bot {bot_id}: {e}")
-        return JsonResponse({'error': 'Internal server error'}, status=500)
\ No newline at end of file
+async def shared_webhook(request):
+    """Acknowledge an update posted to the shared webhook URL, routed by its secret token header"""
+    received_at = time.perf_counter()
+
+    entry = await BotRegistry.aresolve_secret(request.headers.get('X-Telegram-Bot-Api-Secret-Token', ''))
+    if entry is None:
+        return HttpResponse(status=403)
+
+    return _respond(UpdateQueue.accept(entry.id, request.body, received_at))
+
+
+def _respond(status: int) -> HttpResponse:
+    return JsonResponse({'status': 'ok'}) if status == 200 else HttpResponse(status=status)
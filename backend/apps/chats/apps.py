@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class ChatsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.chats'
-    label = 'telegram_chats'  # Custom label for clarity
\ No newline at end of file
+    label = 'telegram_chats'  # Custom label for clarity
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,118 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CHAT_FIELDS = ('id', 'type', 'bot_id', 'account_id', 'chat_id', 'title', 'chat_type')
+
+
+class ChatCache:
+    """LRU from (type, bot or account ID, Telegram chat ID) to the stored chat row"""
+
+    _chats: "OrderedDict[Tuple[str, int, int], dict]" = OrderedDict()
+    _lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def key_for(chat) -> Tuple[str, int, int]:
+        owner_id = chat.bot_id if chat.type == 'bot_chat' else chat.account_id
+        return (chat.type, owner_id, chat.chat_id)
+
+    @classmethod
+    def get(cls, type: str, owner_id: int, chat_id: int):
+        """Get an unsaved Chat instance built from the cached fields, None when the chat is unknown"""
+        from .models import Chat
+
+        key = (type, owner_id, chat_id)
+        with cls._lock:
+            fields = cls._chats.get(key)
+            if fields is None:
+                cls.misses += 1
+                return None
+            cls._chats.move_to_end(key)
+            cls.hits += 1
+
+        # Instances carry the identity and denormalized fields only, they are not meant to be saved
+        chat = Chat(**fields)
+        chat._state.adding = False
+        chat._state.db = 'default'
+        return chat
+
+    @classmethod
+    def remember(cls, chats: Iterable):
+        """Cache stored chats"""
+        max_size = getattr(settings, 'CHAT_CACHE_SIZE', 100000)
+        with cls._lock:
+            for chat in chats:
+                key = cls.key_for(chat)
+                cls._chats[key] = {field: getattr(chat, field) for field in CHAT_FIELDS}
+                cls._chats.move_to_end(key)
+            while len(cls._chats) > max_size:
+                cls._chats.popitem(last=False)
+
+    @classmethod
+    def remember_on_commit(cls, chats: Iterable):
+        """Cache chats once the transaction that created them is durable"""
+        chats = list(chats)
+        transaction.on_commit(lambda: cls.remember(chats))
+
+    @classmethod
+    def remove(cls, chat):
+        """Drop a chat, e.g. after it was deleted"""
+        with cls._lock:
+            cls._chats.pop(cls.key_for(chat), None)
+
+    @classmethod
+    def resolve(cls, type: str, owner_id: int, chat_id: int, title: Optional[str] = None,
+                chat_type: Optional[str] = None):
+        """Get a chat from the cache, falling back to get_or_create"""
+        chat = cls.get(type, owner_id, chat_id)
+        if chat is not None:
+            return chat
+        return cls._get_or_create(type, owner_id, chat_id, title, chat_type)
+
+    @classmethod
+    async def aresolve(cls, type: str, owner_id: int, chat_id: int, title: Optional[str] = None,
+                       chat_type: Optional[str] = None):
+        """Async variant of resolve, a cache hit does not leave the event loop"""
+        from asgiref.sync import sync_to_async
+
+        chat = cls.get(type, owner_id, chat_id)
+        if chat is not None:
+            return chat
+        return await sync_to_async(cls._get_or_create)(type, owner_id, chat_id, title, chat_type)
+
+    @classmethod
+    def _get_or_create(cls, type: str, owner_id: int, chat_id: int, title: Optional[str],
+                       chat_type: Optional[str]):
+        from .models import Chat
+
+        owner = {'bot_id': owner_id} if type == 'bot_chat' else {'account_id': owner_id}
+        chat, created = Chat.objects.get_or_create(
+            type=type,
+            chat_id=chat_id,
+            **owner,
+            defaults={'title': title, 'chat_type': chat_type},
+        )
+        if created:
+            logger.info(f"Created new chat: {chat.title or chat.chat_id}")
+        cls.remember_on_commit([chat])
+        return chat
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """Get cache hit and miss counters"""
+        return {'size': len(cls._chats), 'hits': cls.hits, 'misses': cls.misses}
+
+    @classmethod
+    def clear(cls):
+        """Drop all cached chats and reset counters"""
+        with cls._lock:
+            cls._chats.clear()
+            cls.hits = 0
+            cls.misses = 0
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import ChatCache
+from .models import Chat
+
+
+@receiver(post_save, sender=Chat)
+def refresh_chat_cache(sender, instance, update_fields=None, **kwargs):
+    """Drop saved chats so the next lookup reads the changed fields"""
+    if update_fields is None or not set(update_fields) <= {'last_message_at', 'updated_at'}:
+        ChatCache.remove(instance)
+
+
+@receiver(post_delete, sender=Chat)
+def evict_chat_cache(sender, instance, **kwargs):
+    """Drop deleted chats from the chat resolution cache"""
+    ChatCache.remove(instance)
@@ -0,0 +1,234 @@
+import hashlib
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .models import Lease, Worker
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LeasedKind:
+    """How a worker lists, starts and stops one kind of resource"""
+    kind: str
+    load_ids: Callable[[], Iterable[int]]  # Everything that should run on some worker
+    start: Callable[[List[int]], Iterable[int]]  # Returns the IDs that started
+    stop: Callable[[List[int]], None]
+
+
+def rendezvous_owner(kind: str, object_id: int, workers: Iterable[str]) -> Optional[str]:
+    """Pick the worker a resource belongs to, a joining or leaving worker only moves its own share"""
+    key = f'{kind}:{object_id}|'
+    return max(
+        workers,
+        key=lambda worker_id: hashlib.blake2b(f'{key}{worker_id}'.encode(), digest_size=8).digest(),
+        default=None,
+    )
+
+
+def live_workers(now=None) -> List[str]:
+    """IDs of the workers that heartbeated within the lease TTL"""
+    now = now or timezone.now()
+    ttl = timedelta(seconds=getattr(settings, 'WORKER_LEASE_TTL', 30))
+    return sorted(Worker.objects.filter(heartbeat_at__gte=now - ttl).values_list('worker_id', flat=True))
+
+
+def lease_owner(kind: str, object_id: int) -> Optional[str]:
+    """Worker holding a resource, or the one about to take it when nobody holds it yet"""
+    now = timezone.now()
+    worker_id = (
+        Lease.objects.filter(kind=kind, object_id=object_id, expires_at__gt=now)
+        .values_list('worker_id', flat=True)
+        .first()
+    )
+    return worker_id or rendezvous_owner(kind, object_id, live_workers(now))
+
+
+def leased_ids(kind: str) -> List[int]:
+    """IDs of the resources of a kind some live worker holds"""
+    return list(Lease.objects.filter(kind=kind, expires_at__gt=timezone.now()).values_list('object_id', flat=True))
+
+
+class LeaseCoordinator:
+    """Shards bots and accounts across worker processes through heartbeats and expiring leases"""
+
+    def __init__(self, worker_id: Optional[str] = None):
+        # Worker IDs name the worker's RPC channel, so they are limited to channel-safe characters
+        self.worker_id = re.sub(r'[^\w.-]', '-', worker_id or f'{socket.gethostname()}-{os.getpid()}')
+        self._kinds: Dict[str, LeasedKind] = {}
+        self._running: Dict[str, Set[int]] = {}
+        # Attempts and monotonic retry time of resources that failed to start
+        self._failures: Dict[str, Dict[int, Tuple[int, float]]] = {}
+        self._renewer: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.handoffs = 0
+
+    def register(self, kind: LeasedKind):
+        """Have this worker host its share of a kind of resource"""
+        self._kinds[kind.kind] = kind
+        self._running.setdefault(kind.kind, set())
+        self._failures.setdefault(kind.kind, {})
+
+    def renew(self):
+        """Mark this worker alive and extend all its leases"""
+        now = timezone.now()
+        Worker.objects.update_or_create(worker_id=self.worker_id, defaults={'heartbeat_at': now})
+        # One statement however many resources this worker holds
+        Lease.objects.filter(worker_id=self.worker_id).update(expires_at=now + self._ttl(), updated_at=now)
+
+    def start_renewing(self, interval: Optional[float] = None):
+        """Renew the leases on a thread of their own, so a slow start never lets them expire"""
+        interval = interval or getattr(settings, 'WORKER_HEARTBEAT_INTERVAL', 10)
+        self._stopped.clear()
+        self._renewer = threading.Thread(
+            target=self._renew_loop, args=(interval,), name=f'lease-renewer-{self.worker_id}', daemon=True
+        )
+        self._renewer.start()
+
+    def _renew_loop(self, interval: float):
+        try:
+            while not self._stopped.wait(interval):
+                try:
+                    self.renew()
+                except Exception as e:
+                    # Leases outlive a few missed renewals, a dropped connection is replaced for the next one
+                    logger.error(f"❌ Worker {self.worker_id} failed to renew its leases: {e}")
+                    connection.close_if_unusable_or_obsolete()
+        finally:
+            connection.close()
+
+    def heartbeat(self):
+        """Mark this worker alive and extend all its leases, stopping whatever another worker took over"""
+        self.renew()
+
+        held = self._held()
+        for name, running in self._running.items():
+            lost = running - held.get(name, set())
+            if lost:
+                logger.warning(f"⚠️ Worker {self.worker_id} lost the leases of {len(lost)} {name}s, stopping them")
+                self._stop(name, lost)
+
+    def rebalance(self):
+        """Release what belongs to other live workers, then take and start this worker's share"""
+        now = timezone.now()
+        workers = live_workers(now)
+        if self.worker_id not in workers:
+            workers.append(self.worker_id)
+
+        held = self._held()
+        for name, kind in self._kinds.items():
+            wanted = {
+                object_id for object_id in kind.load_ids()
+                if rendezvous_owner(name, object_id, workers) == self.worker_id
+            }
+            mine = held.get(name, set())
+
+            release = mine - wanted
+            if release:
+                # Stopped before the lease goes, so the next owner never overlaps with this one
+                self._stop(name, release)
+                Lease.objects.filter(kind=name, worker_id=self.worker_id, object_id__in=release).delete()
+                self.handoffs += len(release)
+
+            acquire = wanted - mine
+            if acquire:
+                mine = (mine - release) | self._acquire(name, acquire, now)
+
+            failures = self._failures[name]
+            for object_id in set(failures) - wanted:
+                del failures[object_id]
+            # Resources that failed to start wait out their backoff instead of retrying every heartbeat
+            retry_now = time.monotonic()
+            pending = sorted(
+                object_id for object_id in (mine & wanted) - self._running[name]
+                if failures.get(object_id, (0, 0.0))[1] <= retry_now
+            )
+            if pending:
+                started = set(kind.start(pending))
+                self._running[name] |= started
+                self._record_failures(name, set(pending) - started, started)
+                logger.info(
+                    f"✅ Worker {self.worker_id} started {len(started)} of {len(pending)} {name}s, "
+                    f"hosting {len(self._running[name])} of {len(wanted)} assigned"
+                )
+
+        # Workers gone for longer than a few TTLs are only kept for inspection
+        Worker.objects.filter(heartbeat_at__lt=now - self._ttl() * 10).delete()
+
+    def leave(self):
+        """Stop everything and hand it over at once instead of waiting for the leases to expire"""
+        self._stopped.set()
+        if self._renewer is not None:
+            self._renewer.join()
+            self._renewer = None
+        for name, running in self._running.items():
+            if running:
+                self._stop(name, set(running))
+        Lease.objects.filter(worker_id=self.worker_id).delete()
+        Worker.objects.filter(worker_id=self.worker_id).delete()
+        logger.info(f"👋 Worker {self.worker_id} left")
+
+    def _record_failures(self, name: str, failed: Set[int], started: Set[int]):
+        failures = self._failures[name]
+        for object_id in started:
+            failures.pop(object_id, None)
+        if not failed:
+            return
+        max_delay = getattr(settings, 'WORKER_START_MAX_BACKOFF', 900)
+        interval = getattr(settings, 'WORKER_HEARTBEAT_INTERVAL', 10)
+        now = time.monotonic()
+        for object_id in failed:
+            attempts = failures.get(object_id, (0, 0.0))[0] + 1
+            failures[object_id] = (attempts, now + min(interval * 2 ** attempts, max_delay))
+        logger.warning(f"⚠️ Worker {self.worker_id} failed to start {name}s {sorted(failed)}, retrying with backoff")
+
+    def _acquire(self, name: str, object_ids: Set[int], now) -> Set[int]:
+        """Take unclaimed and expired leases, returns the IDs this worker now holds"""
+        expires_at = now + self._ttl()
+        Lease.objects.bulk_create(
+            [Lease(kind=name, object_id=object_id, worker_id=self.worker_id, expires_at=expires_at) for object_id in object_ids],
+            ignore_conflicts=True,
+        )
+        # A lease that expired belongs to a worker that stopped heartbeating
+        Lease.objects.filter(kind=name, object_id__in=object_ids, expires_at__lt=now).update(
+            worker_id=self.worker_id, expires_at=expires_at, updated_at=now
+        )
+        return set(
+            Lease.objects.filter(kind=name, object_id__in=object_ids, worker_id=self.worker_id)
+            .values_list('object_id', flat=True)
+        )
+
+    def _held(self) -> Dict[str, Set[int]]:
+        held: Dict[str, Set[int]] = {}
+        for name, object_id in Lease.objects.filter(worker_id=self.worker_id).values_list('kind', 'object_id'):
+            held.setdefault(name, set()).add(object_id)
+        return held
+
+    def _stop(self, name: str, object_ids: Set[int]):
+        try:
+            self._kinds[name].stop(sorted(object_ids))
+        except Exception as e:
+            logger.error(f"❌ Worker {self.worker_id} failed to stop {name}s {sorted(object_ids)}: {e}")
+        self._running[name] -= object_ids
+
+    @staticmethod
+    def _ttl() -> timedelta:
+        return timedelta(seconds=getattr(settings, 'WORKER_LEASE_TTL', 30))
+
+    def get_stats(self) -> dict:
+        """Get the hosted resource counts of this worker"""
+        return {
+            'worker_id': self.worker_id,
+            'running': {name: len(running) for name, running in self._running.items()},
+            'failed': {name: len(failures) for name, failures in self._failures.items()},
+            'handoffs': self.handoffs,
+        }
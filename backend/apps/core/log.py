@@ -0,0 +1,103 @@
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Tuple
+from django.conf import settings
+
+# Attributes every LogRecord has, anything else was passed through `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def log_event(logger: logging.Logger, level: int, event: str, msg: str, *args, **fields):
+    """Log a high-volume event as one record, sampled by LOG_SAMPLE_RATE before the record is built"""
+    if not logger.isEnabledFor(level):
+        return
+    rate = getattr(settings, 'LOG_SAMPLE_RATE', 1.0)
+    if rate < 1:
+        if random.random() >= rate:
+            return
+        fields['sample_rate'] = rate
+    logger.log(level, msg, *args, extra={'event': event, **fields}, stacklevel=2)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the `extra` fields as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Cap records per call site and second, the next record let through reports how many were dropped"""
+
+    def __init__(self, per_second: int = 0):
+        super().__init__()
+        self.per_second = per_second
+        self._windows: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.per_second <= 0:
+            return True
+
+        key = (record.pathname, record.lineno)
+        second = int(time.monotonic())
+        with self._lock:
+            window = self._windows.setdefault(key, [second, 0, 0])
+            if window[0] != second:
+                window[0], window[1] = second, 0
+            if window[1] >= self.per_second:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hand records to a background thread that formats and writes them, dropping records when the queue is full"""
+
+    def __init__(self, maxsize: int = 10000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self._listener = QueueListener(self.queue, self.target)
+        self._listener.start()
+
+    def setFormatter(self, fmt):
+        # Formatting, including tracebacks, happens on the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records stay in-process, so only the message is resolved before arguments can change
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # Called by logging.shutdown() at exit, drains what is still queued
+        if self._listener._thread is not None:
+            self._listener.stop()
+        super().close()
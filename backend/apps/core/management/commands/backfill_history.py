@@ -0,0 +1,72 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from apps.accounts.models import Account
+from apps.accounts.services import AccountService
+from apps.accounts.supervisor import AccountRPC
+
+
+class Command(BaseCommand):
+    help = 'Import the existing message history of an account, resuming where a previous run stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('account_id', type=int, help='Account to import the history of')
+        parser.add_argument(
+            '--chat-id', type=int, action='append', dest='chat_ids',
+            help='Telegram chat ID to import, may be repeated (default: all dialogs)',
+        )
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between progress reports')
+        parser.add_argument(
+            '--in-process', action='store_true',
+            help='Run the client in this process, only safe when no other process runs the account',
+        )
+
+    def handle(self, *args, **options):
+        account = Account.objects.filter(id=options['account_id']).first()
+        if account is None:
+            raise CommandError(f"Account {options['account_id']} not found")
+        chat_ids = options['chat_ids']
+
+        # Without a supervisor or workers the web process may run the same client, two connections
+        # on one auth key get the session revoked and both write the same session rows
+        if not AccountRPC.is_remote() and not options['in_process']:
+            raise CommandError(
+                'Neither TELETHON_SUPERVISOR nor WORKER_SHARDING is on, so this command would start a second '
+                'client for the account. Start the backfill through the API of the process running it, '
+                'or pass --in-process when no other process runs the account'
+            )
+
+        result = AccountService.start_backfill(account, chat_ids)
+        if not result['started'] and not result['running']:
+            raise CommandError(f'Account {account.id} could not be started, is it logged in?')
+        if not result['started']:
+            self.stdout.write(self.style.WARNING('⚠️  A backfill of this account is already running, following it'))
+
+        # Checkpoints are the progress record, so this works the same when the supervisor does the import
+        baseline = previous = self._imported(account, chat_ids)
+        started = time.monotonic()
+        try:
+            running = True
+            while running:
+                time.sleep(options['interval'])
+                running = AccountService.is_backfill_running(account)
+                progress = AccountService.get_backfill_progress(account, chat_ids)
+                imported = sum(chat['imported'] for chat in progress)
+                completed = sum(chat['completed'] for chat in progress)
+                self.stdout.write(
+                    f'📥 {imported - baseline} messages imported, {completed}/{len(progress)} chats complete, '
+                    f'{(imported - previous) / options["interval"]:.0f} msg/s'
+                )
+                previous = imported
+        except KeyboardInterrupt:
+            self.stdout.write('\n🛑 Stopped, the next run resumes from the checkpoints')
+            return
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Imported {previous - baseline} messages in {elapsed:.0f}s '
+            f'({(previous - baseline) / elapsed:.0f} msg/s)'
+        ))
+
+    @staticmethod
+    def _imported(account, chat_ids) -> int:
+        return sum(chat['imported'] for chat in AccountService.get_backfill_progress(account, chat_ids))
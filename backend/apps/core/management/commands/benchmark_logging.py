@@ -0,0 +1,94 @@
+import logging
+import os
+import time
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from apps.core.log import JsonFormatter, NonBlockingQueueHandler, RateLimitFilter, log_event
+
+
+class SlowStream:
+    """Sink whose writes block for a fixed time, like a congested stdout pipe"""
+
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, data):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-message logging cost on the ingest hot path for each logging mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=20000, help='Messages logged per mode')
+        parser.add_argument('--sample-rate', type=float, default=0.01, help='Kept fraction in sampled mode')
+        parser.add_argument('--sink-latency-us', type=int, default=0, help='Simulated blocking time per write')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        with open(os.devnull, 'w') as devnull:
+            sink = SlowStream(devnull, options['sink_latency_us'] / 1e6)
+            modes = [
+                ('legacy console, 6 INFO lines', self._logger('legacy', logging.INFO, logging.StreamHandler(sink)),
+                 self._legacy, 1.0),
+                ('per-message DEBUG record, level INFO', self._logger('info', logging.INFO, logging.StreamHandler(sink)),
+                 self._event, 1.0),
+                ('structured, DEBUG, sync JSON', self._json_sync(sink), self._event, 1.0),
+                ('structured, DEBUG, queued JSON', self._structured(sink), self._event, 1.0),
+                ('structured, DEBUG, queued and sampled', self._structured(sink), self._event, options['sample_rate']),
+            ]
+            for mode, logger, log, rate in modes:
+                with override_settings(LOG_SAMPLE_RATE=rate):
+                    started = time.perf_counter()
+                    for index in range(count):
+                        log(logger, index)
+                    elapsed = time.perf_counter() - started
+
+                dropped = sum(getattr(handler, 'dropped', 0) for handler in logger.handlers)
+                self.stdout.write(f"{mode}: {elapsed / count * 1e6:.2f}us per message, {dropped} dropped")
+                for handler in logger.handlers:
+                    handler.close()
+
+    @staticmethod
+    def _legacy(logger: logging.Logger, index: int):
+        # Shape of the previous per-message logging in the bot handler
+        logger.info(f"🔔 INCOMING MESSAGE!")
+        logger.info(f"   From: {'user'}")
+        logger.info(f"   Chat: {index % 100} ({'private'})")
+        logger.info(f"   Text: {'Benchmark message text'[:100]}")
+        logger.info(f"   Bot ID: {1}")
+        logger.info(f"✅ Successfully saved message from {'user'} in chat {index % 100}")
+
+    @staticmethod
+    def _event(logger: logging.Logger, index: int):
+        log_event(
+            logger, logging.DEBUG, 'bot_message',
+            "📨 Bot %s message %s in chat %s from %s (%s)", 1, index, index % 100, 42, 'stored',
+            bot_id=1, chat_id=index % 100, message_id=index, from_id=42, stored=True,
+        )
+
+    @staticmethod
+    def _logger(name: str, level: int, handler: logging.Handler) -> logging.Logger:
+        logger = logging.getLogger(f'benchmark.logging.{name}')
+        logger.handlers = [handler]
+        logger.setLevel(level)
+        logger.propagate = False
+        return logger
+
+    def _json_sync(self, stream) -> logging.Logger:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        return self._logger('sync', logging.DEBUG, handler)
+
+    def _structured(self, stream) -> logging.Logger:
+        # Unbounded so the comparison is not skewed by dropped records
+        handler = NonBlockingQueueHandler(maxsize=0, stream=stream)
+        handler.setFormatter(JsonFormatter())
+        handler.addFilter(RateLimitFilter(0))
+        return self._logger(f'structured.{id(handler)}', logging.DEBUG, handler)
@@ -7,7 +7,6 @@ from apps.accounts.models import Account
 from apps.bots.services import BotService
 from apps.accounts.services import AccountService
 from apps.bots.aiogram_manager import AiogramManager
-from apps.accounts.telethon_manager import TelethonManager
 from apps.messages.models import Message
 from apps.chats.models import Chat
 
@@ -143,14 +142,16 @@ class Command(BaseCommand):
         """Start inactive bots and accounts"""
         self.stdout.write('\n🚀 Starting inactive entities...')
         
-        # Start bots
-        for bot in bots:
-            if bot.status != 'active':
-                self.stdout.write(f'   Starting bot @{bot.username}...')
-                if BotService.start_bot(bot):
-                    self.stdout.write(self.style.SUCCESS(f'   ✅ Bot @{bot.username} started'))
+        # Start bots concurrently
+        inactive = {bot.id: bot for bot in bots if bot.status != 'active'}
+        if inactive:
+            self.stdout.write(f'   Starting {len(inactive)} bots...')
+            for result in BotService.start_bots(inactive.values()):
+                bot = inactive[result.bot_id]
+                if result.success:
+                    self.stdout.write(self.style.SUCCESS(f'   ✅ Bot @{bot.username} started in {result.seconds:.2f}s'))
                 else:
-                    self.stdout.write(self.style.ERROR(f'   ❌ Failed to start bot @{bot.username}'))
+                    self.stdout.write(self.style.ERROR(f'   ❌ Failed to start bot @{bot.username}: {result.error}'))
         
         # Start accounts
         for account in accounts:
@@ -172,7 +173,7 @@ class Command(BaseCommand):
             self.stdout.write(f'   {status} Bot @{bot.username} in AiogramManager')
         
         # Check account manager
-        active_accounts = TelethonManager.get_active_accounts()
+        active_accounts = AccountService.get_active_accounts()
         for account in accounts:
             status = "✅" if account.id in active_accounts else "❌"
             self.stdout.write(f'   {status} Account {account.phone_number} in TelethonManager')
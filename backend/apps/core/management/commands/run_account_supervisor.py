@@ -0,0 +1,26 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.accounts.supervisor import TelethonSupervisor
+from apps.core.runtime import account_runtime
+
+
+class Command(BaseCommand):
+    help = 'Host every Telethon account client in one long-running process and answer account RPC calls'
+
+    def handle(self, *args, **options):
+        started = account_runtime.run(TelethonSupervisor.start_all())
+        account_runtime.run(TelethonSupervisor.serve())
+
+        self.stdout.write(self.style.SUCCESS(f'🚀 Account supervisor running {started} accounts'))
+        if not settings.TELETHON_SUPERVISOR:
+            self.stdout.write(self.style.WARNING(
+                '⚠️  TELETHON_SUPERVISOR is off, web processes will host their own clients instead of calling this one'
+            ))
+
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            self.stdout.write('\n🛑 Stopping account supervisor...')
+            account_runtime.run(TelethonSupervisor.shutdown())
@@ -0,0 +1,54 @@
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.accounts.supervisor import TelethonSupervisor, worker_channel
+from apps.bots.services import BotService
+from apps.core.leases import LeaseCoordinator
+from apps.core.runtime import account_runtime
+
+
+class Command(BaseCommand):
+    help = 'Host a share of the active bots and accounts, coordinated with the other workers through leases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--worker-id', help='Stable worker ID (default: host name and process ID)')
+        parser.add_argument('--no-bots', action='store_true', help='Do not host bots in this worker')
+        parser.add_argument('--no-accounts', action='store_true', help='Do not host accounts in this worker')
+
+    def handle(self, *args, **options):
+        if not settings.WORKER_SHARDING:
+            self.stdout.write(self.style.WARNING(
+                '⚠️  WORKER_SHARDING is off, other processes will not route account calls to this worker'
+            ))
+
+        coordinator = LeaseCoordinator(options['worker_id'])
+        if not options['no_accounts']:
+            coordinator.register(TelethonSupervisor.leased())
+            account_runtime.run(TelethonSupervisor.serve(worker_channel(coordinator.worker_id)))
+        if not options['no_bots']:
+            coordinator.register(BotService.leased())
+
+        self.stdout.write(self.style.SUCCESS(f'🚀 Worker {coordinator.worker_id} joining'))
+        # Container and process managers stop workers with SIGTERM, which hands over like Ctrl+C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        # Starting clients can take longer than the lease TTL, the leases are renewed meanwhile
+        coordinator.start_renewing()
+        try:
+            while True:
+                try:
+                    coordinator.heartbeat()
+                    coordinator.rebalance()
+                except Exception as e:
+                    # Leases outlive a few missed heartbeats, so a database hiccup does not move anything
+                    self.stderr.write(f'❌ Worker {coordinator.worker_id} heartbeat failed: {e}')
+                time.sleep(settings.WORKER_HEARTBEAT_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # Also on crashes, so the leases are released instead of left to expire
+            self.stdout.write(f'\n🛑 Stopping worker {coordinator.worker_id}...')
+            try:
+                coordinator.leave()
+            finally:
+                account_runtime.run(TelethonSupervisor.shutdown())
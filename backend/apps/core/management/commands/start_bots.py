@@ -1,3 +1,4 @@
+import time
 from django.core.management.base import BaseCommand
 from apps.bots.models import Bot
 from apps.bots.services import BotService
@@ -12,6 +13,11 @@ class Command(BaseCommand):
             type=int,
             help='Start specific bot by ID',
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Maximum number of bots started in parallel',
+        )
 
     def handle(self, *args, **options):
         if options['bot_id']:
@@ -30,18 +36,25 @@ class Command(BaseCommand):
                     self.style.ERROR(f'Bot with ID {options["bot_id"]} not found')
                 )
         else:
-            bots = Bot.objects.filter(status='active')
+            bots = {bot.id: bot for bot in Bot.objects.filter(status='active')}
             started = 0
+            begin = time.perf_counter()
             
-            for bot in bots:
-                if BotService.start_bot(bot):
+            for result in BotService.start_bots(bots.values(), options['concurrency']):
+                bot = bots[result.bot_id]
+                if result.success:
                     started += 1
-                    self.stdout.write(f'Started bot @{bot.username}')
+                    self.stdout.write(f'Started bot @{bot.username} in {result.seconds:.2f}s')
                 else:
                     self.stdout.write(
-                        self.style.ERROR(f'Failed to start bot @{bot.username}')
+                        self.style.ERROR(
+                            f'Failed to start bot @{bot.username} in {result.seconds:.2f}s '
+                            f'after {result.attempts} attempts: {result.error}'
+                        )
                     )
             
             self.stdout.write(
-                self.style.SUCCESS(f'Started {started} out of {bots.count()} bots')
+                self.style.SUCCESS(
+                    f'Started {started} out of {len(bots)} bots in {time.perf_counter() - begin:.2f}s'
+                )
             )
\ No newline at end of file
@@ -0,0 +1,51 @@
+import threading
+from collections import deque
+from typing import Dict, List
+
+
+def _pick(samples: List[float], percent: float) -> float:
+    """Pick a percentile from sorted samples"""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+class LatencyTracker:
+    """Rolling window of latency samples with percentile reporting"""
+
+    def __init__(self, window: int = 10000):
+        self._samples = deque(maxlen=window)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """Record a single latency sample in seconds"""
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+
+    def percentile(self, percent: float) -> float:
+        """Get latency percentile in seconds over the current window"""
+        with self._lock:
+            samples = sorted(self._samples)
+        return _pick(samples, percent)
+
+    def reset(self):
+        """Drop all recorded samples"""
+        with self._lock:
+            self._samples.clear()
+            self._count = 0
+
+    def snapshot(self) -> Dict[str, float]:
+        """Get summary statistics in milliseconds"""
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+
+        return {
+            'count': count,
+            'p50_ms': round(_pick(samples, 50) * 1000, 3),
+            'p99_ms': round(_pick(samples, 99) * 1000, 3),
+            'max_ms': round(samples[-1] * 1000, 3) if samples else 0.0,
+        }
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def deduplicate_users(apps, schema_editor):
+    """Keep the most recently updated row of each duplicated user"""
+    TelegramUser = apps.get_model('telegram_core', 'TelegramUser')
+
+    duplicates = (
+        TelegramUser.objects.values('telegram_user_id', 'type')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+    )
+
+    for group in duplicates:
+        rows = TelegramUser.objects.filter(
+            telegram_user_id=group['telegram_user_id'],
+            type=group['type'],
+        ).order_by('-updated_at', '-id')
+        TelegramUser.objects.filter(pk__in=[row.pk for row in rows[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_users, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='telegramuser',
+            name='users_telegra_6fc161_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='telegramuser',
+            constraint=models.UniqueConstraint(fields=('telegram_user_id', 'type'), name='unique_telegram_user_type'),
+        ),
+    ]
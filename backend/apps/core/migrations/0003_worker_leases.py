@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_core', '0002_telegramuser_unique_telegram_user_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Worker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('worker_id', models.CharField(max_length=100, unique=True)),
+                ('heartbeat_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'workers',
+            },
+        ),
+        migrations.CreateModel(
+            name='Lease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('bot', 'Bot'), ('account', 'Account')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('worker_id', models.CharField(max_length=100)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'leases',
+                'indexes': [models.Index(fields=['worker_id', 'kind'], name='leases_worker__940b55_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_lease_kind_object')],
+            },
+        ),
+    ]
@@ -26,9 +26,45 @@ class TelegramUser(BaseModel):
 
     class Meta:
         db_table = 'users'
+        constraints = [
+            models.UniqueConstraint(fields=['telegram_user_id', 'type'], name='unique_telegram_user_type'),
+        ]
+
+    def __str__(self):
+        return f"{self.username or self.first_name or self.telegram_user_id} ({self.type})"
+
+class Worker(BaseModel):
+    """Process hosting a share of the bots and accounts, alive while it keeps heartbeating"""
+    worker_id = models.CharField(max_length=100, unique=True)
+    heartbeat_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'workers'
+
+    def __str__(self):
+        return self.worker_id
+
+
+class Lease(BaseModel):
+    """Exclusive claim of a worker on a bot or account, taken over by others once it expires"""
+    KINDS = (
+        ('bot', 'Bot'),
+        ('account', 'Account'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.BigIntegerField()  # Bot or Account ID
+    worker_id = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'leases'
         indexes = [
-            models.Index(fields=['telegram_user_id', 'type']),
+            models.Index(fields=['worker_id', 'kind']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_lease_kind_object'),
         ]
 
     def __str__(self):
-        return f"{self.username or self.first_name or self.telegram_user_id} ({self.type})"
\ No newline at end of file
+        return f"{self.kind} {self.object_id} on {self.worker_id}"
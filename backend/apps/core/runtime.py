@@ -0,0 +1,86 @@
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class AsyncRuntime:
+    """Long-lived asyncio event loop running in a dedicated background thread"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Get the runtime loop, starting the thread on first use"""
+        if self._loop is None:
+            self.start()
+        return self._loop
+
+    def start(self):
+        """Start the loop thread if it is not running yet"""
+        with self._lock:
+            if self._loop is not None:
+                return
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            logger.info(f"Started {self.name} event loop")
+
+    def is_current(self) -> bool:
+        """Check whether the caller is running on the runtime loop"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Awaitable) -> Future:
+        """Schedule a coroutine on the runtime from any thread"""
+        # A fresh context keeps request-scoped state, like asgiref's executors, out of long-lived tasks
+        return contextvars.Context().run(asyncio.run_coroutine_threadsafe, coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the runtime and block the calling thread for its result"""
+        if self.is_current():
+            coro.close()
+            raise RuntimeError(f"{self.name}.run() cannot block its own event loop, await the coroutine instead")
+
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def arun(self, coro: Awaitable) -> Any:
+        """Await a coroutine on the runtime from another event loop"""
+        if self.is_current():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def call_soon(self, callback: Callable, *args):
+        """Schedule a plain callback on the runtime loop from any thread"""
+        self.loop.call_soon_threadsafe(callback, *args, context=contextvars.Context())
+
+
+# Owns every aiogram Bot, its HTTP session and the webhook update consumers
+bot_runtime = AsyncRuntime('aiogram-runtime')
+
+# Coalesces and broadcasts notifications over the channel layer
+notification_runtime = AsyncRuntime('notification-runtime')
+
+# Owns every Telethon client, its event handlers and pending logins
+account_runtime = AsyncRuntime('telethon-runtime')
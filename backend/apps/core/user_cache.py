@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+
+@dataclass(frozen=True)
+class UserSpec:
+    """Telegram profile of the message sender"""
+    telegram_user_id: int
+    type: str
+    username: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple[int, str]:
+        return (self.telegram_user_id, self.type)
+
+    @property
+    def fingerprint(self) -> int:
+        return hash((self.username, self.first_name, self.last_name))
+
+
+class TelegramUserCache:
+    """LRU of stored sender profiles so unchanged users cost no queries"""
+
+    _profiles: "OrderedDict[Tuple[int, str], int]" = OrderedDict()
+    _lock = threading.Lock()
+    hits = 0
+    writes = 0
+
+    @classmethod
+    def is_current(cls, spec: UserSpec) -> bool:
+        """Check whether the stored profile is known to match"""
+        with cls._lock:
+            if cls._profiles.get(spec.key) != spec.fingerprint:
+                return False
+            cls._profiles.move_to_end(spec.key)
+            cls.hits += 1
+            return True
+
+    @classmethod
+    def upsert(cls, specs: Iterable[UserSpec]) -> int:
+        """Write new and changed profiles with one native upsert, returns the number of rows written"""
+        from .models import TelegramUser
+
+        pending = {spec.key: spec for spec in specs if not cls.is_current(spec)}
+        if not pending:
+            return 0
+
+        # Profiles this process has not seen yet are compared with the stored rows first
+        unknown = [spec for key, spec in pending.items() if key not in cls._profiles]
+        if unknown:
+            for user in TelegramUser.objects.filter(
+                type__in={spec.type for spec in unknown},
+                telegram_user_id__in={spec.telegram_user_id for spec in unknown},
+            ):
+                key = (user.telegram_user_id, user.type)
+                stored = UserSpec(user.telegram_user_id, user.type, user.username, user.first_name, user.last_name)
+                if key in pending and pending[key] == stored:
+                    cls._remember([pending.pop(key)])
+
+        if not pending:
+            return 0
+
+        now = timezone.now()
+        TelegramUser.objects.bulk_create(
+            [
+                TelegramUser(
+                    telegram_user_id=spec.telegram_user_id,
+                    type=spec.type,
+                    username=spec.username,
+                    first_name=spec.first_name,
+                    last_name=spec.last_name,
+                    updated_at=now,
+                )
+                for spec in pending.values()
+            ],
+            update_conflicts=True,
+            unique_fields=['telegram_user_id', 'type'],
+            update_fields=['username', 'first_name', 'last_name', 'updated_at'],
+        )
+
+        # Only trust the cache once the write is durable
+        written = list(pending.values())
+        transaction.on_commit(lambda: cls._remember(written))
+        cls.writes += len(written)
+        return len(written)
+
+    @classmethod
+    def _remember(cls, specs: Iterable[UserSpec]):
+        max_size = getattr(settings, 'TELEGRAM_USER_CACHE_SIZE', 100000)
+        with cls._lock:
+            for spec in specs:
+                cls._profiles[spec.key] = spec.fingerprint
+                cls._profiles.move_to_end(spec.key)
+            while len(cls._profiles) > max_size:
+                cls._profiles.popitem(last=False)
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """Get cache hit and write counters"""
+        return {'size': len(cls._profiles), 'hits': cls.hits, 'writes': cls.writes}
+
+    @classmethod
+    def clear(cls):
+        """Drop all cached profiles and reset counters"""
+        with cls._lock:
+            cls._profiles.clear()
+            cls.hits = 0
+            cls.writes = 0
@@ -0,0 +1,316 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, DateTimeField, F, Q, Value, When
+from apps.core.user_cache import TelegramUserCache, UserSpec
+from .models import Message
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class ChatSpec:
+    """Identity and defaults of the chat a message belongs to"""
+    type: str
+    owner_id: int
+    chat_id: int
+    title: Optional[str] = None
+    chat_type: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple[str, int, int]:
+        return (self.type, self.owner_id, self.chat_id)
+
+
+@dataclass
+class IngestRequest:
+    """A message together with the chat, sender and notification stored in the same transaction"""
+    message: Message
+    chat: Optional[ChatSpec] = None
+    user: Optional[UserSpec] = None
+    notify: Optional[str] = None
+
+
+@dataclass
+class IngestResult:
+    """Stored rows for an ingest request"""
+    message: Message
+    created: bool
+    chat: object = None
+    notification: object = None
+
+
+class MessageIngestWriter:
+    """Collects parsed messages into micro-batches and persists them in bulk"""
+
+    _queue: "queue.Queue[Tuple[IngestRequest, Future]]" = queue.Queue()
+    _thread: Optional[threading.Thread] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def submit(cls, request: IngestRequest) -> Future:
+        """Queue an ingest request, the future resolves to its IngestResult"""
+        if cls._thread is None:
+            cls.start()
+
+        future = Future()
+        cls._queue.put((request, future))
+        return future
+
+    @classmethod
+    async def aingest(cls, request: IngestRequest) -> IngestResult:
+        """Queue an ingest request and wait until its batch is written"""
+        return await asyncio.wrap_future(cls.submit(request))
+
+    @classmethod
+    async def asubmit(cls, message: Message) -> Tuple[Message, bool]:
+        """Queue an unsaved message with a known chat and wait until its batch is written"""
+        result = await cls.aingest(IngestRequest(message=message))
+        return result.message, result.created
+
+    @classmethod
+    def start(cls):
+        """Start the writer thread if it is not running yet"""
+        with cls._lock:
+            if cls._thread is not None:
+                return
+            cls._thread = threading.Thread(target=cls._run, name='message-ingest-writer', daemon=True)
+            cls._thread.start()
+            logger.info("Started message ingest writer")
+
+    @classmethod
+    def _run(cls):
+        """Drain the queue in size- or time-bounded batches"""
+        batch_size = getattr(settings, 'MESSAGE_INGEST_BATCH_SIZE', 200)
+        max_delay = getattr(settings, 'MESSAGE_INGEST_MAX_DELAY_MS', 50) / 1000
+
+        while True:
+            batch = [cls._queue.get()]
+            deadline = time.monotonic() + max_delay
+
+            while len(batch) < batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(cls._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            cls._flush(batch)
+
+    @classmethod
+    def _flush(cls, batch: List[Tuple[IngestRequest, Future]]):
+        """Write a batch and resolve its futures"""
+        try:
+            results = cls.write_requests([request for request, _ in batch])
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            return
+        except Exception as e:
+            logger.error(f"Batch write of {len(batch)} messages failed, retrying one by one: {e}")
+            connection.close_if_unusable_or_obsolete()
+
+        # Isolate the rows that cannot be written so the rest of the batch still lands
+        for request, future in batch:
+            try:
+                result = cls._write_one(request)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                message = request.message
+                logger.error(f"Failed to save message {message.message_id} in chat {message.chat_id}: {e}")
+                if not future.done():
+                    future.set_exception(e)
+
+    @classmethod
+    def _write_one(cls, request: IngestRequest) -> IngestResult:
+        """Write a single request, once more with a fresh chat when the cached one was deleted meanwhile"""
+        try:
+            return cls.write_requests([request])[0]
+        except IntegrityError:
+            if not cls._refresh_chat(request):
+                raise
+        return cls.write_requests([request])[0]
+
+    @staticmethod
+    def _refresh_chat(request: IngestRequest) -> bool:
+        """Evict a cached chat whose row is gone and resolve it again, True when the message got a new chat"""
+        from apps.chats.cache import ChatCache
+        from apps.chats.models import Chat
+
+        message = request.message
+        chat = message.chat if Message.chat.is_cached(message) else None
+        if chat is None or Chat.objects.filter(pk=chat.pk).exists():
+            return False
+
+        # Other processes delete chats without reaching this process's cache
+        ChatCache.remove(chat)
+        logger.warning(f"Chat {chat.chat_id} was deleted behind the cache, resolving it again")
+        if request.chat is None:
+            owner_id = chat.bot_id if chat.type == 'bot_chat' else chat.account_id
+            message.chat = ChatCache.resolve(chat.type, owner_id, chat.chat_id, chat.title, chat.chat_type)
+        return True
+
+    @staticmethod
+    def write_batch(messages: List[Message]) -> List[Tuple[Message, bool]]:
+        """Insert new messages whose chat is already set"""
+        results = MessageIngestWriter.write_requests([IngestRequest(message=message) for message in messages])
+        return [(result.message, result.created) for result in results]
+
+    @staticmethod
+    def write_requests(requests: List[IngestRequest]) -> List[IngestResult]:
+        """Resolve chats and senders, insert new messages, bump chat timestamps and create notifications"""
+        from apps.chats.models import Chat
+
+        messages = [request.message for request in requests]
+
+        def key(message):
+            return (message.chat_id, message.message_id, message.direction)
+
+        def lookup():
+            return {
+                key(message): message
+                for message in Message.objects.filter(
+                    chat_id__in={message.chat_id for message in messages},
+                    message_id__in={message.message_id for message in messages},
+                )
+            }
+
+        with transaction.atomic():
+            chats = MessageIngestWriter._resolve_chats([request.chat for request in requests if request.chat])
+            for request in requests:
+                if request.chat:
+                    request.message.chat = chats[request.chat.key]
+
+            # Senders are only written when their profile changed since this process last stored it
+            TelegramUserCache.upsert([request.user for request in requests if request.user])
+
+            existing = lookup()
+
+            pending = {}
+            for message in messages:
+                if key(message) not in existing:
+                    pending.setdefault(key(message), message)
+
+            latest: Dict[int, object] = {}
+            if pending:
+                # Conflicting rows from concurrent writers are ignored rather than failing the batch
+                Message.objects.bulk_create(pending.values(), ignore_conflicts=True)
+                stored = lookup()
+
+                for message in pending.values():
+                    chat_pk = message.chat_id
+                    if chat_pk not in latest or message.created_at > latest[chat_pk]:
+                        latest[chat_pk] = message.created_at
+            else:
+                stored = existing
+
+            if latest:
+                # Imported history is older than what a chat already shows, the timestamp only moves forward
+                Chat.objects.filter(pk__in=latest.keys()).update(
+                    last_message_at=Case(
+                        *[
+                            When(
+                                Q(pk=chat_pk) & (Q(last_message_at__isnull=True) | Q(last_message_at__lt=created_at)),
+                                then=Value(created_at),
+                            )
+                            for chat_pk, created_at in latest.items()
+                        ],
+                        default=F('last_message_at'),
+                        output_field=DateTimeField(),
+                    )
+                )
+
+            results = []
+            for request in requests:
+                message = request.message
+                saved = stored.get(key(message), message)
+                # Reuse the chat instance the caller or the resolver already holds
+                chat = message.chat if Message.chat.is_cached(message) else None
+                if chat is not None:
+                    saved.chat = chat
+                results.append(IngestResult(
+                    message=saved,
+                    created=key(message) in stored and pending.get(key(message)) is message,
+                    chat=chat,
+                ))
+
+            MessageIngestWriter._create_notifications(requests, results)
+
+        return results
+
+    @staticmethod
+    def _resolve_chats(specs: List[ChatSpec]) -> Dict[Tuple[str, int, int], object]:
+        """Resolve chats for the given specs from the cache, fetching or creating the rest in bulk"""
+        from apps.chats.cache import ChatCache
+        from apps.chats.models import Chat
+
+        if not specs:
+            return {}
+
+        wanted = {spec.key: spec for spec in specs}
+        chats = {}
+        for spec_key in wanted:
+            chat = ChatCache.get(*spec_key)
+            if chat is not None:
+                chats[spec_key] = chat
+
+        unknown = {spec_key: spec for spec_key, spec in wanted.items() if spec_key not in chats}
+        if not unknown:
+            return chats
+
+        for chat in Chat.objects.filter(
+            type__in={spec.type for spec in unknown.values()},
+            chat_id__in={spec.chat_id for spec in unknown.values()},
+        ):
+            if ChatCache.key_for(chat) in unknown:
+                chats.setdefault(ChatCache.key_for(chat), chat)
+
+        missing = [
+            Chat(
+                type=spec.type,
+                bot_id=spec.owner_id if spec.type == 'bot_chat' else None,
+                account_id=spec.owner_id if spec.type == 'account_chat' else None,
+                chat_id=spec.chat_id,
+                title=spec.title,
+                chat_type=spec.chat_type,
+            )
+            for spec_key, spec in unknown.items()
+            if spec_key not in chats
+        ]
+        if missing:
+            for chat in Chat.objects.bulk_create(missing):
+                chats[ChatCache.key_for(chat)] = chat
+                logger.info(f"Created new chat: {chat.title or chat.chat_id}")
+
+        # Newly created chats only become visible to the cache once the batch commits
+        ChatCache.remember_on_commit([chats[spec_key] for spec_key in unknown])
+        return chats
+
+    @staticmethod
+    def _create_notifications(requests: List[IngestRequest], results: List[IngestResult]):
+        """Create notifications for newly stored messages in one insert and publish them after commit"""
+        from apps.notifications.fanout import NotificationFanout
+        from apps.notifications.models import Notification
+        from apps.notifications.services import NotificationService
+
+        pending = [
+            (result, NotificationService.build_message_notification(request.notify, result.chat, result.message))
+            for request, result in zip(requests, results)
+            if request.notify and result.created
+        ]
+        if pending:
+            notifications = Notification.objects.bulk_create([notification for _, notification in pending])
+            for result, notification in pending:
+                result.notification = notification
+
+            # Broadcasting is the emission stage's job and only happens for committed rows
+            transaction.on_commit(lambda: NotificationFanout.publish(notifications))
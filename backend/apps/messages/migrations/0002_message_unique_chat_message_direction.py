@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def deduplicate_messages(apps, schema_editor):
+    """Remove redelivered duplicates before adding the unique constraint"""
+    Message = apps.get_model('telegram_messages', 'Message')
+
+    duplicates = (
+        Message.objects.values('chat_id', 'message_id', 'direction')
+        .annotate(count=Count('id'), first_id=Min('id'))
+        .filter(count__gt=1)
+    )
+
+    for group in duplicates:
+        extra = Message.objects.filter(
+            chat_id=group['chat_id'],
+            message_id=group['message_id'],
+            direction=group['direction'],
+        ).exclude(id=group['first_id'])
+
+        if group['message_id'] == 0:
+            # Auto-replies used to be stored without a Telegram id, keep them with a synthetic one
+            for message in extra:
+                message.message_id = -message.id
+                message.save(update_fields=['message_id'])
+        else:
+            extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_messages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_messages, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('chat', 'message_id', 'direction'), name='unique_chat_message_direction'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_chats', '0002_chat_last_message_at_chat_chats_last_me_0c3be9_idx'),
+        ('telegram_messages', '0002_message_unique_chat_message_direction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_message_id', models.BigIntegerField(default=0)),
+                ('imported', models.IntegerField(default=0)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('chat', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='backfill_checkpoint', to='telegram_chats.chat')),
+            ],
+            options={
+                'db_table': 'backfill_checkpoints',
+            },
+        ),
+    ]
@@ -30,6 +30,13 @@ class Message(BaseModel):
             models.Index(fields=['from_id']),
             models.Index(fields=['message_id']),
         ]
+        constraints = [
+            # Telegram redelivers updates, a message can only be stored once per direction
+            models.UniqueConstraint(
+                fields=['chat', 'message_id', 'direction'],
+                name='unique_chat_message_direction'
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         """Override save to update chat's last_message_at"""
@@ -43,4 +50,17 @@ class Message(BaseModel):
 
     def __str__(self):
         preview = self.text[:50] if self.text else f"[{self.media_type}]" if self.media_type else "[Message]"
-        return f"{preview} ({self.direction})"
\ No newline at end of file
+        return f"{preview} ({self.direction})"
+
+class BackfillCheckpoint(BaseModel):
+    """How far the history of a chat has been imported"""
+    chat = models.OneToOneField(Chat, on_delete=models.CASCADE, related_name='backfill_checkpoint')
+    last_message_id = models.BigIntegerField(default=0)  # Highest imported Telegram message ID
+    imported = models.IntegerField(default=0)  # Messages stored by the backfill
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'backfill_checkpoints'
+
+    def __str__(self):
+        return f"Backfill of chat {self.chat_id} up to {self.last_message_id}"
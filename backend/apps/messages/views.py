@@ -12,7 +12,9 @@ from .models import Message
 from .serializers import MessageSerializer
 from apps.chats.models import Chat
 from apps.bots.aiogram_manager import AiogramManager
-from apps.accounts.telethon_manager import TelethonManager
+from apps.core.runtime import bot_runtime
+from apps.accounts.services import AccountService
+from apps.accounts.supervisor import AccountRPCTimeout
 
 logger = logging.getLogger(__name__)
 
@@ -116,7 +118,8 @@ def send_message(request):
                             logger.error(f"Bot {entity_id} not found or not active")
                             raise ValueError("Bot not found or not active. Please check bot status in bot management.")
                     
-                    message = asyncio.run(send_with_timeout())
+                    # Bots and their sessions live on the bot runtime loop
+                    message = bot_runtime.run(send_with_timeout())
                     
                     # Update chat's updated_at timestamp to move it to top
                     try:
@@ -141,26 +144,18 @@ def send_message(request):
                     return JsonResponse({'error': f'Failed to send bot message: {str(e)}'}, status=500)
                     
             elif entity_type == 'account':
-                # Send via account using async with timeout
-                import asyncio
+                # Send via the account client owned by the Telethon supervisor
                 try:
-                    # Create async function with timeout and better error handling
-                    async def send_account_with_timeout():
-                        try:
-                            # Ensure account is active and accessible
-                            from apps.accounts.models import Account as AccountModel
-                            account = await asyncio.to_thread(AccountModel.objects.get, id=entity_id, status='active')
-                            logger.info(f"Sending message via account {account.phone} to chat {chat_id}")
-                            
-                            return await asyncio.wait_for(
-                                TelethonManager.send_message(entity_id, chat_id, text),
-                                timeout=30.0  # Increased timeout to 30 seconds for account creation
-                            )
-                        except AccountModel.DoesNotExist:
-                            logger.error(f"Account {entity_id} not found or not active")
-                            raise ValueError(f"Account {entity_id} not found or not active")
+                    from apps.accounts.models import Account as AccountModel
+                    if not AccountModel.objects.filter(id=entity_id, status='active').exists():
+                        raise ValueError(f"Account {entity_id} not found or not active")
                     
-                    message = asyncio.run(send_account_with_timeout())
+                    # Left queued without a message ID when wait is false or the account sits out a long flood wait,
+                    # the supervisor answers before the RPC timeout so a queued send never looks failed
+                    wait = data.get('wait', True)
+                    if isinstance(wait, str):
+                        wait = wait.strip().lower() not in ('false', '0', 'no', 'off', '')
+                    message_id = AccountService.send_message(entity_id, chat_id, text, wait=bool(wait))
                     
                     # Update chat's updated_at timestamp to move it to top
                     try:
@@ -171,9 +166,10 @@ def send_message(request):
                     
                     return JsonResponse({
                         'success': True,
-                        'message_id': message.id if hasattr(message, 'id') else None
-                    })
-                except asyncio.TimeoutError:
+                        'message_id': message_id,
+                        'queued': message_id is None
+                    }, status=202 if message_id is None else 200)
+                except AccountRPCTimeout:
                     logger.error(f"Timeout sending account message to chat {chat_id}")
                     return JsonResponse({'error': 'Message sending timed out'}, status=504)
                 except ValueError as e:
@@ -213,14 +209,13 @@ def edit_message(request, message_id):
             
             if chat.type == 'account_chat':
                 # Edit via Telethon
-                import asyncio
                 try:
-                    asyncio.run(TelethonManager.edit_message(
-                        chat.account.id, 
-                        chat.chat_id, 
-                        message.message_id, 
+                    AccountService.edit_message(
+                        chat.account_id,
+                        chat.chat_id,
+                        message.message_id,
                         new_text
-                    ))
+                    )
                     return JsonResponse({'success': True})
                 except Exception as e:
                     logger.error(f"Error editing message via Telethon: {e}")
@@ -247,13 +242,12 @@ def delete_message(request, message_id):
             
             if chat.type == 'account_chat':
                 # Delete via Telethon
-                import asyncio
                 try:
-                    asyncio.run(TelethonManager.delete_message(
-                        chat.account.id,
+                    AccountService.delete_message(
+                        chat.account_id,
                         chat.chat_id,
                         message.message_id
-                    ))
+                    )
                     return JsonResponse({'success': True})
                 except Exception as e:
                     logger.error(f"Error deleting message via Telethon: {e}")
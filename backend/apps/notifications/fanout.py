@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Set, Tuple
+from django.conf import settings
+from apps.core.runtime import notification_runtime
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationFanout:
+    """Single emission stage for stored notifications, coalescing bursts per chat"""
+
+    # Open coalescing windows, only touched on the notification runtime loop
+    _windows: Dict[Tuple[int, str], List[Notification]] = {}
+    _tasks: Set[asyncio.Task] = set()
+    sent = 0
+    coalesced = 0
+
+    @classmethod
+    def publish(cls, notifications: Iterable[Notification]):
+        """Hand stored notifications to the emission stage from any thread"""
+        for notification in notifications:
+            notification_runtime.call_soon(cls._publish, notification)
+
+    @classmethod
+    def _publish(cls, notification: Notification):
+        """Send the first notification of a chat at once and hold the rest until its window closes"""
+        window = getattr(settings, 'NOTIFICATION_COALESCE_MS', 500) / 1000
+        if window <= 0 or notification.chat_id is None:
+            cls._send(notification, 1)
+            return
+
+        key = (notification.chat_id, notification.type)
+        pending = cls._windows.get(key)
+        if pending is not None:
+            pending.append(notification)
+            cls.coalesced += 1
+            return
+
+        cls._windows[key] = []
+        cls._send(notification, 1)
+        asyncio.get_running_loop().call_later(window, cls._flush, key, window)
+
+    @classmethod
+    def _flush(cls, key: Tuple[int, str], window: float):
+        """Emit one event for everything held in a window, keeping it open while the burst lasts"""
+        pending = cls._windows.get(key)
+        if not pending:
+            cls._windows.pop(key, None)
+            return
+
+        cls._windows[key] = []
+        # Notifications of bulk edits and deletes already stand for several messages
+        cls._send(pending[-1], sum((notification.data or {}).get('count', 1) for notification in pending))
+        asyncio.get_running_loop().call_later(window, cls._flush, key, window)
+
+    @classmethod
+    def _send(cls, notification: Notification, count: int):
+        from .services import NotificationService
+
+        cls.sent += 1
+        task = asyncio.ensure_future(NotificationService._send_websocket_notification(notification, count))
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """Get emitted and coalesced event counters"""
+        return {'sent': cls.sent, 'coalesced': cls.coalesced, 'open_windows': len(cls._windows)}
+
+    @classmethod
+    def reset(cls):
+        """Reset counters, windows still open flush on their own"""
+        cls.sent = 0
+        cls.coalesced = 0
@@ -1,7 +1,7 @@
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from .fanout import NotificationFanout
 from .models import Notification
 from apps.chats.models import Chat
 from apps.messages.models import Message
@@ -16,22 +16,11 @@ class NotificationService:
         """Send message-related notification"""
         try:
             # Create notification
-            notification = await Notification.objects.acreate(
-                type=notification_type,
-                chat=chat,
-                message=message,
-                title=NotificationService._get_notification_title(notification_type, chat, message),
-                content=NotificationService._get_notification_content(notification_type, message),
-                data={
-                    'chat_id': chat.id,
-                    'message_id': message.id,
-                    'entity_type': 'bot' if chat.type == 'bot_chat' else 'account',
-                    'entity_id': chat.bot.id if chat.bot else chat.account.id if chat.account else None
-                }
-            )
+            notification = NotificationService.build_message_notification(notification_type, chat, message)
+            await notification.asave()
             
-            # Send WebSocket notification
-            await NotificationService._send_websocket_notification(notification)
+            # Broadcast through the coalescing emission stage
+            NotificationFanout.publish([notification])
             
         except Exception as e:
             logger.error(f"Error sending message notification: {e}")
@@ -41,26 +30,51 @@ class NotificationService:
         """Synchronous version for send_message_notification"""
         try:
             # Create notification synchronously
-            notification = Notification.objects.create(
-                type=notification_type,
-                chat=chat,
-                message=message,
-                title=NotificationService._get_notification_title(notification_type, chat, message),
-                content=NotificationService._get_notification_content(notification_type, message),
-                data={
-                    'chat_id': chat.id,
-                    'message_id': message.id,
-                    'entity_type': 'bot' if chat.type == 'bot_chat' else 'account',
-                    'entity_id': chat.bot.id if chat.bot else chat.account.id if chat.account else None
-                }
-            )
+            notification = NotificationService.build_message_notification(notification_type, chat, message)
+            notification.save()
             
-            # Send WebSocket notification synchronously
-            NotificationService._send_websocket_notification_sync(notification)
+            # Broadcast through the coalescing emission stage
+            NotificationFanout.publish([notification])
             
         except Exception as e:
             logger.error(f"Error sending message notification: {e}")
     
+    @staticmethod
+    def build_message_notification(notification_type: str, chat: Chat, message: Message) -> Notification:
+        """Build an unsaved message notification"""
+        return Notification(
+            type=notification_type,
+            chat=chat,
+            message=message,
+            title=NotificationService._get_notification_title(notification_type, chat, message),
+            content=NotificationService._get_notification_content(notification_type, message),
+            data={
+                'chat_id': chat.id,
+                'message_id': message.id,
+                'entity_type': 'bot' if chat.type == 'bot_chat' else 'account',
+                'entity_id': chat.bot_id or chat.account_id
+            }
+        )
+    
+    @staticmethod
+    def build_messages_notification(notification_type: str, chat: Chat, messages: List[Message]) -> Notification:
+        """Build one unsaved notification standing for several messages of a chat"""
+        if len(messages) == 1:
+            return NotificationService.build_message_notification(notification_type, chat, messages[0])
+        
+        notification = NotificationService.build_message_notification(notification_type, chat, messages[-1])
+        notification.title = NotificationService._get_coalesced_title(notification_type, chat, len(messages))
+        notification.data.update({
+            'message_ids': [message.id for message in messages],
+            'count': len(messages),
+        })
+        return notification
+    
+    @staticmethod
+    async def send_notification(notification: Notification):
+        """Push an already stored notification over WebSocket"""
+        NotificationFanout.publish([notification])
+    
     @staticmethod
     async def send_entity_notification(notification_type: str, title: str, content: str, data: Dict[str, Any]):
         """Send entity-related notification (bot/account status)"""
@@ -79,10 +93,18 @@ class NotificationService:
             logger.error(f"Error sending entity notification: {e}")
     
     @staticmethod
-    async def _send_websocket_notification(notification: Notification):
-        """Send notification via WebSocket"""
+    async def _send_websocket_notification(notification: Notification, count: int = 1):
+        """Send notification via WebSocket, count > 1 announces a coalesced burst in one chat"""
         try:
             channel_layer = get_channel_layer()
+            payload = {
+                'id': notification.id,
+                'type': notification.type,
+                'title': notification.title,
+                'content': notification.content,
+                'data': notification.data,
+                'created_at': notification.created_at.isoformat()
+            }
             
             # Determine which channel to send to
             if notification.chat:
@@ -95,79 +117,24 @@ class NotificationService:
                 for group in ['bot_notifications', 'account_notifications']:
                     await channel_layer.group_send(group, {
                         'type': 'notification_message',
-                        'notification': {
-                            'id': notification.id,
-                            'type': notification.type,
-                            'title': notification.title,
-                            'content': notification.content,
-                            'data': notification.data,
-                            'created_at': notification.created_at.isoformat()
-                        }
+                        'notification': payload
                     })
                 return
             
+            if count > 1:
+                # The latest notification stands for the whole burst
+                payload['title'] = NotificationService._get_coalesced_title(notification.type, notification.chat, count)
+                payload['data'] = {**notification.data, 'count': count}
+            
             # Send to specific group
             await channel_layer.group_send(group_name, {
                 'type': 'notification_message',
-                'notification': {
-                    'id': notification.id,
-                    'type': notification.type,
-                    'title': notification.title,
-                    'content': notification.content,
-                    'data': notification.data,
-                    'chat_id': notification.chat.id if notification.chat else None,
-                    'created_at': notification.created_at.isoformat()
-                }
+                'notification': {**payload, 'chat_id': notification.chat.id}
             })
             
         except Exception as e:
             logger.error(f"Error sending WebSocket notification: {e}")
     
-    @staticmethod
-    def _send_websocket_notification_sync(notification: Notification):
-        """Send notification via WebSocket synchronously"""
-        try:
-            channel_layer = get_channel_layer()
-            
-            # Determine which channel to send to
-            if notification.chat:
-                if notification.chat.type == 'bot_chat':
-                    group_name = 'bot_notifications'
-                else:
-                    group_name = 'account_notifications'
-            else:
-                # General notification - send to both
-                for group in ['bot_notifications', 'account_notifications']:
-                    async_to_sync(channel_layer.group_send)(group, {
-                        'type': 'notification_message',
-                        'notification': {
-                            'id': notification.id,
-                            'type': notification.type,
-                            'title': notification.title,
-                            'content': notification.content,
-                            'data': notification.data,
-                            'created_at': notification.created_at.isoformat()
-                        }
-                    })
-                return
-            
-            # Send to specific group
-            async_to_sync(channel_layer.group_send)(group_name, {
-                'type': 'notification_message',
-                'notification': {
-                    'id': notification.id,
-                    'type': notification.type,
-                    'title': notification.title,
-                    'content': notification.content,
-                    'data': notification.data,
-                    'chat_id': notification.chat.id if notification.chat else None,
-                    'created_at': notification.created_at.isoformat()
-                }
-            })
-            
-        except Exception as e:
-            logger.error(f"Error sending WebSocket notification synchronously: {e}")
-    
     @staticmethod
     def _get_notification_title(notification_type: str, chat: Chat, message: Message) -> str:
         """Generate notification title"""
@@ -182,6 +149,20 @@ class NotificationService:
         else:
             return f"Update in {chat_name}"
     
+    @staticmethod
+    def _get_coalesced_title(notification_type: str, chat: Chat, count: int) -> str:
+        """Generate title for several notifications of one chat"""
+        chat_name = chat.title or f"Chat {chat.chat_id}"
+        
+        if notification_type == 'new_message':
+            return f"{count} new messages in {chat_name}"
+        elif notification_type == 'message_edited':
+            return f"{count} messages edited in {chat_name}"
+        elif notification_type == 'message_deleted':
+            return f"{count} messages deleted in {chat_name}"
+        else:
+            return f"{count} updates in {chat_name}"
+    
     @staticmethod
     def _get_notification_content(notification_type: str, message: Message) -> str:
         """Generate notification content"""
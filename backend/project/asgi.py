@@ -9,9 +9,13 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
 from apps.notifications.routing import websocket_urlpatterns
+from apps.bots.registry import BotRegistry
 
 django_asgi_app = get_asgi_application()
 
+# Warm the bot registry so webhook ingress never reads bot metadata from the database
+BotRegistry.load()
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
@@ -181,6 +181,46 @@ else:
 
 WEBHOOK_BASE_URL = get_env_variable('WEBHOOK_BASE_URL', DEFAULT_WEBHOOK_URL)
 
+# Register every bot on one webhook URL, routed by the X-Telegram-Bot-Api-Secret-Token header
+WEBHOOK_SHARED_URL = get_env_variable('WEBHOOK_SHARED_URL', False, bool)
+
+# Webhook updates are acknowledged immediately and dispatched by queue workers
+WEBHOOK_QUEUE_MAX_SIZE = get_env_variable('WEBHOOK_QUEUE_MAX_SIZE', 10000, int)
+WEBHOOK_QUEUE_WORKERS = get_env_variable('WEBHOOK_QUEUE_WORKERS', 8, int)
+WEBHOOK_DEDUPE_WINDOW = get_env_variable('WEBHOOK_DEDUPE_WINDOW', 1000, int)
+
+# Bot metadata cached per process is rebuilt from the database at least every BOT_REGISTRY_TTL seconds
+BOT_REGISTRY_TTL = get_env_variable('BOT_REGISTRY_TTL', 60, int)
+
+# Incoming messages are written in micro-batches bounded by size and delay
+MESSAGE_INGEST_BATCH_SIZE = get_env_variable('MESSAGE_INGEST_BATCH_SIZE', 200, int)
+MESSAGE_INGEST_MAX_DELAY_MS = get_env_variable('MESSAGE_INGEST_MAX_DELAY_MS', 50, int)
+
+# Sender profiles known to be stored, unchanged senders cost no queries
+TELEGRAM_USER_CACHE_SIZE = get_env_variable('TELEGRAM_USER_CACHE_SIZE', 100000, int)
+
+# Chats known to be stored, chats seen before resolve without a query
+CHAT_CACHE_SIZE = get_env_variable('CHAT_CACHE_SIZE', 100000, int)
+
+# Notifications of one chat within this window are broadcast as a single event with a count (0 disables it)
+NOTIFICATION_COALESCE_MS = get_env_variable('NOTIFICATION_COALESCE_MS', 500, int)
+
+# Auto-replies are sent at most once per chat within the cooldown window (0 disables it),
+# set AUTO_REPLY_COOLDOWN_CACHE to a cache alias to share cooldowns between processes
+AUTO_REPLY_COOLDOWN_SECONDS = get_env_variable('AUTO_REPLY_COOLDOWN_SECONDS', 60, int)
+AUTO_REPLY_COOLDOWN_MAX_ENTRIES = get_env_variable('AUTO_REPLY_COOLDOWN_MAX_ENTRIES', 100000, int)
+AUTO_REPLY_COOLDOWN_CACHE = get_env_variable('AUTO_REPLY_COOLDOWN_CACHE', '')
+
+# Keep-alive connection pool shared by all aiogram bots
+TELEGRAM_HTTP_POOL_LIMIT = get_env_variable('TELEGRAM_HTTP_POOL_LIMIT', 100, int)
+TELEGRAM_HTTP_POOL_LIMIT_PER_HOST = get_env_variable('TELEGRAM_HTTP_POOL_LIMIT_PER_HOST', 50, int)
+TELEGRAM_HTTP_KEEPALIVE_TIMEOUT = get_env_variable('TELEGRAM_HTTP_KEEPALIVE_TIMEOUT', 60, int)
+TELEGRAM_HTTP_DNS_TTL = get_env_variable('TELEGRAM_HTTP_DNS_TTL', 300, int)
+
+# Bulk bot start runs webhook handshakes in parallel, retrying Telegram rate limits
+BOT_START_CONCURRENCY = get_env_variable('BOT_START_CONCURRENCY', 20, int)
+BOT_START_MAX_RETRIES = get_env_variable('BOT_START_MAX_RETRIES', 3, int)
+
 # Authentication settings
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
@@ -196,7 +236,51 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Telethon clients live on one persistent loop, by default inside each process that uses them. With
+# TELETHON_SUPERVISOR the run_account_supervisor process hosts them and others call it over the channel layer
+TELETHON_SUPERVISOR = get_env_variable('TELETHON_SUPERVISOR', False, bool)
+TELETHON_RPC_TIMEOUT = get_env_variable('TELETHON_RPC_TIMEOUT', 30, int)
+TELETHON_RECONNECT_MIN_DELAY = get_env_variable('TELETHON_RECONNECT_MIN_DELAY', 1, int)
+TELETHON_RECONNECT_MAX_DELAY = get_env_variable('TELETHON_RECONNECT_MAX_DELAY', 300, int)
+
+# Account starts on a worker run at most TELETHON_START_CONCURRENCY connections in parallel
+TELETHON_START_CONCURRENCY = get_env_variable('TELETHON_START_CONCURRENCY', 10, int)
+
+# Clients replay updates missed while offline from the update state stored with their session
+TELETHON_CATCH_UP = get_env_variable('TELETHON_CATCH_UP', True, bool)
+
+# Started and reconnected accounts fetch the messages of stored chats they missed meanwhile
+TELETHON_GAP_RECOVERY = get_env_variable('TELETHON_GAP_RECOVERY', True, bool)
+TELETHON_GAP_RECOVERY_CONCURRENCY = get_env_variable('TELETHON_GAP_RECOVERY_CONCURRENCY', 4, int)
+TELETHON_GAP_RECOVERY_MAX_MESSAGES = get_env_variable('TELETHON_GAP_RECOVERY_MAX_MESSAGES', 1000, int)
+TELETHON_GAP_RECOVERY_MAX_RETRIES = get_env_variable('TELETHON_GAP_RECOVERY_MAX_RETRIES', 3, int)
+
+# History backfill streams dialogs oldest first and commits this many messages together with the checkpoint
+TELETHON_BACKFILL_CHUNK_SIZE = get_env_variable('TELETHON_BACKFILL_CHUNK_SIZE', 500, int)
+TELETHON_BACKFILL_MAX_RETRIES = get_env_variable('TELETHON_BACKFILL_MAX_RETRIES', 3, int)
+
+# Outbound calls of an account are queued at least TELETHON_OUTBOUND_INTERVAL_MS apart and held through flood
+# waits, longer flood waits than TELETHON_OUTBOUND_MAX_FLOOD_WAIT seconds fail the queued calls instead
+TELETHON_OUTBOUND_INTERVAL_MS = get_env_variable('TELETHON_OUTBOUND_INTERVAL_MS', 100, int)
+TELETHON_OUTBOUND_MAX_FLOOD_WAIT = get_env_variable('TELETHON_OUTBOUND_MAX_FLOOD_WAIT', 300, int)
+
+# WORKER_SHARDING spreads bots and accounts over `manage.py run_worker` processes, each holds leases on its
+# share, renews them every WORKER_HEARTBEAT_INTERVAL seconds and loses them WORKER_LEASE_TTL seconds after it stops
+WORKER_SHARDING = get_env_variable('WORKER_SHARDING', False, bool)
+WORKER_HEARTBEAT_INTERVAL = get_env_variable('WORKER_HEARTBEAT_INTERVAL', 10, int)
+WORKER_LEASE_TTL = get_env_variable('WORKER_LEASE_TTL', 30, int)
+# Resources that fail to start are retried after a doubling delay of at most WORKER_START_MAX_BACKOFF seconds
+WORKER_START_MAX_BACKOFF = get_env_variable('WORKER_START_MAX_BACKOFF', 900, int)
+
 # Logging
+# Per-message records are logged at DEBUG and sampled (LOG_SAMPLE_RATE is the kept fraction),
+# structured mode writes them as JSON lines from a background thread and caps records per call site and second
+LOG_LEVEL = get_env_variable('LOG_LEVEL', 'INFO')
+LOG_STRUCTURED = get_env_variable('LOG_STRUCTURED', False, bool)
+LOG_SAMPLE_RATE = get_env_variable('LOG_SAMPLE_RATE', 1.0, float)
+LOG_RATE_LIMIT = get_env_variable('LOG_RATE_LIMIT', 50, int)
+LOG_QUEUE_SIZE = get_env_variable('LOG_QUEUE_SIZE', 10000, int)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -212,11 +296,27 @@ LOGGING = {
         },
         'bots': {
             'handlers': ['console'],
-            'level': 'INFO',
+            'level': LOG_LEVEL,
         },
         'accounts': {
             'handlers': ['console'],
-            'level': 'INFO',
+            'level': LOG_LEVEL,
         },
     },
-}
\ No newline at end of file
+}
+
+if LOG_STRUCTURED:
+    LOGGING['formatters'] = {
+        'json': {'()': 'apps.core.log.JsonFormatter'},
+    }
+    LOGGING['filters'] = {
+        'rate_limit': {'()': 'apps.core.log.RateLimitFilter', 'per_second': LOG_RATE_LIMIT},
+    }
+    LOGGING['handlers']['structured'] = {
+        '()': 'apps.core.log.NonBlockingQueueHandler',
+        'maxsize': LOG_QUEUE_SIZE,
+        'formatter': 'json',
+        'filters': ['rate_limit'],
+    }
+    for _logger in ('bots', 'accounts'):
+        LOGGING['loggers'][_logger]['handlers'] = ['structured']
@@ -1,13 +1,22 @@
 import logging
+from typing import Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
 from telethon import events
 from telethon.tl.types import (
     MessageService, User, Chat, Channel,
     PeerUser, PeerChat, PeerChannel
 )
+from apps.chats.cache import ChatCache
 from apps.chats.models import Chat as ChatModel
 from apps.messages.models import Message
-from apps.core.models import TelegramUser
+from apps.messages.ingest import IngestRequest, IngestResult, MessageIngestWriter
+from apps.core.log import log_event
+from apps.core.user_cache import TelegramUserCache, UserSpec
 from apps.accounts.models import Account
+from apps.notifications.fanout import NotificationFanout
+from apps.notifications.models import Notification
 from apps.notifications.services import NotificationService
 
 logger = logging.getLogger('accounts')
@@ -15,27 +24,21 @@ logger = logging.getLogger('accounts')
 class EventHandler:
     """Handler for Telethon events"""
     
-    def __init__(self, account_id: int):
+    def __init__(self, account_id: int, account: Optional[Account] = None):
         self.account_id = account_id
+        # Captured when the client starts and replaced when the row is saved, events never query it
+        self.account = account
     
     async def handle_new_message(self, event):
         """Handle new incoming message event"""
+        message = event.message
         try:
-            logger.info(f"🔔 INCOMING ACCOUNT MESSAGE!")
-            message = event.message
             if isinstance(message, MessageService):
                 # Skip service messages for now
-                logger.debug(f"Skipping service message from account {self.account_id}")
                 return
             
-            logger.info(f"   Account ID: {self.account_id}")
-            logger.info(f"   Message ID: {message.id}")
-            logger.info(f"   Chat: {message.peer_id}")
-            logger.info(f"   Text: {(message.text or '')[:100] if message.text else '[No text]'}")
-            
-            account = await self._get_account()
+            account = self._get_account()
             if not account:
-                logger.error(f"Account {self.account_id} not found in database")
                 return
             
             # Get chat information
@@ -45,127 +48,137 @@ class EventHandler:
             sender = await self._get_or_create_user(message.from_id, event.sender)
             
             # Save message
-            saved_message = await self._save_message(chat, message, 'incoming')
-            
-            logger.info(f"✅ Successfully saved account message from {sender.username or sender.first_name if sender else 'Unknown'} in chat {chat.title or chat.chat_id}")
+            result = await self._save_message(chat, message, 'incoming')
+            self._log_message('incoming', chat, message, result.created, sender)
             
-        except Exception as e:
-            logger.error(f"❌ Error handling new message for account {self.account_id}: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("❌ Error handling new message %s for account %s", message.id, self.account_id)
     
     async def handle_outgoing_message(self, event):
         """Handle new outgoing message event"""
+        message = event.message
         try:
-            logger.info(f"📤 OUTGOING ACCOUNT MESSAGE!")
-            message = event.message
             if isinstance(message, MessageService):
                 # Skip service messages for now
-                logger.debug(f"Skipping service message from account {self.account_id}")
                 return
             
-            logger.info(f"   Account ID: {self.account_id}")
-            logger.info(f"   Message ID: {message.id}")
-            logger.info(f"   Chat: {message.peer_id}")
-            logger.info(f"   Text: {(message.text or '')[:100] if message.text else '[No text]'}")
-            
-            account = await self._get_account()
+            account = self._get_account()
             if not account:
-                logger.error(f"Account {self.account_id} not found in database")
                 return
             
             # Get chat information
             chat = await self._get_or_create_chat(account, event.chat, message.peer_id)
             
             # Save outgoing message
-            saved_message = await self._save_message(chat, message, 'outgoing')
+            result = await self._save_message(chat, message, 'outgoing')
+            self._log_message('outgoing', chat, message, result.created)
             
-            logger.info(f"✅ Successfully saved outgoing account message in chat {chat.title or chat.chat_id}")
-            
-        except Exception as e:
-            logger.error(f"❌ Error handling outgoing message for account {self.account_id}: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("❌ Error handling outgoing message %s for account %s", message.id, self.account_id)
     
     async def handle_message_edited(self, event):
         """Handle message edit event"""
+        message = event.message
         try:
-            message = event.message
-            account = await self._get_account()
-            if not account:
+            chat = await self._find_chat(message.peer_id)
+            existing_message = chat and await Message.objects.filter(chat=chat, message_id=message.id).afirst()
+            if not existing_message:
+                logger.warning(f"Could not find existing message to edit for account {self.account_id}")
                 return
             
-            # Find existing message and update it
-            chat = await ChatModel.objects.aget(account=account, chat_id=message.peer_id.to_dict()['chat_id'])
-            existing_message = await Message.objects.aget(chat=chat, message_id=message.id)
-            
             existing_message.text = message.text
             existing_message.payload.update({
                 'edited': True,
                 'edit_date': message.edit_date.isoformat() if message.edit_date else None
             })
-            await existing_message.asave()
+            await existing_message.asave(update_fields=['text', 'payload', 'updated_at'])
             
             # Send notification
             await NotificationService.send_message_notification(
                 'message_edited', chat, existing_message
             )
             
-        except (ChatModel.DoesNotExist, Message.DoesNotExist):
-            logger.warning(f"Could not find existing message to edit for account {self.account_id}")
-        except Exception as e:
-            logger.error(f"Error handling message edit: {e}")
+        except Exception:
+            logger.exception("❌ Error handling edit of message %s for account %s", message.id, self.account_id)
     
     async def handle_message_deleted(self, event):
         """Handle message deletion event"""
         try:
-            account = await self._get_account()
-            if not account:
-                return
-            
-            # Mark messages as deleted
-            for message_id in event.deleted_ids:
-                try:
-                    message = await Message.objects.aget(
-                        chat__account=account,
-                        message_id=message_id
-                    )
-                    message.payload.update({'deleted': True})
-                    await message.asave()
-                    
-                    await NotificationService.send_message_notification(
-                        'message_deleted', message.chat, message
-                    )
-                    
-                except Message.DoesNotExist:
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"Error handling message deletion: {e}")
+            # Channels number their messages separately, other deletions are unique per account
+            channel_id = getattr(event.original_update, 'channel_id', None)
+            notifications = await sync_to_async(self.mark_deleted)(self.account_id, event.deleted_ids, channel_id)
+            logger.info(
+                f"🗑️ Account {self.account_id} marked {len(event.deleted_ids)} messages deleted "
+                f"in {len(notifications)} chats"
+            )
+        except Exception:
+            logger.exception(
+                "❌ Error handling deletion of %s messages for account %s", len(event.deleted_ids), self.account_id
+            )
     
-    async def _get_account(self) -> Account:
-        """Get account instance"""
-        try:
-            return await Account.objects.aget(id=self.account_id)
-        except Account.DoesNotExist:
-            logger.error(f"Account {self.account_id} not found")
-            return None
+    @staticmethod
+    def mark_deleted(account_id: int, message_ids, channel_id: Optional[int] = None) -> list:
+        """Flag deleted messages with one update and create one notification per affected chat"""
+        messages = Message.objects.filter(
+            chat__type='account_chat', chat__account_id=account_id, message_id__in=set(message_ids)
+        ).select_related('chat').order_by('message_id')
+        if channel_id is None:
+            messages = messages.exclude(chat__chat_type='channel')
+        else:
+            messages = messages.filter(chat__chat_id=channel_id, chat__chat_type='channel')
+        
+        now = timezone.now()
+        by_chat = {}
+        for message in messages:
+            if not message.payload.get('deleted'):
+                message.payload['deleted'] = True
+                message.updated_at = now
+                by_chat.setdefault(message.chat_id, []).append(message)
+        if not by_chat:
+            return []
+        
+        with transaction.atomic():
+            Message.objects.bulk_update(
+                [message for chat_messages in by_chat.values() for message in chat_messages],
+                ['payload', 'updated_at'],
+            )
+            notifications = Notification.objects.bulk_create([
+                NotificationService.build_messages_notification('message_deleted', chat_messages[0].chat, chat_messages)
+                for chat_messages in by_chat.values()
+            ])
+            transaction.on_commit(lambda: NotificationFanout.publish(notifications))
+        return notifications
     
-    async def _get_or_create_chat(self, account: Account, chat_entity, peer_id) -> ChatModel:
-        """Get or create chat"""
-        # Extract chat ID from peer
+    def _get_account(self) -> Optional[Account]:
+        """Get the account row held by this handler"""
+        if self.account is None:
+            logger.error(f"Account {self.account_id} not found in database")
+        return self.account
+    
+    @staticmethod
+    def peer_chat_id(peer_id) -> Tuple[int, str]:
+        """Extract the stored chat ID and chat type from a peer"""
         if hasattr(peer_id, 'user_id'):
-            chat_id = peer_id.user_id
-            chat_type = 'private'
+            return peer_id.user_id, 'private'
         elif hasattr(peer_id, 'chat_id'):
-            chat_id = peer_id.chat_id
-            chat_type = 'group'
+            return peer_id.chat_id, 'group'
         elif hasattr(peer_id, 'channel_id'):
-            chat_id = peer_id.channel_id
-            chat_type = 'channel'
-        else:
-            chat_id = peer_id.to_dict().get('chat_id', 0)
-            chat_type = 'unknown'
+            return peer_id.channel_id, 'channel'
+        return peer_id.to_dict().get('chat_id', 0), 'unknown'
+    
+    async def _find_chat(self, peer_id) -> Optional[ChatModel]:
+        """Get a stored chat of this account without creating it"""
+        chat_id, _ = self.peer_chat_id(peer_id)
+        chat = ChatCache.get('account_chat', self.account_id, chat_id)
+        if chat is None:
+            chat = await ChatModel.objects.filter(type='account_chat', account_id=self.account_id, chat_id=chat_id).afirst()
+            if chat is not None:
+                ChatCache.remember([chat])
+        return chat
+    
+    async def _get_or_create_chat(self, account: Account, chat_entity, peer_id) -> ChatModel:
+        """Get or create chat"""
+        chat_id, chat_type = self.peer_chat_id(peer_id)
         
         # Get chat title
         title = None
@@ -176,56 +189,53 @@ class EventHandler:
         elif hasattr(chat_entity, 'username'):
             title = chat_entity.username
         
-        chat, created = await ChatModel.objects.aget_or_create(
-            account=account,
-            chat_id=chat_id,
-            defaults={
-                'type': 'account_chat',
-                'title': title or str(chat_id),
-                'chat_type': chat_type,
-            }
-        )
-        
-        if created:
-            logger.info(f"Created new chat: {chat.title} ({chat_id})")
-        
-        return chat
+        # Chats seen before resolve from memory without a query
+        return await ChatCache.aresolve('account_chat', account.id, chat_id, title or str(chat_id), chat_type)
     
-    async def _get_or_create_user(self, from_id, sender) -> TelegramUser:
-        """Get or create user"""
+    @staticmethod
+    def sender_spec(from_id, sender) -> Optional[UserSpec]:
+        """Describe the sender profile of a message"""
         if not from_id or not sender:
             return None
         
-        user_id = from_id.user_id if hasattr(from_id, 'user_id') else from_id
+        # Channel and chat peers post anonymously, they have no user profile
+        user_id = getattr(from_id, 'user_id', from_id)
+        if not isinstance(user_id, int):
+            return None
         
-        user, created = await TelegramUser.objects.aget_or_create(
+        return UserSpec(
             telegram_user_id=user_id,
             type='account_user',
-            defaults={
-                'username': getattr(sender, 'username', None),
-                'first_name': getattr(sender, 'first_name', None),
-                'last_name': getattr(sender, 'last_name', None),
-            }
+            username=getattr(sender, 'username', None),
+            first_name=getattr(sender, 'first_name', None),
+            last_name=getattr(sender, 'last_name', None),
         )
-        
-        if not created:
-            # Update user info if changed
-            username = getattr(sender, 'username', None)
-            first_name = getattr(sender, 'first_name', None)
-            last_name = getattr(sender, 'last_name', None)
-            
-            if (user.username != username or 
-                user.first_name != first_name or 
-                user.last_name != last_name):
-                user.username = username
-                user.first_name = first_name
-                user.last_name = last_name
-                await user.asave()
+    
+    async def _get_or_create_user(self, from_id, sender) -> Optional[UserSpec]:
+        """Store the sender profile, skipping the database when it is unchanged"""
+        user = self.sender_spec(from_id, sender)
+        if user and not TelegramUserCache.is_current(user):
+            await sync_to_async(TelegramUserCache.upsert)([user])
         
         return user
     
-    async def _save_message(self, chat: ChatModel, tg_message, direction: str):
-        """Save message to database"""
+    def _log_message(self, direction: str, chat: ChatModel, tg_message, created: bool, sender: Optional[UserSpec] = None):
+        """One sampled, lazily formatted record per message"""
+        log_event(
+            logger, logging.DEBUG, 'account_message',
+            "📨 Account %s %s message %s in chat %s (%s)",
+            self.account_id, direction, tg_message.id, chat.chat_id, 'stored' if created else 'duplicate',
+            account_id=self.account_id,
+            direction=direction,
+            chat_id=chat.chat_id,
+            message_id=tg_message.id,
+            from_id=sender.telegram_user_id if sender else None,
+            stored=created,
+        )
+    
+    @staticmethod
+    def build_message(chat: ChatModel, tg_message, direction: str) -> Message:
+        """Build an unsaved message from a Telethon message"""
         # Determine media type
         media_type = None
         if tg_message.photo:
@@ -241,15 +251,14 @@ class EventHandler:
         elif tg_message.sticker:
             media_type = 'sticker'
         
-        # Create message
-        message = await Message.objects.acreate(
+        return Message(
             chat=chat,
             message_id=tg_message.id,
-            from_id=tg_message.from_id.user_id if tg_message.from_id else None,
+            from_id=tg_message.sender_id or 0,
             text=tg_message.text,
             direction=direction,
             reply_to_message_id=tg_message.reply_to.reply_to_msg_id if tg_message.reply_to else None,
-            forwarded_from=tg_message.fwd_from.from_id.user_id if tg_message.fwd_from and tg_message.fwd_from.from_id else None,
+            forwarded_from=getattr(tg_message.fwd_from.from_id, 'user_id', None) if tg_message.fwd_from and tg_message.fwd_from.from_id else None,
             media_type=media_type,
             payload={
                 'date': tg_message.date.isoformat(),
@@ -257,6 +266,11 @@ class EventHandler:
                 'edit_date': tg_message.edit_date.isoformat() if tg_message.edit_date else None,
             }
         )
-        
-        # Send notification
-        await NotificationService.send_message_notification('new_message', chat, message)
\ No newline at end of file
+    
+    async def _save_message(self, chat: ChatModel, tg_message, direction: str) -> IngestResult:
+        """Save message to database"""
+        # Create message and its notification through the batched ingest writer, which also broadcasts it
+        return await MessageIngestWriter.aingest(IngestRequest(
+            message=self.build_message(chat, tg_message, direction),
+            notify='new_message',
+        ))
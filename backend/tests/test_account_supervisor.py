@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from apps.accounts.services import AccountService
+from apps.accounts.supervisor import AccountRPC, AccountRPCError, TelethonSupervisor
+from apps.accounts.telethon_manager import TelethonManager
+from apps.core.runtime import account_runtime
+
+
+class FakeClient:
+    """Telethon client stand-in whose connection drops once and fails the first reconnect"""
+
+    def __init__(self):
+        self.disconnected = asyncio.get_running_loop().create_future()
+        self.connected = True
+        self.connect_calls = 0
+
+    def is_connected(self):
+        return self.connected
+
+    async def connect(self):
+        self.connect_calls += 1
+        if self.connect_calls == 1:
+            raise OSError("network down")
+        self.connected = True
+        self.disconnected = asyncio.get_running_loop().create_future()
+
+
+class AccountSupervisorTestCase(SimpleTestCase):
+    """Test the Telethon supervisor and its RPC surface"""
+
+    def test_calls_run_on_the_persistent_account_runtime(self):
+        """Test that in-process calls run on the long-lived account loop"""
+        loops = []
+
+        async def send_message(account_id, chat_id, text):
+            loops.append(asyncio.get_running_loop())
+            return SimpleNamespace(id=7)
+
+        with mock.patch.object(TelethonManager, 'send_message', side_effect=send_message):
+            self.assertEqual(AccountService.send_message(1, 2, "hi"), 7)
+            AccountService.send_message(1, 2, "again")
+
+        self.assertEqual(loops, [account_runtime.loop, account_runtime.loop])
+
+    @override_settings(
+        TELETHON_SUPERVISOR=True,
+        CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    )
+    async def test_rpc_over_channel_layer(self):
+        """Test that another process reaches the supervisor through the channel layer"""
+        await TelethonSupervisor.serve()
+        try:
+            with mock.patch.object(TelethonManager, 'get_active_accounts', return_value=[3, 4]):
+                self.assertEqual(await AccountRPC.acall('active_accounts'), [3, 4])
+            with self.assertRaises(AccountRPCError):
+                await AccountRPC.acall('drop_database')
+        finally:
+            await TelethonSupervisor.shutdown()
+
+    @override_settings(TELETHON_RECONNECT_MIN_DELAY=0)
+    async def test_dropped_client_is_reconnected_with_backoff(self):
+        """Test that the watcher keeps reconnecting until the client is back"""
+        client = FakeClient()
+        with mock.patch.dict(TelethonManager._clients, {1: client}):
+            watcher = asyncio.create_task(TelethonSupervisor._watch(1))
+            client.connected = False
+            client.disconnected.set_result(None)
+            for _ in range(20):
+                await asyncio.sleep(0)
+
+            watcher.cancel()
+
+        self.assertTrue(client.connected)
+        self.assertEqual(client.connect_calls, 2)
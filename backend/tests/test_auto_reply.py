@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+from aiogram import types
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from aiogram_handlers.message_handler import MessageHandler
+from apps.bots.cooldown import AutoReplyCooldown
+from apps.bots.http_session import BotSessionPool
+from apps.messages.ingest import MessageIngestWriter
+
+
+class AutoReplyTestCase(SimpleTestCase):
+    """Test auto-reply sending and cooldown"""
+
+    def setUp(self):
+        AutoReplyCooldown.clear()
+        cache.clear()
+        self.managed = mock.MagicMock()
+        self.managed.send_message = mock.AsyncMock(return_value=SimpleNamespace(message_id=42))
+        self.entry = SimpleNamespace(id=1, bot_id=99, auto_reply_enabled=True, auto_reply_message='Busy')
+
+    def tearDown(self):
+        AutoReplyCooldown.clear()
+
+    def _reply(self, count=1, chat_id=10):
+        messages = [
+            types.Message.model_validate({
+                'message_id': index,
+                'date': 0,
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': 'hello',
+            }, context={'bot': self.managed})
+            for index in range(count)
+        ]
+
+        async def reply_all():
+            for message in messages:
+                await MessageHandler(1)._handle_auto_reply(self.entry, message, chat=None)
+
+        with mock.patch.object(MessageIngestWriter, 'asubmit', new=mock.AsyncMock()) as asubmit:
+            asyncio.run(reply_all())
+        return asubmit
+
+    def test_auto_reply_uses_bound_bot(self):
+        """Test that the bot bound to the update sends the reply and no new bot is created"""
+        with mock.patch.object(BotSessionPool, 'create_bot') as create_bot:
+            asubmit = self._reply()
+
+        create_bot.assert_not_called()
+        self.managed.send_message.assert_awaited_once_with(chat_id=10, text='Busy', parse_mode='HTML')
+        self.assertEqual(asubmit.await_args.args[0].message_id, 42)
+
+    def test_cooldown_skips_repeated_replies(self):
+        """Test that a burst from one chat gets one reply and one outgoing row"""
+        asubmit = self._reply(count=10)
+
+        self.assertEqual(self.managed.send_message.await_count, 1)
+        self.assertEqual(asubmit.await_count, 1)
+        self.assertEqual(AutoReplyCooldown.get_stats()['hits'], 9)
+        self.assertEqual(AutoReplyCooldown.get_stats()['misses'], 1)
+
+    @override_settings(AUTO_REPLY_COOLDOWN_CACHE='default')
+    def test_shared_cache_cooldown(self):
+        """Test that a cooldown in the shared cache blocks replies from another process"""
+        self._reply()
+        AutoReplyCooldown.clear()  # Simulates a second process with an empty local cache
+        self._reply()
+
+        self.assertEqual(self.managed.send_message.await_count, 1)
+
+    def test_failed_send_releases_cooldown(self):
+        """Test that a reply that could not be sent does not start the cooldown"""
+        self.managed.send_message.side_effect = [RuntimeError('network'), SimpleNamespace(message_id=43)]
+        self._reply(count=2)
+
+        self.assertEqual(self.managed.send_message.await_count, 2)
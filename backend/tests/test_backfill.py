@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from telethon.errors import FloodWaitError
+from telethon.tl.types import PeerUser
+from apps.accounts.backfill import HistoryBackfill
+from apps.accounts.models import Account
+from apps.accounts.services import AccountService
+from apps.chats.cache import ChatCache
+from apps.chats.models import Chat
+from apps.messages.models import BackfillCheckpoint, Message
+from tests.test_gap_recovery import tg_message
+
+
+class FakeClient:
+    """Telethon client stand-in streaming a history of numbered messages"""
+
+    def __init__(self, dialogs, flood_wait_after=None):
+        self.dialogs = dialogs
+        self.flood_wait_after = flood_wait_after
+        self.history_calls = []
+
+    async def iter_dialogs(self):
+        for peer, top_message_id in self.dialogs:
+            yield SimpleNamespace(dialog=SimpleNamespace(peer=peer), name=f"Chat {peer.user_id}", input_entity=peer)
+
+    async def iter_messages(self, entity, min_id, reverse):
+        self.history_calls.append(min_id)
+        top_message_id = next(top for peer, top in self.dialogs if peer == entity)
+        for message_id in range(min_id + 1, top_message_id + 1):
+            if message_id == self.flood_wait_after:
+                self.flood_wait_after = None
+                raise FloodWaitError(request=None, capture=0)
+            message = tg_message(message_id)
+            message.date = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=message_id)
+            yield message
+
+
+@override_settings(TELETHON_BACKFILL_CHUNK_SIZE=2)
+class HistoryBackfillTestCase(TestCase):
+    """Test streaming import of existing chat history"""
+
+    def setUp(self):
+        ChatCache.clear()
+        self.account = Account.objects.create(tg_user_id=1, phone_number="+100", api_id_enc="x", api_hash_enc="x")
+
+    async def test_history_is_imported_in_chunks_with_checkpoint(self):
+        """Test that every message is stored dated like the original and the checkpoint reaches the newest"""
+        client = FakeClient([(PeerUser(user_id=10), 5), (PeerUser(user_id=20), 3)])
+
+        self.assertEqual(await HistoryBackfill.run(self.account.id, client, chat_ids=[10]), 5)
+
+        chat = await Chat.objects.aget(account=self.account, chat_id=10)
+        checkpoint = await BackfillCheckpoint.objects.aget(chat=chat)
+        self.assertEqual((checkpoint.last_message_id, checkpoint.imported), (5, 5))
+        self.assertIsNotNone(checkpoint.completed_at)
+        self.assertEqual(chat.last_message_at, datetime(2024, 1, 1, 0, 5, tzinfo=timezone.utc))
+        self.assertFalse(await Chat.objects.filter(chat_id=20).aexists())
+
+    async def test_import_resumes_from_checkpoint(self):
+        """Test that a stopped import continues after the last committed message"""
+        chat = await Chat.objects.acreate(type="account_chat", account=self.account, chat_id=10, chat_type="private")
+        await BackfillCheckpoint.objects.acreate(chat=chat, last_message_id=3, imported=3)
+        client = FakeClient([(PeerUser(user_id=10), 5)])
+
+        self.assertEqual(await HistoryBackfill.run(self.account.id, client), 2)
+
+        self.assertEqual(client.history_calls, [3])
+        self.assertEqual(await Message.objects.filter(chat=chat).acount(), 2)
+        self.assertEqual((await BackfillCheckpoint.objects.aget(chat=chat)).imported, 5)
+
+    async def test_flood_wait_keeps_fetched_messages(self):
+        """Test that a flood wait stores what was fetched and the retry continues after it"""
+        client = FakeClient([(PeerUser(user_id=10), 6)], flood_wait_after=4)
+
+        self.assertEqual(await HistoryBackfill.run(self.account.id, client), 6)
+
+        self.assertEqual(client.history_calls, [0, 3])
+        self.assertEqual(await Message.objects.acount(), 6)
+
+
+class BackfillEntryPointsTestCase(TestCase):
+    """Test the API and command that start a history import"""
+
+    def setUp(self):
+        self.account = Account.objects.create(tg_user_id=1, phone_number="+100", api_id_enc="x", api_hash_enc="x")
+        self.client.force_login(User.objects.create_user("admin", password="x"))
+
+    def test_malformed_chat_ids_are_rejected(self):
+        """Test that chat IDs must be a list of integers"""
+        url = f'/api/accounts/accounts/{self.account.id}/backfill/'
+        with mock.patch.object(AccountService, 'start_backfill', return_value={'started': True, 'running': True}) as start:
+            for chat_ids in ("123", [1, "x"], [True]):
+                response = self.client.post(url, {'chat_ids': chat_ids}, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+            response = self.client.post(url, {'chat_ids': [5, "-100"]}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 202)
+        start.assert_called_once_with(self.account, [5, -100])
+
+    def test_command_refuses_a_second_client(self):
+        """Test that the command does not start a client another process may run"""
+        with mock.patch.object(AccountService, 'start_backfill') as start:
+            with self.assertRaises(CommandError):
+                call_command('backfill_history', self.account.id)
+        start.assert_not_called()
@@ -0,0 +1,100 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SetWebhook
+from django.test import TestCase, override_settings
+from apps.bots.aiogram_manager import AiogramManager, BotStartResult
+from apps.bots.models import Bot
+from apps.bots.registry import BotRegistry
+from apps.bots.services import BotService
+from apps.core.encryption import encryption_service
+
+
+class BulkBotStartTestCase(TestCase):
+    """Test concurrent bulk bot start"""
+
+    def tearDown(self):
+        BotRegistry.clear()
+
+    @override_settings(BOT_START_MAX_RETRIES=2)
+    def test_concurrency_is_bounded_and_rate_limits_are_retried(self):
+        """Test that at most `concurrency` bots start at once and 429s are retried"""
+        in_flight = 0
+        peak = 0
+        limited = set()
+
+        async def fake_start(bot_id, token):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if bot_id % 2 and bot_id not in limited:
+                limited.add(bot_id)
+                raise TelegramRetryAfter(SetWebhook(url='https://example.com'), 'Too Many Requests', 0)
+            return True
+
+        with mock.patch.object(AiogramManager, 'astart_bot', side_effect=fake_start):
+            results = asyncio.run(AiogramManager.astart_bots([(i, 'token') for i in range(10)], concurrency=3))
+
+        self.assertLessEqual(peak, 3)
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual([result.attempts for result in results], [1, 2] * 5)
+
+    def test_statuses_are_recorded_in_bulk(self):
+        """Test that results are written back to the database and the registry"""
+        good = Bot.objects.create(bot_id=1, username='good_bot', token_enc=encryption_service.encrypt('1:a'))
+        bad = Bot.objects.create(bot_id=2, username='bad_bot', token_enc=encryption_service.encrypt('2:b'))
+        results = [
+            BotStartResult(good.id, True, 0.1, 1),
+            BotStartResult(bad.id, False, 0.1, 1, 'webhook setup failed'),
+        ]
+
+        with mock.patch.object(AiogramManager, 'start_bots', return_value=results):
+            with self.assertNumQueries(2):
+                BotService.start_bots([good, bad])
+
+        self.assertEqual(Bot.objects.get(id=good.id).status, 'active')
+        self.assertEqual(Bot.objects.get(id=bad.id).status, 'error')
+        self.assertIsNotNone(BotRegistry.get(good.id))
+        self.assertIsNone(BotRegistry.get(bad.id))
+
+
+class WebhookReconcileTestCase(TestCase):
+    """Test that webhook setup only re-registers bots whose webhook changed"""
+
+    def setUp(self):
+        self.bot = Bot.objects.create(bot_id=1, username='test_bot', token_enc=encryption_service.encrypt('1:a'))
+        secret = AiogramManager._generate_webhook_secret(self.bot.id)
+        self.url = AiogramManager._get_webhook_url(self.bot.id, secret)
+
+    def _telegram(self, url):
+        telegram = mock.MagicMock()
+        telegram.get_webhook_info = mock.AsyncMock(
+            return_value=SimpleNamespace(url=url, allowed_updates=AiogramManager.WEBHOOK_ALLOWED_UPDATES)
+        )
+        telegram.set_webhook = mock.AsyncMock(return_value=True)
+        return telegram
+
+    async def test_webhook_is_registered_once(self):
+        """Test that a second start with unchanged state makes only getWebhookInfo"""
+        telegram = self._telegram('')
+        self.assertTrue(await AiogramManager._setup_webhook(self.bot.id, telegram))
+        telegram.set_webhook.assert_awaited_once()
+
+        bot = await Bot.objects.aget(id=self.bot.id)
+        self.assertEqual(bot.webhook_url, self.url)
+
+        telegram = self._telegram(self.url)
+        self.assertTrue(await AiogramManager._setup_webhook(self.bot.id, telegram))
+        telegram.get_webhook_info.assert_awaited_once()
+        telegram.set_webhook.assert_not_awaited()
+
+    async def test_changed_secret_is_re_registered(self):
+        """Test that a matching URL with an unknown secret is registered again"""
+        await Bot.objects.filter(id=self.bot.id).aupdate(webhook_url=self.url, webhook_secret_hash='stale')
+        telegram = self._telegram(self.url)
+
+        self.assertTrue(await AiogramManager._setup_webhook(self.bot.id, telegram))
+        telegram.set_webhook.assert_awaited_once()
@@ -0,0 +1,129 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from telethon.tl.types import PeerChannel, PeerUser
+from apps.accounts.models import Account
+from apps.accounts.supervisor import AccountRPC, TelethonSupervisor
+from apps.accounts.telethon_manager import TelethonManager
+from apps.chats.cache import ChatCache
+from apps.chats.models import Chat
+from apps.messages.ingest import IngestResult, MessageIngestWriter
+from apps.messages.models import Message
+from apps.notifications.fanout import NotificationFanout
+from apps.notifications.models import Notification
+from telethon_clients.event_handler import EventHandler
+from tests.test_gap_recovery import tg_message
+
+
+class EventHandlerTestCase(TestCase):
+    """Test set-based handling of Telethon edit and delete events"""
+
+    def setUp(self):
+        ChatCache.clear()
+        self.account = Account.objects.create(tg_user_id=1, phone_number="+100", api_id_enc="x", api_hash_enc="x")
+        self.private = Chat.objects.create(type="account_chat", account=self.account, chat_id=10, chat_type="private")
+        self.group = Chat.objects.create(type="account_chat", account=self.account, chat_id=20, chat_type="group")
+        self.channel = Chat.objects.create(type="account_chat", account=self.account, chat_id=30, chat_type="channel")
+        for chat, message_ids in ((self.private, range(1, 4)), (self.group, range(4, 10)), (self.channel, range(1, 3))):
+            Message.objects.bulk_create([
+                Message(chat=chat, message_id=message_id, from_id=100, direction="incoming")
+                for message_id in message_ids
+            ])
+
+        patcher = mock.patch.object(NotificationFanout, 'publish')
+        self.publish = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_purge_costs_constant_queries(self):
+        """Test that deleted messages are flagged in bulk with one notification per chat"""
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(5):
+                notifications = EventHandler.mark_deleted(self.account.id, range(1, 10))
+
+        self.assertEqual(Message.objects.filter(payload__deleted=True).count(), 9)
+        self.assertEqual(sorted((n.chat_id, n.data.get('count', 1)) for n in notifications),
+                         [(self.private.id, 3), (self.group.id, 6)])
+        self.assertEqual(Notification.objects.count(), 2)
+        self.publish.assert_called_once_with(notifications)
+
+    def test_channel_deletion_only_touches_the_channel(self):
+        """Test that channel message IDs are not confused with the account-wide ones"""
+        EventHandler.mark_deleted(self.account.id, [1], channel_id=30)
+
+        self.assertEqual(
+            list(Message.objects.filter(payload__deleted=True).values_list('chat_id', 'message_id')),
+            [(self.channel.id, 1)],
+        )
+
+    async def test_channel_edit_resolves_chat_from_cache(self):
+        """Test that an edited channel message is found through the cached chat"""
+        ChatCache.remember([self.channel])
+        event = SimpleNamespace(message=SimpleNamespace(
+            id=2, peer_id=PeerChannel(channel_id=30), text="Edited", edit_date=datetime.now(timezone.utc),
+        ))
+
+        with mock.patch('telethon_clients.event_handler.NotificationService.send_message_notification') as notify:
+            await EventHandler(self.account.id).handle_message_edited(event)
+
+        message = await Message.objects.aget(chat=self.channel, message_id=2)
+        self.assertEqual(message.text, "Edited")
+        self.assertTrue(message.payload['edited'])
+        notify.assert_called_once()
+
+    def test_new_message_does_not_load_the_account(self):
+        """Test that a known chat and the held account row make an incoming message query-free"""
+        ChatCache.remember([self.private])
+        message = tg_message(50)
+        message.from_id = None
+        message.peer_id = PeerUser(user_id=10)
+        handler = EventHandler(self.account.id, self.account)
+
+        with mock.patch.object(MessageIngestWriter, 'aingest', new=mock.AsyncMock(
+            return_value=IngestResult(message=None, created=True),
+        )) as aingest:
+            with self.assertNumQueries(0):
+                async_to_sync(handler.handle_new_message)(SimpleNamespace(message=message, chat=None, sender=None))
+
+        self.assertEqual(aingest.call_args.args[0].message.chat.pk, self.private.pk)
+
+    def test_saved_account_reaches_running_handler(self):
+        """Test that status changes and deletion replace the row a running client holds"""
+        handler = EventHandler(self.account.id, Account.objects.get(id=self.account.id))
+        with mock.patch.dict(TelethonManager._handlers, {self.account.id: handler}):
+            self.account.status = 'error'
+            self.account.save()
+            self.assertEqual(handler.account.status, 'error')
+
+            self.account.delete()
+            self.assertIsNone(handler.account)
+
+    @override_settings(TELETHON_SUPERVISOR=True)
+    def test_remote_save_notifies_the_hosting_process(self):
+        """Test that changes made where the client does not run are sent to the supervisor after commit"""
+        with mock.patch.object(AccountRPC, 'anotify', new=mock.AsyncMock()) as anotify:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.account.status = 'error'
+                self.account.save()
+            anotify.assert_awaited_once_with('refresh_account', account_id=self.account.id)
+
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.account.save(update_fields=['last_seen'])
+            self.assertFalse(callbacks)
+
+    async def test_supervisor_refresh_replaces_row_and_stops_deleted_account(self):
+        """Test that a notified supervisor reloads the row, and stops the client once the row is gone"""
+        handler = EventHandler(self.account.id, self.account)
+        await Account.objects.filter(id=self.account.id).aupdate(status='error')
+
+        with mock.patch.dict(TelethonManager._clients, {self.account.id: object()}), \
+                mock.patch.dict(TelethonManager._handlers, {self.account.id: handler}), \
+                mock.patch.object(TelethonSupervisor, 'stop_account', new=mock.AsyncMock(return_value=True)) as stop:
+            self.assertTrue(await TelethonSupervisor.refresh_account(self.account.id))
+            self.assertEqual(handler.account.status, 'error')
+            stop.assert_not_awaited()
+
+            await Account.objects.filter(id=self.account.id).adelete()
+            await TelethonSupervisor.refresh_account(self.account.id)
+            stop.assert_awaited_once_with(self.account.id)
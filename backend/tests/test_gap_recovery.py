@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
+from django.test import TestCase
+from telethon.errors import FloodWaitError
+from telethon.tl.types import PeerChannel, PeerUser
+from apps.accounts.gap_recovery import GapRecovery
+from apps.accounts.models import Account
+from apps.chats.models import Chat
+from apps.messages.ingest import IngestResult, MessageIngestWriter
+from apps.messages.models import Message
+
+
+def tg_message(message_id, sender_id=100):
+    return SimpleNamespace(
+        id=message_id, sender_id=sender_id, text=f"Message {message_id}", out=False,
+        from_id=PeerUser(user_id=sender_id), sender=SimpleNamespace(username="user", first_name="User", last_name=None),
+        photo=None, video=None, document=None, voice=None, audio=None, sticker=None,
+        reply_to=None, fwd_from=None, date=datetime.now(timezone.utc), edit_date=None,
+    )
+
+
+class FakeClient:
+    """Telethon client stand-in listing dialogs and serving history"""
+
+    def __init__(self, dialogs, flood_waits=0):
+        self.dialogs = dialogs
+        self.flood_waits = flood_waits
+        self.history_calls = []
+
+    async def iter_dialogs(self):
+        for peer, top_message_id in self.dialogs:
+            yield SimpleNamespace(dialog=SimpleNamespace(peer=peer), message=SimpleNamespace(id=top_message_id), input_entity=peer)
+
+    async def get_messages(self, entity, min_id, limit, reverse):
+        self.history_calls.append((entity, min_id))
+        if self.flood_waits:
+            self.flood_waits -= 1
+            raise FloodWaitError(request=None, capture=0)
+        top_message_id = next(top for peer, top in self.dialogs if peer == entity)
+        return [tg_message(message_id) for message_id in range(min_id + 1, top_message_id + 1)]
+
+
+class GapRecoveryTestCase(TestCase):
+    """Test catch-up of messages missed while an account was offline"""
+
+    def setUp(self):
+        self.account = Account.objects.create(tg_user_id=1, phone_number="+100", api_id_enc="x", api_hash_enc="x")
+        self.current = Chat.objects.create(type="account_chat", account=self.account, chat_id=10, chat_type="private")
+        self.behind = Chat.objects.create(type="account_chat", account=self.account, chat_id=20, chat_type="channel")
+        for chat, message_id in ((self.current, 5), (self.behind, 7)):
+            Message.objects.create(chat=chat, message_id=message_id, from_id=100, direction="incoming")
+
+        self.stored = []
+
+        async def aingest(request):
+            self.stored.append(request)
+            return IngestResult(message=request.message, created=True)
+
+        patcher = mock.patch.object(MessageIngestWriter, 'aingest', side_effect=aingest)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stored_positions_cost_two_queries(self):
+        """Test that the highest stored message of every chat is read in bulk"""
+        with self.assertNumQueries(2):
+            positions = GapRecovery._stored_positions(self.account.id)
+
+        self.assertEqual({chat_id: last_id for chat_id, (_, last_id) in positions.items()}, {10: 5, 20: 7})
+
+    async def test_only_chats_behind_are_fetched(self):
+        """Test that dialogs at their stored position cost no history request"""
+        client = FakeClient([(PeerUser(user_id=10), 5), (PeerChannel(channel_id=20), 10), (PeerUser(user_id=30), 99)])
+
+        self.assertEqual(await GapRecovery.recover(self.account.id, client), 3)
+
+        self.assertEqual(client.history_calls, [(PeerChannel(channel_id=20), 7)])
+        self.assertEqual([request.message.message_id for request in self.stored], [8, 9, 10])
+        self.assertTrue(all(request.message.chat.pk == self.behind.pk for request in self.stored))
+
+    async def test_flood_wait_is_retried(self):
+        """Test that a flood wait delays the chat instead of failing it"""
+        client = FakeClient([(PeerChannel(channel_id=20), 8)], flood_waits=1)
+
+        self.assertEqual(await GapRecovery.recover(self.account.id, client), 1)
+        self.assertEqual(len(client.history_calls), 2)
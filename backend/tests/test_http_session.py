@@ -0,0 +1,42 @@
+import asyncio
+from aiohttp import web
+from django.test import SimpleTestCase
+from apps.bots.http_session import SharedAiohttpSession
+
+
+class SharedAiohttpSessionTestCase(SimpleTestCase):
+    """Test the shared keep-alive session used by all bots"""
+
+    def test_connections_are_reused_across_bots(self):
+        """Test that sequential requests reuse one pooled connection and bot close keeps it open"""
+        async def scenario():
+            async def handler(request):
+                return web.json_response({'ok': True})
+
+            app = web.Application()
+            app.router.add_get('/', handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            port = runner.addresses[0][1]
+
+            session = SharedAiohttpSession(limit=10, limit_per_host=5, keepalive_timeout=30, dns_ttl=60)
+            try:
+                for _ in range(3):
+                    client = await session.create_session()
+                    async with client.get(f"http://127.0.0.1:{port}/") as response:
+                        await response.read()
+                    await session.close()
+                closed = session._session.closed
+            finally:
+                await session.shutdown()
+                await runner.cleanup()
+            return session, closed
+
+        session, closed = asyncio.run(scenario())
+
+        self.assertFalse(closed)
+        self.assertEqual(session.requests, 3)
+        self.assertEqual(session.connections_created, 1)
+        self.assertEqual(session.connections_reused, 2)
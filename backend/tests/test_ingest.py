@@ -0,0 +1,274 @@
+from unittest import mock
+from concurrent.futures import Future
+from django.test import TestCase, TransactionTestCase
+from apps.bots.dedupe import UpdateDeduplicator
+from apps.bots.models import Bot
+from apps.chats.cache import ChatCache
+from apps.chats.models import Chat
+from apps.messages.models import Message
+from apps.messages.ingest import ChatSpec, IngestRequest, MessageIngestWriter, UserSpec
+from apps.core.encryption import encryption_service
+from apps.core.models import TelegramUser
+from apps.core.user_cache import TelegramUserCache
+from apps.notifications.fanout import NotificationFanout
+from apps.notifications.models import Notification
+
+
+class MessageIngestTestCase(TestCase):
+    """Test batched message ingest"""
+
+    def setUp(self):
+        self.bot = Bot.objects.create(
+            bot_id=123456789,
+            username="test_bot",
+            token_enc=encryption_service.encrypt("token"),
+            status="active"
+        )
+        self.chats = [
+            Chat.objects.create(type="bot_chat", bot=self.bot, chat_id=chat_id, title=f"Chat {chat_id}")
+            for chat_id in (1, 2)
+        ]
+
+    def test_write_batch_is_bulk(self):
+        """Test that a batch costs one insert and one chat update"""
+        messages = [
+            Message(chat=self.chats[i % 2], message_id=i, from_id=111, text=f"Message {i}", direction="incoming")
+            for i in range(20)
+        ]
+
+        # savepoint, existing lookup, insert, id lookup, chat update, release
+        with self.assertNumQueries(6):
+            saved = MessageIngestWriter.write_batch(messages)
+
+        self.assertEqual(len(saved), 20)
+        self.assertTrue(all(message.pk and created for message, created in saved))
+        self.assertEqual(Message.objects.count(), 20)
+
+    def test_write_batch_ignores_redelivered_messages(self):
+        """Test that messages already stored are returned instead of duplicated"""
+        first = Message(chat=self.chats[0], message_id=7, from_id=111, text="Hello", direction="incoming")
+        (stored, created), = MessageIngestWriter.write_batch([first])
+        self.assertTrue(created)
+
+        retry = Message(chat=self.chats[0], message_id=7, from_id=111, text="Hello", direction="incoming")
+        reply = Message(chat=self.chats[0], message_id=7, from_id=222, text="Hi", direction="outgoing")
+        saved = MessageIngestWriter.write_batch([retry, retry, reply])
+
+        self.assertEqual(saved[0], (stored, False))
+        self.assertFalse(saved[1][1])
+        self.assertTrue(saved[2][1])
+        self.assertEqual(Message.objects.filter(chat=self.chats[0], message_id=7).count(), 2)
+
+    def test_write_batch_updates_last_message_at(self):
+        """Test that each chat gets the time of its latest message"""
+        messages = [
+            Message(chat=self.chats[0], message_id=i, from_id=111, text="Hello", direction="incoming")
+            for i in range(3)
+        ]
+
+        MessageIngestWriter.write_batch(messages)
+
+        self.chats[0].refresh_from_db()
+        self.chats[1].refresh_from_db()
+        self.assertEqual(self.chats[0].last_message_at, messages[-1].created_at)
+        self.assertIsNone(self.chats[1].last_message_at)
+
+
+class FusedIngestTestCase(TestCase):
+    """Test chat, sender, message and notification ingest in one transaction"""
+
+    def setUp(self):
+        TelegramUserCache.clear()
+        ChatCache.clear()
+        self.bot = Bot.objects.create(
+            bot_id=123456789,
+            username="test_bot",
+            token_enc=encryption_service.encrypt("token"),
+            status="active"
+        )
+
+    def _requests(self, count, chats=2):
+        return [
+            IngestRequest(
+                message=Message(message_id=i, from_id=100 + i % chats, text=f"Message {i}", direction="incoming"),
+                chat=ChatSpec(type="bot_chat", owner_id=self.bot.id, chat_id=i % chats, title=f"Chat {i % chats}"),
+                user=UserSpec(telegram_user_id=100 + i % chats, type="bot_user", first_name="User"),
+                notify="new_message",
+            )
+            for i in range(count)
+        ]
+
+    def test_new_chats_and_users_are_created_in_the_same_unit(self):
+        """Test that a batch creating chats and senders costs a fixed number of queries"""
+        # savepoint, chat lookup, chat insert, user lookup, user insert,
+        # existing lookup, message insert, id lookup, chat update, notification insert, release
+        with self.assertNumQueries(11):
+            results = MessageIngestWriter.write_requests(self._requests(10))
+
+        self.assertTrue(all(result.created and result.notification.pk for result in results))
+        self.assertEqual(Chat.objects.filter(bot=self.bot).count(), 2)
+        self.assertEqual(TelegramUser.objects.count(), 2)
+        self.assertEqual(Notification.objects.count(), 10)
+        self.assertEqual(results[3].chat.chat_id, 1)
+
+    def test_known_chats_cost_under_one_query_per_message(self):
+        """Test that ingesting into known chats from known senders needs no per-message queries"""
+        with self.captureOnCommitCallbacks(execute=True):
+            MessageIngestWriter.write_requests(self._requests(2))
+        requests = self._requests(20)
+        for request in requests:
+            request.message.message_id += 1000
+
+        # savepoint, existing lookup, message insert, id lookup,
+        # chat update, notification insert, release
+        with self.assertNumQueries(7):
+            results = MessageIngestWriter.write_requests(requests)
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(Chat.objects.filter(bot=self.bot).count(), 2)
+
+    def test_notifications_are_published_once_after_commit(self):
+        """Test that stored notifications reach the emission stage in one hand-off"""
+        with mock.patch.object(NotificationFanout, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                MessageIngestWriter.write_requests(self._requests(10))
+
+        publish.assert_called_once()
+        self.assertEqual(len(publish.call_args.args[0]), 10)
+
+    def test_redelivered_message_gets_no_notification(self):
+        """Test that duplicates are not stored or notified again"""
+        MessageIngestWriter.write_requests(self._requests(1))
+        result, = MessageIngestWriter.write_requests(self._requests(1))
+
+        self.assertFalse(result.created)
+        self.assertIsNone(result.notification)
+        self.assertEqual(Notification.objects.count(), 1)
+
+
+class ChatCacheTestCase(TestCase):
+    """Test chat resolution from memory"""
+
+    def setUp(self):
+        ChatCache.clear()
+        self.bot = Bot.objects.create(
+            bot_id=123456789,
+            username="test_bot",
+            token_enc=encryption_service.encrypt("token"),
+            status="active"
+        )
+
+    def test_seen_chat_resolves_without_queries(self):
+        """Test that a chat resolved once is served from memory"""
+        with self.captureOnCommitCallbacks(execute=True):
+            chat = ChatCache.resolve("bot_chat", self.bot.id, 42, "Chat 42", "private")
+
+        with self.assertNumQueries(0):
+            cached = ChatCache.resolve("bot_chat", self.bot.id, 42)
+
+        self.assertEqual((cached.pk, cached.title, cached.bot_id), (chat.pk, "Chat 42", self.bot.id))
+
+    def test_deleted_chat_is_evicted(self):
+        """Test that deleting a chat drops it from the cache"""
+        with self.captureOnCommitCallbacks(execute=True):
+            chat = ChatCache.resolve("bot_chat", self.bot.id, 42, "Chat 42", "private")
+        chat.delete()
+
+        self.assertIsNone(ChatCache.get("bot_chat", self.bot.id, 42))
+        self.assertNotEqual(ChatCache.resolve("bot_chat", self.bot.id, 42).pk, chat.pk)
+
+    def test_cache_is_bounded(self):
+        """Test that the least recently used chats are dropped"""
+        chats = [Chat.objects.create(type="bot_chat", bot=self.bot, chat_id=chat_id) for chat_id in range(3)]
+        with self.settings(CHAT_CACHE_SIZE=2):
+            ChatCache.remember(chats)
+
+        self.assertIsNone(ChatCache.get("bot_chat", self.bot.id, 0))
+        self.assertIsNotNone(ChatCache.get("bot_chat", self.bot.id, 2))
+
+
+class StaleChatCacheTestCase(TransactionTestCase):
+    """Test ingest into a chat another process deleted"""
+
+    def setUp(self):
+        ChatCache.clear()
+        self.bot = Bot.objects.create(
+            bot_id=123456789,
+            username="test_bot",
+            token_enc=encryption_service.encrypt("token"),
+            status="active"
+        )
+
+    def test_deleted_chat_behind_the_cache_is_recreated(self):
+        """Test that a message for a cached but deleted chat recreates the chat instead of failing"""
+        chat = Chat.objects.create(type="bot_chat", bot=self.bot, chat_id=42, title="Chat 42")
+        deleted_pk = chat.pk
+        chat.delete()
+        # The cache of another process still knows the row
+        ChatCache.remember([Chat(id=deleted_pk, type="bot_chat", bot=self.bot, chat_id=42, title="Chat 42")])
+
+        future = Future()
+        message = Message(chat=ChatCache.get("bot_chat", self.bot.id, 42), message_id=1, from_id=111, direction="incoming")
+        MessageIngestWriter._flush([(IngestRequest(message=message), future)])
+
+        stored = future.result(timeout=1).message
+        self.assertNotEqual(stored.chat_id, deleted_pk)
+        self.assertEqual(ChatCache.get("bot_chat", self.bot.id, 42).pk, stored.chat_id)
+        self.assertEqual(Chat.objects.get(pk=stored.chat_id).title, "Chat 42")
+
+
+class TelegramUserCacheTestCase(TestCase):
+    """Test the write-avoiding sender upsert"""
+
+    def setUp(self):
+        TelegramUserCache.clear()
+        self.user = UserSpec(telegram_user_id=1, type="bot_user", username="alice", first_name="Alice")
+
+    def test_unchanged_profile_costs_no_queries(self):
+        """Test that a stored, unchanged sender is not looked up or written again"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(TelegramUserCache.upsert([self.user]), 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(TelegramUserCache.upsert([self.user]), 0)
+
+    def test_changed_profile_is_upserted_in_place(self):
+        """Test that a renamed sender updates the single existing row"""
+        with self.captureOnCommitCallbacks(execute=True):
+            TelegramUserCache.upsert([self.user])
+
+        renamed = UserSpec(telegram_user_id=1, type="bot_user", username="alice2", first_name="Alice")
+        with self.assertNumQueries(1):
+            self.assertEqual(TelegramUserCache.upsert([renamed]), 1)
+
+        self.assertEqual(TelegramUser.objects.get().username, "alice2")
+
+    def test_unknown_but_stored_profile_is_not_rewritten(self):
+        """Test that a cold cache compares with the stored row instead of writing"""
+        TelegramUser.objects.create(telegram_user_id=1, type="bot_user", username="alice", first_name="Alice")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(TelegramUserCache.upsert([self.user]), 0)
+
+
+class UpdateDeduplicatorTestCase(TestCase):
+    """Test the per-bot update_id dedupe window"""
+
+    def tearDown(self):
+        UpdateDeduplicator.forget(1)
+
+    def test_redelivered_update_is_seen(self):
+        """Test that an update id is only processed once per bot"""
+        self.assertFalse(UpdateDeduplicator.seen(1, 500))
+        self.assertTrue(UpdateDeduplicator.seen(1, 500))
+        self.assertFalse(UpdateDeduplicator.seen(2, 500))
+        UpdateDeduplicator.forget(2)
+
+    def test_window_is_bounded(self):
+        """Test that the oldest update ids fall out of the window"""
+        with self.settings(WEBHOOK_DEDUPE_WINDOW=3):
+            for update_id in range(4):
+                UpdateDeduplicator.seen(1, update_id)
+
+            self.assertFalse(UpdateDeduplicator.seen(1, 0))
+            self.assertTrue(UpdateDeduplicator.seen(1, 3))
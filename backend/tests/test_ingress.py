@@ -0,0 +1,52 @@
+import asyncio
+from unittest import mock
+from aiohttp.test_utils import TestClient, TestServer
+from django.test import TestCase
+from apps.bots.aiogram_manager import AiogramManager
+from apps.bots.ingress import WebhookIngress
+from apps.bots.models import Bot
+from apps.bots.registry import BotRegistry
+from apps.bots.update_queue import UpdateQueue
+from apps.core.encryption import encryption_service
+
+
+class WebhookIngressServerTestCase(TestCase):
+    """Test the standalone aiohttp webhook ingress"""
+
+    def setUp(self):
+        BotRegistry.clear()
+        self.bot = Bot.objects.create(
+            bot_id=123456789,
+            username="test_bot",
+            token_enc=encryption_service.encrypt("123456789:token"),
+            status="active"
+        )
+        self.secret = AiogramManager._generate_webhook_secret(self.bot.id)
+
+    def tearDown(self):
+        BotRegistry.clear()
+
+    def _post(self, path, headers=None):
+        async def request():
+            async with TestClient(TestServer(WebhookIngress.create_app())) as client:
+                response = await client.post(path, data=b'{"update_id": 1}', headers=headers or {})
+                return response.status
+
+        return asyncio.run(request())
+
+    def test_routes_match_django_webhooks(self):
+        """Test that per-bot and shared routes enqueue for the right bot"""
+        with mock.patch.object(UpdateQueue, 'enqueue', return_value=True) as enqueue:
+            self.assertEqual(self._post(f'/webhook/bot/{self.bot.id}/{self.secret}/'), 200)
+            self.assertEqual(
+                self._post('/webhook/bot/', {'X-Telegram-Bot-Api-Secret-Token': self.secret}), 200
+            )
+
+        self.assertEqual([call.args[0] for call in enqueue.call_args_list], [self.bot.id, self.bot.id])
+        self.assertEqual(enqueue.call_args.args[1], b'{"update_id": 1}')
+
+    def test_invalid_secret_and_full_queue(self):
+        """Test that bad secrets get 403 and a full queue gets 503"""
+        with mock.patch.object(UpdateQueue, 'enqueue', return_value=False):
+            self.assertEqual(self._post(f'/webhook/bot/{self.bot.id}/wrong/'), 403)
+            self.assertEqual(self._post(f'/webhook/bot/{self.bot.id}/{self.secret}/'), 503)
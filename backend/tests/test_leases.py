@@ -0,0 +1,147 @@
+import time
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from apps.accounts.supervisor import AccountRPC, AccountRPCError, TelethonSupervisor, worker_channel
+from apps.accounts.telethon_manager import TelethonManager
+from apps.core.leases import LeaseCoordinator, LeasedKind, lease_owner, rendezvous_owner
+from apps.core.models import Lease
+
+
+class FakeKind:
+    """Resource kind recording what a worker started and stopped"""
+
+    def __init__(self, object_ids):
+        self.object_ids = object_ids
+        self.running = set()
+
+    def leased(self) -> LeasedKind:
+        def start(object_ids):
+            self.running |= set(object_ids)
+            return object_ids
+
+        return LeasedKind(
+            kind='account',
+            load_ids=lambda: self.object_ids,
+            start=start,
+            stop=lambda object_ids: self.running.difference_update(object_ids),
+        )
+
+
+class LeaseCoordinatorTestCase(TestCase):
+    """Test sharding of resources over workers through leases"""
+
+    def worker(self, worker_id, object_ids):
+        kind = FakeKind(object_ids)
+        coordinator = LeaseCoordinator(worker_id)
+        coordinator.register(kind.leased())
+        coordinator.heartbeat()
+        return coordinator, kind
+
+    def test_joining_worker_only_takes_its_share(self):
+        """Test that adding a worker moves resources to it and nowhere else"""
+        before = {object_id: rendezvous_owner('account', object_id, ['a', 'b']) for object_id in range(300)}
+        after = {object_id: rendezvous_owner('account', object_id, ['a', 'b', 'c']) for object_id in range(300)}
+
+        moved = [object_id for object_id in before if before[object_id] != after[object_id]]
+        self.assertTrue(all(after[object_id] == 'c' for object_id in moved))
+        self.assertTrue(60 < len(moved) < 140)
+
+    def test_workers_host_disjoint_shares_and_take_over_on_leave(self):
+        """Test that every resource runs on exactly one worker, also after one leaves"""
+        object_ids = list(range(40))
+        a, kind_a = self.worker('a', object_ids)
+        b, kind_b = self.worker('b', object_ids)
+        for _ in range(2):
+            for coordinator in (a, b):
+                coordinator.heartbeat()
+                coordinator.rebalance()
+
+        self.assertFalse(kind_a.running & kind_b.running)
+        self.assertEqual(kind_a.running | kind_b.running, set(object_ids))
+        self.assertEqual(Lease.objects.count(), 40)
+        self.assertEqual(lease_owner('account', min(kind_b.running)), 'b')
+
+        b.leave()
+        a.heartbeat()
+        a.rebalance()
+        self.assertEqual(kind_a.running, set(object_ids))
+        self.assertFalse(kind_b.running)
+
+    def test_expired_lease_is_taken_over_and_lost_lease_stops(self):
+        """Test that a dead worker's lease moves on and its former holder stops the resource"""
+        Lease.objects.create(kind='account', object_id=1, worker_id='dead', expires_at=timezone.now() - timedelta(seconds=1))
+        a, kind_a = self.worker('a', [1])
+
+        a.rebalance()
+        self.assertEqual(kind_a.running, {1})
+
+        # Another worker took the lease while this one was stalled
+        Lease.objects.filter(object_id=1).update(worker_id='other')
+        a.heartbeat()
+        self.assertFalse(kind_a.running)
+
+    @override_settings(WORKER_HEARTBEAT_INTERVAL=10)
+    def test_failed_start_backs_off(self):
+        """Test that a resource failing to start is retried after a backoff, not on every rebalance"""
+        kind = FakeKind([1, 2])
+        failing = kind.leased()
+        attempts = []
+        failing.start = lambda object_ids: attempts.append(object_ids) or [object_id for object_id in object_ids if object_id != 2]
+
+        a = LeaseCoordinator('a')
+        a.register(failing)
+        a.heartbeat()
+        a.rebalance()
+        a.rebalance()
+        self.assertEqual(attempts, [[1, 2]])
+        self.assertEqual(a.get_stats()['failed'], {'account': 1})
+
+        with mock.patch('apps.core.leases.time.monotonic', return_value=time.monotonic() + 20):
+            a.rebalance()
+        self.assertEqual(attempts, [[1, 2], [2]])
+
+    @override_settings(
+        WORKER_SHARDING=True,
+        CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    )
+    async def test_account_calls_reach_the_owning_worker(self):
+        """Test that account RPC calls are routed to the channel of the worker holding the lease"""
+        await Lease.objects.acreate(kind='account', object_id=5, worker_id='w1', expires_at=timezone.now() + timedelta(seconds=30))
+        await TelethonSupervisor.serve(worker_channel('w1'))
+        try:
+            with mock.patch.object(TelethonManager, 'test_account', new=mock.AsyncMock(return_value=True)) as test_account:
+                self.assertTrue(await AccountRPC.acall('test_account', account_id=5))
+            test_account.assert_awaited_once_with(5)
+
+            with self.assertRaises(AccountRPCError):
+                await AccountRPC.acall('test_account', account_id=6)
+        finally:
+            await TelethonSupervisor.shutdown()
+
+
+class LeaseRenewalTestCase(TransactionTestCase):
+    """Test that leases stay held while a worker is busy starting resources"""
+
+    @override_settings(WORKER_LEASE_TTL=1)
+    def test_slow_start_keeps_the_leases(self):
+        """Test that a start outlasting the TTL does not let another worker take over"""
+        kind = FakeKind([1])
+        slow = kind.leased()
+        start = slow.start
+        slow.start = lambda object_ids: time.sleep(1.5) or start(object_ids)
+
+        a = LeaseCoordinator('a')
+        a.register(slow)
+        a.heartbeat()
+        a.start_renewing(interval=0.2)
+        try:
+            a.rebalance()
+
+            self.assertEqual(kind.running, {1})
+            self.assertGreater(Lease.objects.get(object_id=1).expires_at, timezone.now())
+            self.assertFalse(LeaseCoordinator('b')._acquire('account', {1}, timezone.now()))
+        finally:
+            a.leave()
+        self.assertFalse(Lease.objects.exists())
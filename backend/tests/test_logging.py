@@ -0,0 +1,50 @@
+import json
+import logging
+from django.test import SimpleTestCase, override_settings
+from apps.core.log import JsonFormatter, RateLimitFilter, log_event
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class StructuredLoggingTestCase(SimpleTestCase):
+    """Test structured, sampled and rate-limited hot-path logging"""
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.logger = logging.getLogger('tests.structured')
+        self.logger.handlers = [self.handler]
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+
+    def test_event_is_one_json_line_with_fields(self):
+        """Test that event fields become top-level JSON keys"""
+        log_event(self.logger, logging.DEBUG, 'bot_message', "Bot %s message %s", 1, 2, chat_id=3, stored=True)
+
+        entry = json.loads(JsonFormatter().format(self.handler.records[0]))
+        self.assertEqual(entry['msg'], "Bot 1 message 2")
+        self.assertEqual((entry['event'], entry['chat_id'], entry['stored']), ('bot_message', 3, True))
+
+    @override_settings(LOG_SAMPLE_RATE=0.0)
+    def test_sampled_out_events_build_no_record(self):
+        """Test that sampling happens before the record is created"""
+        for index in range(100):
+            log_event(self.logger, logging.DEBUG, 'bot_message', "Message %s", index)
+
+        self.assertEqual(self.handler.records, [])
+
+    def test_rate_limit_reports_suppressed_records(self):
+        """Test that records over the per-call-site limit are counted on the next one let through"""
+        rate_limit = RateLimitFilter(per_second=2)
+        records = [logging.LogRecord('tests', logging.ERROR, 'handler.py', 10, 'boom', None, None) for _ in range(5)]
+
+        self.assertEqual([rate_limit.filter(record) for record in records], [True, True, False, False, False])
+        rate_limit._windows[('handler.py', 10)][0] -= 1  # Next second
+        self.assertTrue(rate_limit.filter(records[0]))
+        self.assertEqual(records[0].suppressed, 3)
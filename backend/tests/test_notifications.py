@@ -0,0 +1,48 @@
+import time
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from apps.chats.models import Chat
+from apps.notifications.fanout import NotificationFanout
+from apps.notifications.models import Notification
+from apps.notifications.services import NotificationService
+
+
+@override_settings(NOTIFICATION_COALESCE_MS=100)
+class NotificationFanoutTestCase(SimpleTestCase):
+    """Test coalescing of notification broadcasts"""
+
+    def setUp(self):
+        NotificationFanout.reset()
+        self.chats = [Chat(id=chat_id, type="bot_chat", bot_id=1, chat_id=chat_id) for chat_id in (1, 2)]
+
+    def _notification(self, chat, message_id):
+        return Notification(type="new_message", chat=chat, title="New message", data={'message_id': message_id})
+
+    def _publish_and_wait(self, notifications):
+        with mock.patch.object(NotificationService, '_send_websocket_notification', new=mock.AsyncMock()) as send:
+            NotificationFanout.publish(notifications)
+            time.sleep(0.35)
+        return [(call.args[0].chat_id, call.args[0].data['message_id'], call.args[1]) for call in send.call_args_list]
+
+    def test_single_message_produces_one_event(self):
+        """Test that a lone notification is broadcast once and immediately"""
+        self.assertEqual(self._publish_and_wait([self._notification(self.chats[0], 1)]), [(1, 1, 1)])
+
+    def test_burst_in_one_chat_is_coalesced(self):
+        """Test that a burst becomes the first event plus one counted event per chat"""
+        notifications = [self._notification(self.chats[0], message_id) for message_id in range(5)]
+        notifications.append(self._notification(self.chats[1], 10))
+
+        events = self._publish_and_wait(notifications)
+
+        self.assertEqual(sorted(events), [(1, 0, 1), (1, 4, 4), (2, 10, 1)])
+        self.assertEqual(NotificationFanout.get_stats()['coalesced'], 4)
+
+    def test_coalesced_count_adds_up_bulk_notifications(self):
+        """Test that held notifications covering several messages each count all of them"""
+        notifications = [self._notification(self.chats[0], message_id) for message_id in range(3)]
+        notifications[2].data['count'] = 4
+
+        events = self._publish_and_wait(notifications)
+
+        self.assertEqual(events, [(1, 0, 1), (1, 2, 5)])
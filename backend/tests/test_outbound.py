@@ -0,0 +1,113 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from telethon.errors import FloodWaitError
+from apps.accounts.outbound import OutboundScheduler
+from apps.accounts.supervisor import TelethonSupervisor
+from apps.accounts.telethon_manager import TelethonManager
+
+
+class FakeClient:
+    """Telethon client stand-in recording outbound calls, the first send hits a flood wait"""
+
+    def __init__(self, flood_seconds=None):
+        self.flood_seconds = flood_seconds
+        self.calls = []
+
+    async def send_message(self, entity, message):
+        if self.flood_seconds is not None:
+            error = FloodWaitError(request=None, capture=self.flood_seconds)
+            self.flood_seconds = None
+            raise error
+        self.calls.append(('send', entity, message, time.monotonic()))
+        return SimpleNamespace(id=len(self.calls))
+
+    async def delete_messages(self, entity, message_ids):
+        self.calls.append(('delete', entity, message_ids))
+        return [SimpleNamespace(pts_count=len(message_ids))]
+
+
+@override_settings(TELETHON_OUTBOUND_INTERVAL_MS=0)
+class OutboundSchedulerTestCase(SimpleTestCase):
+    """Test the per-account outbound queue"""
+
+    def use_client(self, client):
+        patcher = mock.patch.dict(TelethonManager._clients, {1: client})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(OutboundScheduler.stop, 1)
+
+    async def test_flood_wait_holds_the_queue(self):
+        """Test that a flood wait delays the failed send and everything behind it, then both go out in order"""
+        client = FakeClient(flood_seconds=1)
+        self.use_client(client)
+        started = time.monotonic()
+
+        first = OutboundScheduler.submit(1, 'send', 5, message="one")
+        second = OutboundScheduler.submit(1, 'send', 5, message="two")
+
+        self.assertEqual((await first).id, 1)
+        self.assertEqual((await second).id, 2)
+        self.assertEqual([call[2] for call in client.calls], ["one", "two"])
+        self.assertGreaterEqual(client.calls[0][3] - started, 1)
+
+    @override_settings(TELETHON_OUTBOUND_MAX_FLOOD_WAIT=0)
+    async def test_long_flood_wait_fails_the_request(self):
+        """Test that a flood wait beyond the limit is reported instead of waited out"""
+        self.use_client(FakeClient(flood_seconds=1))
+
+        with self.assertRaises(FloodWaitError):
+            await OutboundScheduler.submit(1, 'send', 5, message="one")
+
+    async def test_deletes_of_a_chat_are_coalesced(self):
+        """Test that queued deletes of the same chat go out as one call"""
+        client = FakeClient()
+        self.use_client(client)
+
+        futures = [
+            OutboundScheduler.submit(1, 'delete', 5, message_ids=[1]),
+            OutboundScheduler.submit(1, 'delete', 6, message_ids=[9]),
+            OutboundScheduler.submit(1, 'delete', 5, message_ids=[2, 3]),
+        ]
+        await asyncio.gather(*futures)
+
+        self.assertEqual(client.calls, [('delete', 5, [1, 2, 3]), ('delete', 6, [9])])
+
+    async def test_blocked_account_queues_instead_of_waiting(self):
+        """Test that a send is left queued when the flood wait would outlast the RPC timeout"""
+        self.use_client(FakeClient())
+        sent = asyncio.Event()
+
+        async def send_message(account_id, chat_id, text):
+            sent.set()
+            return SimpleNamespace(id=7)
+
+        with mock.patch.object(TelethonManager, 'send_message', side_effect=send_message):
+            self.assertEqual(await TelethonSupervisor.send_message(1, 5, "hi"), {'message_id': 7, 'queued': False})
+
+            with mock.patch.dict(OutboundScheduler._blocked_until, {1: time.monotonic() + 60}):
+                sent.clear()
+                result = await TelethonSupervisor.send_message(1, 5, "later")
+            self.assertEqual(result, {'message_id': None, 'queued': True})
+            await asyncio.wait_for(sent.wait(), 1)
+
+    @override_settings(TELETHON_RPC_TIMEOUT=0.2)
+    async def test_send_held_past_the_deadline_is_reported_queued(self):
+        """Test that a send blocked after the wait estimate answers queued before the RPC timeout"""
+        self.use_client(FakeClient())
+        release = asyncio.Event()
+
+        async def send_message(account_id, chat_id, text):
+            await release.wait()
+            return SimpleNamespace(id=7)
+
+        with mock.patch.object(TelethonManager, 'send_message', side_effect=send_message) as send:
+            result = await TelethonSupervisor.send_message(1, 5, "hi")
+            self.assertEqual(result, {'message_id': None, 'queued': True})
+
+            release.set()
+            await asyncio.sleep(0)
+        send.assert_called_once()
+        self.assertFalse([task for task in TelethonSupervisor._tasks if not task.done()])
@@ -0,0 +1,88 @@
+from unittest import mock
+from django.test import TestCase
+from apps.bots.models import Bot
+from apps.bots.registry import BotRegistry
+from apps.core.encryption import encryption_service
+
+
+class BotRegistryTestCase(TestCase):
+    """Test the in-memory bot registry and its signal invalidation"""
+
+    def setUp(self):
+        BotRegistry.clear()
+        self.bot = Bot.objects.create(
+            bot_id=123456789,
+            username="test_bot",
+            token_enc=encryption_service.encrypt("123456789:token"),
+            status="active"
+        )
+
+    def tearDown(self):
+        BotRegistry.clear()
+
+    def test_saved_bot_is_registered(self):
+        """Test that saving an active bot registers its decrypted token"""
+        entry = BotRegistry.get(self.bot.id)
+        self.assertIsNotNone(entry)
+        self.assertEqual(entry.token, "123456789:token")
+        self.assertEqual(entry.bot_id, 123456789)
+
+    def test_save_without_token_change_skips_decrypt(self):
+        """Test that unrelated updates reuse the decrypted token"""
+        with mock.patch.object(encryption_service, 'decrypt') as decrypt:
+            self.bot.auto_reply_message = "Busy"
+            self.bot.save()
+
+        decrypt.assert_not_called()
+        self.assertEqual(BotRegistry.get(self.bot.id).auto_reply_message, "Busy")
+
+    def test_inactive_and_deleted_bots_are_evicted(self):
+        """Test that stopped and deleted bots leave the registry"""
+        self.bot.status = "inactive"
+        self.bot.save()
+        self.assertIsNone(BotRegistry.get(self.bot.id))
+
+        self.bot.status = "active"
+        self.bot.save()
+        bot_pk = self.bot.id
+        self.bot.delete()
+        self.assertIsNone(BotRegistry.get(bot_pk))
+
+    def test_lookup_hits_no_database(self):
+        """Test that registered bots are resolved without queries"""
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(BotRegistry.get_or_load(self.bot.id))
+
+    def test_load_drops_bots_deactivated_elsewhere(self):
+        """Test that a reload forgets bots whose status changed without signals"""
+        Bot.objects.filter(id=self.bot.id).update(status="error")
+        secret = BotRegistry.get(self.bot.id).webhook_secret
+
+        BotRegistry.load()
+
+        self.assertIsNone(BotRegistry.get(self.bot.id))
+        self.assertIsNone(BotRegistry.get_by_secret(secret))
+
+    async def test_first_load_is_awaited(self):
+        """Test that a registry that was never loaded is loaded before answering"""
+        BotRegistry.clear()
+
+        with mock.patch.object(BotRegistry, '_loaded_at', 0.0):
+            await BotRegistry.aload_if_stale()
+            self.assertIsNotNone(BotRegistry.get(self.bot.id))
+
+    async def test_stale_registry_is_reloaded(self):
+        """Test that edits made by other processes arrive once the TTL passed"""
+        await Bot.objects.filter(id=self.bot.id).aupdate(auto_reply_message="Away")
+
+        with self.settings(BOT_REGISTRY_TTL=0):
+            await BotRegistry.aload_if_stale()
+            # The reload runs in the background, lookups meanwhile answer from the old snapshot
+            self.assertEqual(BotRegistry.get(self.bot.id).auto_reply_message, self.bot.auto_reply_message)
+            await BotRegistry._reload_task
+        self.assertEqual(BotRegistry.get(self.bot.id).auto_reply_message, "Away")
+
+        await Bot.objects.filter(id=self.bot.id).aupdate(auto_reply_message="Back")
+        with self.settings(BOT_REGISTRY_TTL=3600):
+            await BotRegistry.aload_if_stale()
+        self.assertEqual(BotRegistry.get(self.bot.id).auto_reply_message, "Away")
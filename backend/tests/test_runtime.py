@@ -0,0 +1,46 @@
+import asyncio
+import contextvars
+from django.test import SimpleTestCase
+from apps.core.runtime import AsyncRuntime
+
+
+class AsyncRuntimeTestCase(SimpleTestCase):
+    """Test the background event loop runtime"""
+
+    def setUp(self):
+        self.runtime = AsyncRuntime('test-runtime')
+
+    def tearDown(self):
+        self.runtime.loop.call_soon_threadsafe(self.runtime.loop.stop)
+
+    def test_coroutines_share_one_loop(self):
+        """Test that every submitted coroutine runs on the same long-lived loop"""
+        async def current_loop():
+            return asyncio.get_running_loop()
+
+        first = self.runtime.run(current_loop())
+        second = self.runtime.run(current_loop())
+
+        self.assertIs(first, second)
+        self.assertIs(first, self.runtime.loop)
+
+    def test_run_from_runtime_thread_is_rejected(self):
+        """Test that blocking on the runtime from inside it raises instead of deadlocking"""
+        async def nested():
+            async def noop():
+                return 1
+            with self.assertRaises(RuntimeError):
+                self.runtime.run(noop())
+            return await self.runtime.arun(noop())
+
+        self.assertEqual(self.runtime.run(nested()), 1)
+
+    def test_caller_context_is_not_inherited(self):
+        """Test that tasks do not capture context variables of the submitting thread"""
+        request_scoped = contextvars.ContextVar('request_scoped', default=None)
+
+        async def read():
+            return request_scoped.get()
+
+        request_scoped.set('request')
+        self.assertIsNone(self.runtime.run(read()))
@@ -0,0 +1,70 @@
+import json
+import os
+from datetime import datetime, timezone
+from django.test import TestCase
+from telethon.crypto import AuthKey
+from telethon.sessions import StringSession
+from telethon.tl.types import InputPeerChannel, InputPeerUser, PeerChannel
+from telethon.tl.types.contacts import ResolvedPeer
+from telethon.tl.types.updates import State
+from apps.accounts.models import Account, SessionEntity
+from apps.accounts.session import DatabaseSession
+from apps.core.encryption import encryption_service
+
+
+def auth_string() -> str:
+    session = StringSession()
+    session.set_dc(2, '149.154.167.51', 443)
+    session.auth_key = AuthKey(os.urandom(256))
+    return session.save()
+
+
+class DatabaseSessionTestCase(TestCase):
+    """Test the database-backed Telethon session"""
+
+    def setUp(self):
+        self.auth = auth_string()
+        self.account = Account.objects.create(
+            tg_user_id=1, phone_number="+100", api_id_enc="x", api_hash_enc="x",
+            session_enc=encryption_service.encrypt(self.auth),
+        )
+        self.session = DatabaseSession.load(self.account)
+        self.session.process_entities(ResolvedPeer(None, [InputPeerUser(5, 77)], [InputPeerChannel(9, 88)]))
+        self.session.set_update_state(0, State(10, 2, datetime(2024, 1, 1, tzinfo=timezone.utc), 3, unread_count=0))
+        self.session.set_update_state(9, State(40, 0, datetime.now(), 0, unread_count=0))
+
+    def test_restart_is_warm(self):
+        """Test that entities and update state survive a reload without resolve calls"""
+        self.session.save()
+
+        session = DatabaseSession.load(Account.objects.get(id=self.account.id))
+
+        self.assertEqual(session.auth_key.key, self.session.auth_key.key)
+        self.assertEqual(session.get_input_entity(5), InputPeerUser(5, 77))
+        self.assertEqual(session.get_input_entity(PeerChannel(9)), InputPeerChannel(9, 88))
+        self.assertEqual(session.get_update_state(0).pts, 10)
+        self.assertEqual(session.get_update_state(9).pts, 40)
+        data_enc = SessionEntity.objects.get(entity_id=5).data_enc
+        row = json.loads(encryption_service.decrypt(data_enc))
+        self.assertEqual((5, *row), self.session._rows[5])
+        self.assertNotEqual(data_enc, json.dumps(row))
+
+    def test_save_writes_only_changes(self):
+        """Test that unchanged peers are not written again and a changed one is upserted alone"""
+        self.session.save()
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.session.save())
+
+        self.session.process_entities(ResolvedPeer(None, [InputPeerUser(5, 77), InputPeerUser(6, 66)], []))
+        self.session.process_entities(ResolvedPeer(None, [InputPeerUser(5, 78)], []))
+        self.assertEqual(self.session._take_changes()[1].keys(), {5, 6})
+
+    def test_changed_auth_key_replaces_stored_session(self):
+        """Test that a new auth key is stored encrypted on the account"""
+        self.session.auth_key = AuthKey(os.urandom(256))
+        self.session.save()
+
+        self.account.refresh_from_db()
+        self.assertEqual(encryption_service.decrypt(self.account.session_enc), StringSession.save(self.session))
+        self.assertNotEqual(encryption_service.decrypt(self.account.session_enc), self.auth)
@@ -0,0 +1,99 @@
+import json
+from unittest import mock
+from django.test import TestCase
+from apps.bots.aiogram_manager import AiogramManager
+from apps.bots.models import Bot
+from apps.bots.registry import BotRegistry
+from apps.bots.update_queue import UpdateQueue
+from apps.core.encryption import encryption_service
+
+
+class WebhookIngressTestCase(TestCase):
+    """Test webhook ingress acknowledges updates without dispatching them"""
+
+    def setUp(self):
+        self.secret = AiogramManager._generate_webhook_secret(1)
+        self.update = {'update_id': 100, 'message': {'message_id': 1}}
+
+    def test_webhook_enqueues_update(self):
+        """Test that a valid webhook is enqueued and acknowledged"""
+        with mock.patch.object(UpdateQueue, 'enqueue', return_value=True) as enqueue:
+            response = self.client.post(
+                f'/webhook/bot/1/{self.secret}/',
+                data=json.dumps(self.update),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        enqueue.assert_called_once()
+        bot_id, body, _ = enqueue.call_args.args
+        self.assertEqual(bot_id, 1)
+        self.assertEqual(json.loads(body), self.update)
+
+    def test_webhook_rejects_invalid_secret(self):
+        """Test that a wrong secret is rejected before enqueueing"""
+        with mock.patch.object(UpdateQueue, 'enqueue') as enqueue:
+            response = self.client.post(
+                '/webhook/bot/1/wrong-secret/',
+                data=json.dumps(self.update),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 403)
+        enqueue.assert_not_called()
+
+    def test_webhook_full_queue_asks_for_retry(self):
+        """Test that a full queue returns 503 so Telegram retries later"""
+        with mock.patch.object(UpdateQueue, 'enqueue', return_value=False):
+            response = self.client.post(
+                f'/webhook/bot/1/{self.secret}/',
+                data=json.dumps(self.update),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 503)
+
+
+class SharedWebhookTestCase(TestCase):
+    """Test the shared webhook URL routed by the secret token header"""
+
+    def setUp(self):
+        BotRegistry.clear()
+        self.bot = Bot.objects.create(
+            bot_id=123456789,
+            username="test_bot",
+            token_enc=encryption_service.encrypt("123456789:token"),
+            status="active"
+        )
+        self.secret = AiogramManager._generate_webhook_secret(self.bot.id)
+
+    def tearDown(self):
+        BotRegistry.clear()
+
+    def test_update_is_routed_by_secret_header(self):
+        """Test that the secret token header resolves the bot with no queries"""
+        with mock.patch.object(UpdateQueue, 'enqueue', return_value=True) as enqueue:
+            with self.assertNumQueries(0):
+                response = self.client.post(
+                    '/webhook/bot/',
+                    data=json.dumps({'update_id': 1}),
+                    content_type='application/json',
+                    headers={'X-Telegram-Bot-Api-Secret-Token': self.secret}
+                )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(enqueue.call_args.args[0], self.bot.id)
+
+    def test_unknown_secret_header_is_rejected(self):
+        """Test that an unknown or missing secret token is rejected"""
+        with mock.patch.object(UpdateQueue, 'enqueue') as enqueue:
+            for headers in ({'X-Telegram-Bot-Api-Secret-Token': 'wrong'}, {}):
+                response = self.client.post(
+                    '/webhook/bot/',
+                    data=json.dumps({'update_id': 1}),
+                    content_type='application/json',
+                    headers=headers
+                )
+                self.assertEqual(response.status_code, 403)
+
+        enqueue.assert_not_called()